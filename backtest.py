@@ -0,0 +1,463 @@
+"""
+Backtest - chay lai chien luoc tren du lieu lich su
+
+Logic:
+- Diem moi nen H1 lay tu strategy.evaluate_signals_batch (khop voi main.py)
+- Tich luy diem va goi trade.process_trade giong vong lap main.py
+- TradeManager mo cluster ET1-ET4, BEManager keo SL - dung code that,
+  chi thay mt5 bang SimBroker va tat log Telegram
+- SimBroker khop lenh market/limit va SL/TP trong nen M15 (high/low)
+
+Cach dung:
+    python backtest.py 2023-01-01 2024-01-01
+"""
+
+import sys
+from bisect import bisect_left
+from contextlib import contextmanager
+from datetime import datetime
+from types import SimpleNamespace
+
+import numpy as np
+
+import trade
+import be_manager
+import deals
+from strategy import Signal, evaluate_signals_batch
+from execution_log import ExecutionLog
+from profiles import get_profile
+
+
+class SimBroker:
+    """
+    Broker gia lap thay cho module MetaTrader5 trong trade.py/be_manager.py/deals.py.
+    Chi cai dat cac ham/hang so ma 2 module do dung.
+
+    Gia moi nen M15: bid = open/high/low/close, ask = bid + spread.
+    Trong 1 nen: khop lenh limit truoc, roi kiem tra SL/TP (SL truoc neu cham ca 2).
+    Vi the mo trong nen (limit khop) chi kiem tra SL/TP tu nen sau.
+    """
+    # Hang so giong MetaTrader5
+    ORDER_TYPE_BUY = 0
+    ORDER_TYPE_SELL = 1
+    ORDER_TYPE_BUY_LIMIT = 2
+    ORDER_TYPE_SELL_LIMIT = 3
+    POSITION_TYPE_BUY = 0
+    POSITION_TYPE_SELL = 1
+    DEAL_TYPE_BUY = 0
+    DEAL_TYPE_SELL = 1
+    DEAL_ENTRY_IN = 0
+    DEAL_ENTRY_OUT = 1
+    DEAL_REASON_EXPERT = 3
+    DEAL_REASON_SL = 4
+    DEAL_REASON_TP = 5
+    DEAL_REASON_SO = 6
+    TRADE_ACTION_DEAL = 1
+    TRADE_ACTION_PENDING = 5
+    TRADE_ACTION_SLTP = 6
+    TRADE_ACTION_REMOVE = 8
+    ORDER_FILLING_FOK = 0
+    ORDER_FILLING_IOC = 1
+    ORDER_TIME_GTC = 0
+    TRADE_RETCODE_REQUOTE = 10004
+    TRADE_RETCODE_PLACED = 10008
+    TRADE_RETCODE_DONE = 10009
+    TRADE_RETCODE_INVALID = 10013
+    TRADE_RETCODE_INVALID_VOLUME = 10014
+    TRADE_RETCODE_INVALID_PRICE = 10015
+    TRADE_RETCODE_INVALID_STOPS = 10016
+    TRADE_RETCODE_PRICE_CHANGED = 10020
+    TRADE_RETCODE_PRICE_OFF = 10021
+
+    def __init__(self, symbol="XAUUSD", balance=10000.0, point=0.01, contract_size=100,
+                 volume_min=0.01, volume_step=0.01, stops_level=0):
+        self.symbol = symbol
+        self.balance = balance
+        self.point = point
+        self.contract_size = contract_size
+        self.volume_min = volume_min
+        self.volume_step = volume_step
+        self.stops_level = stops_level
+
+        self.time = 0
+        self.bid = 0.0
+        self.ask = 0.0
+        self.spread = 0.0
+
+        self.positions = []
+        self.orders = []
+        self.trades = []  # Cac vi the da dong
+        self.deals = []  # Lich su deal (thu tu thoi gian) cho history_deals_get
+        self._deal_times = []
+        self._next_deal = 1
+        self._next_ticket = 1
+
+    # ========== API GIONG MT5 ==========
+
+    def account_info(self):
+        return SimpleNamespace(login=0, balance=self.balance, equity=self.equity())
+
+    def symbol_info(self, symbol):
+        return SimpleNamespace(volume_min=self.volume_min, volume_step=self.volume_step,
+                               trade_stops_level=self.stops_level, point=self.point,
+                               trade_contract_size=self.contract_size)
+
+    def symbol_info_tick(self, symbol):
+        return SimpleNamespace(time=self.time, bid=self.bid, ask=self.ask)
+
+    def history_deals_get(self, date_from, date_to):
+        start = bisect_left(self._deal_times, date_from)
+        return tuple(d for d in self.deals[start:] if d.time <= date_to)
+
+    def positions_get(self, symbol=None):
+        return tuple(p for p in self.positions if symbol is None or p.symbol == symbol)
+
+    def order_send(self, request):
+        action = request["action"]
+        if action == self.TRADE_ACTION_DEAL:
+            return self._market(request)
+        if action == self.TRADE_ACTION_PENDING:
+            return self._pending(request)
+        if action == self.TRADE_ACTION_SLTP:
+            return self._modify_sltp(request)
+        if action == self.TRADE_ACTION_REMOVE:
+            return self._remove(request)
+        return self._result(self.TRADE_RETCODE_INVALID, "Unsupported action")
+
+    # ========== XU LY LENH ==========
+
+    def _result(self, retcode, comment, price=0.0, volume=0.0, order=0):
+        return SimpleNamespace(retcode=retcode, comment=comment, price=price,
+                               volume=volume, order=order, deal=order)
+
+    def _ticket(self):
+        ticket = self._next_ticket
+        self._next_ticket += 1
+        return ticket
+
+    def _stops_ok(self, is_buy, price, sl, tp):
+        """SL/TP phai nam dung phia va cach gia it nhat stops_level."""
+        min_dist = self.stops_level * self.point
+        if is_buy:
+            return (not sl or sl <= price - min_dist) and (not tp or tp >= price + min_dist)
+        return (not sl or sl >= price + min_dist) and (not tp or tp <= price - min_dist)
+
+    def _market(self, request):
+        is_buy = request["type"] == self.ORDER_TYPE_BUY
+        price = self.ask if is_buy else self.bid
+        if request["volume"] <= 0:
+            return self._result(self.TRADE_RETCODE_INVALID_VOLUME, "Invalid volume")
+        if not self._stops_ok(is_buy, self.bid if is_buy else self.ask, request.get("sl"), request.get("tp")):
+            return self._result(self.TRADE_RETCODE_INVALID_STOPS, "Invalid stops")
+
+        ticket = self._ticket()
+        self._open_position(ticket, request, is_buy, price)
+        return self._result(self.TRADE_RETCODE_DONE, "Request executed", price, request["volume"], ticket)
+
+    def _pending(self, request):
+        is_buy = request["type"] == self.ORDER_TYPE_BUY_LIMIT
+        price = request["price"]
+        # Limit buy phai duoi ask, limit sell phai tren bid
+        if (is_buy and price >= self.ask) or (not is_buy and price <= self.bid):
+            return self._result(self.TRADE_RETCODE_INVALID_PRICE, "Invalid price")
+        if not self._stops_ok(is_buy, price, request.get("sl"), request.get("tp")):
+            return self._result(self.TRADE_RETCODE_INVALID_STOPS, "Invalid stops")
+
+        ticket = self._ticket()
+        self.orders.append(SimpleNamespace(ticket=ticket, request=dict(request), is_buy=is_buy, price=price))
+        return self._result(self.TRADE_RETCODE_PLACED, "Request executed", price, request["volume"], ticket)
+
+    def _modify_sltp(self, request):
+        for pos in self.positions:
+            if pos.ticket == request["position"]:
+                is_buy = pos.type == self.POSITION_TYPE_BUY
+                if not self._stops_ok(is_buy, self.bid if is_buy else self.ask, request.get("sl"), request.get("tp")):
+                    return self._result(self.TRADE_RETCODE_INVALID_STOPS, "Invalid stops")
+                pos.sl = request.get("sl", pos.sl)
+                pos.tp = request.get("tp", pos.tp)
+                return self._result(self.TRADE_RETCODE_DONE, "Request executed", order=pos.ticket)
+        return self._result(self.TRADE_RETCODE_INVALID, "Position not found")
+
+    def _remove(self, request):
+        for order in self.orders:
+            if order.ticket == request["order"]:
+                self.orders.remove(order)
+                return self._result(self.TRADE_RETCODE_DONE, "Request executed", order=order.ticket)
+        return self._result(self.TRADE_RETCODE_INVALID, "Order not found")
+
+    def _deal(self, position, is_buy, entry, reason, price, volume, magic, profit=0.0):
+        self.deals.append(SimpleNamespace(
+            ticket=self._next_deal, time=self.time, symbol=self.symbol, position_id=position,
+            type=self.DEAL_TYPE_BUY if is_buy else self.DEAL_TYPE_SELL, entry=entry, reason=reason,
+            price=price, volume=volume, magic=magic, profit=profit,
+        ))
+        self._deal_times.append(self.time)
+        self._next_deal += 1
+
+    def _open_position(self, ticket, request, is_buy, price, fresh=False):
+        self.positions.append(SimpleNamespace(
+            ticket=ticket, symbol=request["symbol"], magic=request.get("magic", 0),
+            comment=request.get("comment", ""), volume=request["volume"],
+            type=self.POSITION_TYPE_BUY if is_buy else self.POSITION_TYPE_SELL,
+            price_open=price, sl=request.get("sl", 0.0), tp=request.get("tp", 0.0),
+            time=self.time, fresh=fresh,
+        ))
+        self._deal(ticket, is_buy, self.DEAL_ENTRY_IN, self.DEAL_REASON_EXPERT, price, request["volume"],
+                   request.get("magic", 0))
+
+    def _close_position(self, pos, price, reason):
+        direction = 1 if pos.type == self.POSITION_TYPE_BUY else -1
+        profit = direction * (price - pos.price_open) * pos.volume * self.contract_size
+        self.balance += profit
+        self.positions.remove(pos)
+        self.trades.append(SimpleNamespace(
+            ticket=pos.ticket, magic=pos.magic, is_buy=direction == 1, volume=pos.volume,
+            open_time=pos.time, close_time=self.time, price_open=pos.price_open,
+            price_close=price, profit=profit, reason=reason,
+        ))
+        self._deal(pos.ticket, direction != 1, self.DEAL_ENTRY_OUT,
+                   self.DEAL_REASON_TP if reason == "tp" else self.DEAL_REASON_SL,
+                   price, pos.volume, pos.magic, profit)
+
+    # ========== MO PHONG NEN ==========
+
+    def open_bar(self, time, open_price, spread):
+        """Dat gia tai thoi diem mo nen (gia dung cho lenh market luc nay)."""
+        self.time = time
+        self.spread = spread
+        self.bid = open_price
+        self.ask = open_price + spread
+
+    def run_bar(self, open_price, high, low, close):
+        """Khop limit, kiem tra SL/TP trong nen, roi dat gia ve close."""
+        spread = self.spread
+
+        # Lenh limit: buy khi ask xuong toi gia, sell khi bid len toi gia
+        for order in list(self.orders):
+            if order.is_buy and low + spread <= order.price:
+                fill = min(order.price, open_price + spread)
+            elif not order.is_buy and high >= order.price:
+                fill = max(order.price, open_price)
+            else:
+                continue
+            self.orders.remove(order)
+            self._open_position(order.ticket, order.request, order.is_buy, fill, fresh=True)
+
+        # SL/TP: buy dong theo bid, sell dong theo ask
+        for pos in list(self.positions):
+            if pos.fresh:
+                pos.fresh = False
+                continue
+            if pos.type == self.POSITION_TYPE_BUY:
+                if pos.sl and low <= pos.sl:
+                    self._close_position(pos, min(pos.sl, open_price), "sl")
+                elif pos.tp and high >= pos.tp:
+                    self._close_position(pos, max(pos.tp, open_price), "tp")
+            else:
+                if pos.sl and high + spread >= pos.sl:
+                    self._close_position(pos, max(pos.sl, open_price + spread), "sl")
+                elif pos.tp and low + spread <= pos.tp:
+                    self._close_position(pos, min(pos.tp, open_price + spread), "tp")
+
+        self.bid = close
+        self.ask = close + spread
+
+    def equity(self):
+        floating = 0.0
+        for pos in self.positions:
+            if pos.type == self.POSITION_TYPE_BUY:
+                floating += (self.bid - pos.price_open) * pos.volume * self.contract_size
+            else:
+                floating += (pos.price_open - self.ask) * pos.volume * self.contract_size
+        return self.balance + floating
+
+
+class BacktestResult:
+    """Ket qua backtest: danh sach lenh da dong + duong equity theo nen M15."""
+    def __init__(self, broker, initial_balance, times, equity, clusters):
+        self.initial_balance = initial_balance
+        self.final_balance = broker.balance
+        self.trades = broker.trades
+        self.open_positions = len(broker.positions)
+        self.pending_orders = len(broker.orders)
+        self.clusters = clusters
+        self.times = times
+        self.equity = equity
+
+    @property
+    def net_pnl(self):
+        return self.final_balance - self.initial_balance
+
+    @property
+    def max_drawdown(self):
+        if len(self.equity) == 0:
+            return 0.0
+        return float(np.max(np.maximum.accumulate(self.equity) - self.equity))
+
+    def stats_by_et(self):
+        """{1..4: {'trades', 'wins', 'win_rate', 'pnl'}} theo magic 1001-1004."""
+        stats = {}
+        for et in range(1, 5):
+            profits = [t.profit for t in self.trades if t.magic == 1000 + et]
+            wins = sum(1 for p in profits if p > 0)
+            stats[et] = {
+                'trades': len(profits),
+                'wins': wins,
+                'win_rate': wins / len(profits) if profits else 0.0,
+                'pnl': sum(profits),
+            }
+        return stats
+
+    def summary(self):
+        return {
+            'clusters': self.clusters,
+            'trades': len(self.trades),
+            'net_pnl': self.net_pnl,
+            'max_drawdown': self.max_drawdown,
+            'final_balance': self.final_balance,
+            'open_positions': self.open_positions,
+            'pending_orders': self.pending_orders,
+            'by_et': self.stats_by_et(),
+        }
+
+
+def _silent(*args, **kwargs):
+    pass
+
+
+# Tham so cluster cua TradeManager co the ghi de qua run_backtest(params=...)
+TRADE_PARAMS = ('et_offsets_usd', 'sl_usd', 'tp_usd', 'risk_allocation')
+
+
+@contextmanager
+def _simulated(broker, base_score):
+    """Cho trade.py/be_manager.py dung SimBroker thay mt5 va tat log Telegram."""
+    saved = [(module, name, getattr(module, name))
+             for module in (trade, be_manager)
+             for name in ('mt5', 'log', 'flush_logs')]
+    saved.append((deals, 'mt5', deals.mt5))
+    saved.append((trade, '_trade_managers', trade._trade_managers))
+    saved.append((trade, '_market_infos', trade._market_infos))
+    saved.append((trade, '_execution_log', trade._execution_log))
+    saved.append((trade, 'BASE_SCORE', trade.BASE_SCORE))
+    saved.append((trade, 'PARALLEL_ORDERS', trade.PARALLEL_ORDERS))
+    try:
+        for module in (trade, be_manager):
+            module.mt5 = broker
+            module.log = _silent
+            module.flush_logs = _silent
+        deals.mt5 = broker
+        trade._trade_managers = {}
+        trade._market_infos = {}  # Thong so symbol / balance lay tu SimBroker
+        trade._execution_log = ExecutionLog()  # Khong ghi lenh mo phong vao execution log that
+        trade.BASE_SCORE = base_score
+        trade.PARALLEL_ORDERS = False  # SimBroker: thu tu ticket co dinh
+        yield
+    finally:
+        for module, name, value in saved:
+            setattr(module, name, value)
+
+
+def run_backtest(rates_m15, rates_h4, rates_h1, rates_m30, symbol="XAUUSD", balance=10000.0,
+                 signals=None, spread=None, point=0.01, params=None):
+    """
+    Chay lai main.py tren lich su.
+
+    rates_*: structured array day du (giong copy_rates_range) cua tung khung.
+    symbol: sai so factor / SL / TP lay tu profile cua symbol (ValueError neu chua co profile).
+    signals: BatchSignals tinh san (vd. dung lai khi chay nhieu lan), mac dinh tu tinh.
+    spread: spread co dinh (USD); mac dinh lay cot 'spread' cua tung nen M15 * point.
+    params: ghi de tham so (xem TRADE_PARAMS), vd. {'base_score': 40, 'tp_usd': [3, 6, 10, 15],
+            'factor_weights': {'F8': 0}}; mac dinh giu nguyen gia tri trong trade.py.
+    Returns BacktestResult.
+    """
+    params = params or {}
+    profile = get_profile(symbol)  # Sai so factor / SL / TP cua symbol (giong runner)
+    if signals is None:
+        signals = evaluate_signals_batch(rates_m15, rates_h4, rates_h1, rates_m30, profile=profile)
+    if params.get('factor_weights'):
+        signals = signals.weighted(params['factor_weights'])
+
+    broker = SimBroker(symbol, balance, point=point)
+    be = be_manager.BEManager(symbol, profile)
+
+    times = rates_m15['time'].tolist()
+    opens = rates_m15['open'].tolist()
+    highs = rates_m15['high'].tolist()
+    lows = rates_m15['low'].tolist()
+    closes = rates_m15['close'].tolist()
+    if spread is None:
+        spreads = (rates_m15['spread'] * point).tolist()
+    else:
+        spreads = [spread] * len(times)
+
+    signal_times = signals.time.tolist()
+    signal_buy = signals.buy_score.tolist()
+    signal_sell = signals.sell_score.tolist()
+
+    equity = np.empty(len(times))
+    accumulated_score = Signal()
+    clusters = 0
+    k = 0
+
+    with _simulated(broker, params.get('base_score', trade.BASE_SCORE)):
+        manager = trade.TradeManager(balance, profile)
+        manager.symbol = symbol
+        for name in TRADE_PARAMS:
+            if name in params:
+                setattr(manager, name, list(params[name]))
+        trade._trade_managers[symbol] = manager
+        be.tp_levels = manager.tp_usd
+
+        for j, t in enumerate(times):
+            broker.open_bar(t, opens[j], spreads[j])
+
+            # Nen H1 moi -> tich luy diem + process_trade (giong main.py)
+            while k < len(signal_times) and signal_times[k] <= t:
+                accumulated_score.buy_score += signal_buy[k]
+                accumulated_score.sell_score += signal_sell[k]
+                if trade.process_trade(symbol, accumulated_score):
+                    accumulated_score = Signal()
+                    clusters += 1
+                k += 1
+
+            broker.run_bar(opens[j], highs[j], lows[j], closes[j])
+            be.check_and_manage_be()
+            equity[j] = broker.equity()
+
+    return BacktestResult(broker, balance, rates_m15['time'], equity, clusters)
+
+
+# ========== CHAY TU DONG LENH ==========
+if __name__ == "__main__":
+    import MetaTrader5 as mt5
+
+    if len(sys.argv) < 3:
+        print("Cach dung: python backtest.py YYYY-MM-DD YYYY-MM-DD [SYMBOL]")
+        sys.exit(1)
+
+    date_from = datetime.strptime(sys.argv[1], "%Y-%m-%d")
+    date_to = datetime.strptime(sys.argv[2], "%Y-%m-%d")
+    symbol = sys.argv[3] if len(sys.argv) > 3 else "XAUUSD"
+
+    if not mt5.initialize():
+        print("Khong the ket noi MT5:", mt5.last_error())
+        sys.exit(1)
+
+    rates = {}
+    for name, tf in (('m15', mt5.TIMEFRAME_M15), ('h4', mt5.TIMEFRAME_H4),
+                     ('h1', mt5.TIMEFRAME_H1), ('m30', mt5.TIMEFRAME_M30)):
+        rates[name] = mt5.copy_rates_range(symbol, tf, date_from, date_to)
+        if rates[name] is None:
+            print(f"Khong lay duoc du lieu {name}:", mt5.last_error())
+            sys.exit(1)
+    mt5.shutdown()
+
+    result = run_backtest(rates['m15'], rates['h4'], rates['h1'], rates['m30'], symbol=symbol)
+    summary = result.summary()
+    print(f"=== Backtest {symbol} {sys.argv[1]} -> {sys.argv[2]} ===")
+    print(f"Clusters: {summary['clusters']} | Trades: {summary['trades']}")
+    print(f"Net P&L: {summary['net_pnl']:.2f} | Max DD: {summary['max_drawdown']:.2f}")
+    print(f"Open positions: {summary['open_positions']} | Pending orders: {summary['pending_orders']}")
+    for et, s in summary['by_et'].items():
+        print(f"  ET{et}: {s['trades']} trades | win {s['win_rate']*100:.1f}% | P&L {s['pnl']:.2f}")
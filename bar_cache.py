@@ -0,0 +1,98 @@
+"""
+Bar cache - luu nen da dong cua tung symbol/khung ra file, chi lay tu MT5 cac nen moi
+
+Logic:
+- Khoi dong: doc file .npy (vai ms), lan dau chua co file moi tai `keep` nen tu MT5
+- Moi lan update: copy_rates_range tu time nen cuoi da luu -> chi cac nen moi + nen dang chay
+- Nen dang chay (nen cuoi MT5 tra ve) khong luu, chi dung lam moc "hien tai"
+- Ghi file (tmp + os.replace) khi co nen moi dong
+"""
+
+import os
+import time
+
+import numpy as np
+from mt5_gate import mt5
+
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bar_cache")
+
+TIMEFRAMES = {
+    'm1': mt5.TIMEFRAME_M1,
+    'm15': mt5.TIMEFRAME_M15,
+    'm30': mt5.TIMEFRAME_M30,
+    'h1': mt5.TIMEFRAME_H1,
+    'h4': mt5.TIMEFRAME_H4,
+}
+
+
+class BarCache:
+    """
+    Nen da dong cua 1 symbol/khung (structured array giong copy_rates_*).
+
+    keep: so nen toi da giu (va so nen tai lan dau).
+    directory: thu muc luu file; None = chi giu trong bo nho.
+    """
+    def __init__(self, symbol, tf, keep, directory=CACHE_DIR):
+        self.symbol = symbol
+        self.tf = tf
+        self.keep = keep
+        self.path = os.path.join(directory, f"{symbol}_{tf}.npy") if directory else None
+        self.rates = self._load()
+        self.now = None  # time cua nen dang chay o lan update gan nhat
+
+    def _load(self):
+        if self.path is None or not os.path.exists(self.path):
+            return None
+        try:
+            rates = np.load(self.path)
+        except (OSError, ValueError):
+            return None
+        if rates.dtype.names is None or 'time' not in rates.dtype.names or len(rates) == 0:
+            return None
+        return rates[-self.keep:]
+
+    def _save(self):
+        if self.path is None:
+            return
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, 'wb') as f:
+            np.save(f, self.rates)
+        os.replace(tmp, self.path)
+
+    def update(self):
+        """
+        Lay cac nen moi tu MT5 (lan dau: `keep` nen).
+        Returns True neu thanh cong (self.rates = nen da dong, self.now = time nen dang chay).
+        """
+        timeframe = TIMEFRAMES[self.tf]
+        fresh = None
+        if self.rates is not None:
+            # Tu nen cuoi da luu (gom ca no de kiem tra noi tiep) toi hien tai;
+            # gio server co the lech UTC vai gio nen date_to lay du xa
+            last = int(self.rates['time'][-1])
+            fresh = mt5.copy_rates_range(self.symbol, timeframe, last, int(time.time()) + 7 * 86400)
+            if fresh is not None and len(fresh) and fresh['time'][0] != last:
+                fresh = None  # Khong noi duoc voi du lieu da luu -> tai lai toan bo
+        if fresh is None or len(fresh) == 0:
+            fresh = mt5.copy_rates_from_pos(self.symbol, timeframe, 0, self.keep + 1)
+            if fresh is None or len(fresh) == 0:
+                return False
+            self.rates = None
+
+        self.now = int(fresh['time'][-1])
+        closed = fresh[:-1]
+        if self.rates is None:
+            self.rates = closed
+            self._save()
+        elif len(closed) > 1:
+            # closed[0] = nen cuoi da luu, phan con lai la nen moi dong
+            old = self.rates[self.rates['time'] < closed['time'][0]]
+            self.rates = np.concatenate([old, closed])[-self.keep:]
+            self._save()
+        return True
+
+    def tail(self, count):
+        """`count` nen da dong gan nhat."""
+        return self.rates[-count:]
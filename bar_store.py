@@ -0,0 +1,181 @@
+"""
+Bar store - kho nen dang cot tren dia (nhieu nam M1/M15) doc bang memory map
+
+Logic:
+- Moi symbol/khung 1 thu muc, moi cot (time/open/high/low/close/tick_volume/spread)
+  1 file nhi phan, meta.json giu so nen da ghi xong
+- Chi ghi them vao cuoi (time tang dan); so nen trong meta cap nhat sau cung
+  nen ghi do dang (mat dien...) khong lam hong du lieu cu
+- Doc bang np.memmap: cot / lat cat la view numpy, khong copy, khong giai ma
+- Tim khoang thoi gian bang searchsorted tren cot time: O(log n)
+
+Cach dung:
+    store = BarStore("history/XAUUSD_m1")
+    rates = store.range(from_time, to_time)   # dung truc tiep cho evaluate_signals_batch / run_backtest
+    python bar_store.py XAUUSD m1 2018-01-01 [2024-01-01]   # tai lich su tu MT5 vao kho
+"""
+
+import os
+import sys
+import json
+from datetime import datetime
+
+import numpy as np
+
+
+COLUMNS = (
+    ('time', '<i8'),
+    ('open', '<f8'),
+    ('high', '<f8'),
+    ('low', '<f8'),
+    ('close', '<f8'),
+    ('tick_volume', '<u8'),
+    ('spread', '<i4'),
+)
+
+
+class BarSlice:
+    """
+    Lat cat [start, stop) cua BarStore - dung nhu structured array cua MT5:
+    rates['close'] -> view numpy, rates[a:b] -> BarSlice, len(rates), rates.dtype.
+    """
+    def __init__(self, columns, dtype, start, stop):
+        self._columns = columns
+        self.dtype = dtype
+        self.start = start
+        self.stop = stop
+
+    def __len__(self):
+        return self.stop - self.start
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            return self._columns[key][self.start:self.stop]
+        if isinstance(key, slice):
+            start, stop, step = key.indices(len(self))
+            if step != 1:
+                raise ValueError("BarSlice chi ho tro lat cat lien tiep")
+            return BarSlice(self._columns, self.dtype, self.start + start, self.start + max(start, stop))
+        raise TypeError(f"Khong ho tro index {key!r}")
+
+    def to_records(self):
+        """Copy ra structured array (vd. de ghi file / gui di)."""
+        out = np.empty(len(self), dtype=self.dtype)
+        for name in self.dtype.names:
+            out[name] = self[name]
+        return out
+
+
+class BarStore:
+    """
+    Kho nen dang cot cua 1 symbol/khung trong thu muc `path` (tu tao neu chua co).
+    """
+    def __init__(self, path):
+        self.path = path
+        self.dtype = np.dtype(list(COLUMNS))
+        os.makedirs(path, exist_ok=True)
+        meta_path = os.path.join(path, "meta.json")
+        if os.path.exists(meta_path):
+            with open(meta_path) as f:
+                self.count = json.load(f)['count']
+        else:
+            self.count = 0
+        self._map()
+
+    def _file(self, name):
+        return os.path.join(self.path, f"{name}.bin")
+
+    def _map(self):
+        self.columns = {}
+        for name, kind in COLUMNS:
+            if self.count:
+                self.columns[name] = np.memmap(self._file(name), dtype=kind, mode='r', shape=(self.count,))
+            else:
+                self.columns[name] = np.empty(0, dtype=kind)
+
+    def __len__(self):
+        return self.count
+
+    def append(self, rates):
+        """
+        Ghi them nen (structured array co cac cot trong COLUMNS, vd. tu mt5.copy_rates_range).
+        Nen co time <= nen cuoi trong kho bi bo qua. Returns so nen da ghi them.
+        """
+        if len(rates) == 0:
+            return 0
+        if self.count:
+            rates = rates[rates['time'] > self.columns['time'][-1]]
+            if len(rates) == 0:
+                return 0
+        if np.any(np.diff(rates['time']) <= 0):
+            raise ValueError("time phai tang dan")
+
+        for name, kind in COLUMNS:
+            values = np.ascontiguousarray(rates[name], dtype=kind)
+            with open(self._file(name), 'ab') as f:
+                # Bo phan du cua lan ghi do dang truoc do (neu co)
+                f.truncate(self.count * values.itemsize)
+                f.write(values.tobytes())
+
+        self.count += len(rates)
+        tmp = os.path.join(self.path, "meta.json.tmp")
+        with open(tmp, 'w') as f:
+            json.dump({'count': self.count, 'columns': [list(c) for c in COLUMNS]}, f)
+        os.replace(tmp, os.path.join(self.path, "meta.json"))
+        self._map()
+        return len(rates)
+
+    def index(self, time, side='left'):
+        """Vi tri cua `time` trong cot time (searchsorted, O(log n))."""
+        return int(np.searchsorted(self.columns['time'], time, side=side))
+
+    def range(self, start=None, end=None):
+        """Cac nen co start <= time < end (None = tu dau / den cuoi)."""
+        lo = 0 if start is None else self.index(start)
+        hi = self.count if end is None else self.index(end)
+        return BarSlice(self.columns, self.dtype, lo, max(lo, hi))
+
+    def tail(self, count):
+        """`count` nen cuoi."""
+        return BarSlice(self.columns, self.dtype, max(0, self.count - count), self.count)
+
+    def __getitem__(self, key):
+        return BarSlice(self.columns, self.dtype, 0, self.count)[key]
+
+
+# ========== CHAY TU DONG LENH: TAI LICH SU TU MT5 ==========
+if __name__ == "__main__":
+    import MetaTrader5 as mt5
+    from bar_cache import TIMEFRAMES
+
+    if len(sys.argv) < 4:
+        print("Cach dung: python bar_store.py SYMBOL m1|m15|m30|h1|h4 YYYY-MM-DD [YYYY-MM-DD]")
+        sys.exit(1)
+
+    symbol, tf = sys.argv[1], sys.argv[2]
+    date_from = datetime.strptime(sys.argv[3], "%Y-%m-%d")
+    date_to = datetime.strptime(sys.argv[4], "%Y-%m-%d") if len(sys.argv) > 4 else datetime.now()
+
+    if not mt5.initialize():
+        print("Khong the ket noi MT5:", mt5.last_error())
+        sys.exit(1)
+
+    store = BarStore(os.path.join("history", f"{symbol}_{tf}"))
+    start = int(date_from.timestamp())
+    if len(store):
+        start = max(start, int(store.columns['time'][-1]) + 1)
+    end = int(date_to.timestamp())
+
+    # Tai tung doan 30 ngay de khong vuot gioi han so nen cua terminal
+    step = 30 * 86400
+    while start < end:
+        rates = mt5.copy_rates_range(symbol, TIMEFRAMES[tf], start, min(start + step, end))
+        if rates is None:
+            print("Khong lay duoc du lieu:", mt5.last_error())
+            break
+        if len(sys.argv) <= 4 and start + step >= end:
+            rates = rates[:-1]  # Nen cuoi dang chay, chua dong
+        added = store.append(rates)
+        print(f"{datetime.fromtimestamp(start):%Y-%m-%d}: +{added} nen (tong {len(store)})")
+        start += step
+    mt5.shutdown()
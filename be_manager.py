@@ -1,5 +1,7 @@
-import MetaTrader5 as mt5
+from mt5_gate import mt5
 from telegram_bot import log, flush_logs
+from deals import DealTracker
+from profiles import DEFAULT_PROFILE, get_profile
 
 """
 BE Manager - Quan ly keo Break Even khi cac ET chot loi
@@ -9,22 +11,45 @@ Logic:
 - ET2 chot loi (TP2) -> Keo SL cac ET con lai ve TP1
 - ET3 chot loi (TP3) -> Keo SL cac ET con lai ve TP2
 - ET4 chot loi (TP4) -> Ket thuc
+- Chot loi = deal dong lenh co ly do TP (DealTracker); ET dong do SL / dong tay khong keo BE,
+  ET limit chua khop khong tinh la da dong
 
 Magic numbers: 1001=ET1, 1002=ET2, 1003=ET3, 1004=ET4
 """
 
 class BEManager:
-    def __init__(self, symbol="XAUUSD"):
+    def __init__(self, symbol="XAUUSD", profile=None):
         self.symbol = symbol
+        self.profile = profile or DEFAULT_PROFILE
         self.magic_numbers = [1001, 1002, 1003, 1004]
         
+        # TP levels theo profile symbol (giong TradeManager.tp_usd), XAUUSD: TP1=3, TP2=5, TP3=10, TP4=15
+        self.tp_levels = list(self.profile.tp_usd)
+        
         # Luu tru thong tin cluster dang hoat dong
         # Format: {magic: {'entry_price': x, 'tp': y, 'type': 'buy'/'sell'}}
         self.cluster_info = {}
         
-        # Theo doi ET nao da chot loi
+        # Theo doi ET nao da dong (chot loi / SL / dong tay)
         self.closed_ets = set()
         
+        # Deal moi cua cac ET (thay vi quet positions moi lan kiem tra)
+        self.deals = DealTracker(symbol, self.magic_numbers)
+        
+    def snapshot(self):
+        """Trang thai cluster/ET da chot (JSON) de khoi phuc sau khi khoi dong lai"""
+        return {
+            'cluster_info': {str(magic): info for magic, info in self.cluster_info.items()},
+            'closed_ets': sorted(self.closed_ets),
+            'deals': self.deals.snapshot(),
+        }
+    
+    def restore(self, state):
+        self.cluster_info = {int(magic): info for magic, info in state['cluster_info'].items()}
+        self.closed_ets = set(state['closed_ets'])
+        if state.get('deals') is not None:
+            self.deals.restore(state['deals'])
+    
     def get_positions_by_magic(self, magic):
         """Lay position theo magic number"""
         positions = mt5.positions_get(symbol=self.symbol)
@@ -65,39 +90,34 @@ class BEManager:
         Kiem tra va keo BE khi can thiet.
         Goi ham nay trong vong lap chinh.
         """
-        # Lay tat ca positions hien tai
-        current_positions = self.get_all_et_positions()
-        current_magics = set(p.magic for p in current_positions)
-        
-        # Neu khong co position nao, reset
-        if not current_positions:
-            if self.cluster_info:
-                log("[BE] Cluster da dong het, reset trang thai")
-                self.cluster_info = {}
-                self.closed_ets = set()
-            return
-        
-        # Xac dinh loai lenh (buy/sell) tu position dau tien
-        first_pos = current_positions[0]
-        is_buy = first_pos.type == mt5.POSITION_TYPE_BUY
-        
-        # Kiem tra tung ET da chot loi chua
-        for i, magic in enumerate(self.magic_numbers):
-            et_num = i + 1
+        # Chi doc deal moi (khong co deal moi -> khong goi them MT5)
+        for event in self.deals.poll():
+            magic = event.magic
+            et_num = magic - 1000
             
-            # Neu ET nay da duoc xu ly roi, bo qua
-            if magic in self.closed_ets:
+            # ET mo lai (cluster moi)
+            if event.kind == 'open':
+                self.closed_ets.discard(magic)
                 continue
             
-            # Neu ET nay khong con trong positions (da dong)
-            if magic not in current_magics:
-                # Danh dau da chot loi
-                self.closed_ets.add(magic)
-                log(f"[BE] ET{et_num} da chot loi!")
-                
-                # Keo BE cho cac ET con lai
-                self._apply_be_logic(et_num, is_buy, current_positions)
-                flush_logs()
+            self.closed_ets.add(magic)
+            
+            if event.kind != 'tp':
+                reason = "SL" if event.kind == 'sl' else "dong tay"
+                log(f"[BE] ET{et_num} da dong ({reason} @ {event.price}), khong keo BE")
+                continue
+            
+            log(f"[BE] ET{et_num} da chot loi!")
+            
+            # Keo BE cho cac ET con lai
+            self._apply_be_logic(et_num, event.type == 'buy', self.get_all_et_positions())
+            flush_logs()
+        
+        # Khong con ET nao mo -> reset
+        if not self.deals.legs and (self.cluster_info or self.closed_ets):
+            log("[BE] Cluster da dong het, reset trang thai")
+            self.cluster_info = {}
+            self.closed_ets = set()
     
     def _apply_be_logic(self, closed_et, is_buy, current_positions):
         """
@@ -109,8 +129,8 @@ class BEManager:
         
         TP cua cac ET van giu nguyen!
         """
-        # TP levels tu trade.py: [3, 5, 10, 15]
-        tp_levels = [3, 5, 10, 15]  # TP1=3, TP2=5, TP3=10, TP4=15
+        tp_levels = self.tp_levels
+        digits = self.profile.digits
         
         remaining_positions = [p for p in current_positions 
                               if p.magic not in self.closed_ets]
@@ -131,17 +151,17 @@ class BEManager:
             elif closed_et == 2:
                 # ET2 chot -> Keo SL ve TP1 (entry +/- 3 USD)
                 if is_buy:
-                    new_sl = round(entry_price + tp_levels[0], 2)
+                    new_sl = round(entry_price + tp_levels[0], digits)
                 else:
-                    new_sl = round(entry_price - tp_levels[0], 2)
+                    new_sl = round(entry_price - tp_levels[0], digits)
                 action = f"TP1 (+{tp_levels[0]})"
                 
             elif closed_et == 3:
                 # ET3 chot -> Keo SL ve TP2 (entry +/- 5 USD)
                 if is_buy:
-                    new_sl = round(entry_price + tp_levels[1], 2)
+                    new_sl = round(entry_price + tp_levels[1], digits)
                 else:
-                    new_sl = round(entry_price - tp_levels[1], 2)
+                    new_sl = round(entry_price - tp_levels[1], digits)
                 action = f"TP2 (+{tp_levels[1]})"
                 
             else:
@@ -165,18 +185,17 @@ class BEManager:
                         log(f"  [BE] ET{et_num}: FAILED to move SL to {new_sl}")
 
 
-# Global instance
-_be_manager = None
+# BE Manager cua tung symbol
+_be_managers = {}
 
-def get_be_manager(symbol="XAUUSD"):
-    """Lay hoac tao BE Manager"""
-    global _be_manager
-    if _be_manager is None:
-        _be_manager = BEManager(symbol)
-    return _be_manager
+def get_be_manager(symbol="XAUUSD", profile=None):
+    """Lay hoac tao BE Manager cua symbol (profile mac dinh theo symbol, ValueError neu chua co)"""
+    if symbol not in _be_managers:
+        _be_managers[symbol] = BEManager(symbol, profile or get_profile(symbol))
+    return _be_managers[symbol]
 
-def check_be():
+def check_be(symbol="XAUUSD"):
     """Ham goi trong vong lap chinh de kiem tra BE"""
-    manager = get_be_manager()
+    manager = get_be_manager(symbol)
     manager.check_and_manage_be()
 
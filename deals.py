@@ -0,0 +1,125 @@
+"""
+Deals - theo doi lenh cua cluster qua lich su deal MT5 (chi lay deal moi)
+
+Logic:
+- Moi lan poll: history_deals_get tu thoi diem deal cuoi da thay, bo cac ticket <= ticket cuoi
+  (ticket deal tang dan) -> moi deal chi xu ly 1 lan, khong quet lai toan bo positions
+- Deal vao lenh (DEAL_ENTRY_IN) cua magic cluster -> them leg (theo position id va magic)
+- Deal dong lenh -> su kien dong theo ly do cua broker: 'tp' (DEAL_REASON_TP), 'sl'
+  (DEAL_REASON_SL / DEAL_REASON_SO), con lai la 'manual' (dong tay, EA khac...)
+- Lenh limit chua khop khong co deal -> khong bi coi la da dong
+- Lan dau (chua co con tro): leg lay tu positions_get, con tro dat o deal moi nhat, khong phat su kien
+"""
+
+from collections import namedtuple
+
+from mt5_gate import mt5
+from telegram_bot import log
+
+
+# Moc cuoi khi hoi lich su deal (2100-01-01): gio server co the lech gio may nhieu gio
+FAR_FUTURE = 4102444800
+
+# Lan dau: lay deal trong BOOTSTRAP_SECONDS giay gan nhat (gio server) de dat con tro
+BOOTSTRAP_SECONDS = 86400
+
+# kind: 'open' | 'tp' | 'sl' | 'manual'; type: 'buy' / 'sell' (chieu cua leg)
+DealEvent = namedtuple('DealEvent', 'kind magic position type price volume profit time')
+
+
+class DealTracker:
+    """
+    Cac leg dang mo cua cluster (magic trong `magics`) cap nhat tu deal moi.
+
+    legs: {position id: {'magic', 'type', 'price', 'volume'}}.
+    """
+    def __init__(self, symbol, magics):
+        self.symbol = symbol
+        self.magics = set(magics)
+        self.legs = {}
+        self.last_ticket = None  # None = chua bootstrap
+        self.last_time = 0
+
+    def by_magic(self, magic):
+        """Position id cac leg dang mo cua magic."""
+        return [position for position, leg in self.legs.items() if leg['magic'] == magic]
+
+    def snapshot(self):
+        return {
+            'legs': {str(position): leg for position, leg in self.legs.items()},
+            'last_ticket': self.last_ticket,
+            'last_time': self.last_time,
+        }
+
+    def restore(self, state):
+        self.legs = {int(position): leg for position, leg in state['legs'].items()}
+        self.last_ticket = state['last_ticket']
+        self.last_time = state['last_time']
+
+    def _bootstrap(self):
+        """Dat con tro o deal moi nhat. Returns False (giu last_ticket None, lan sau thu lai) neu MT5 loi."""
+        positions = mt5.positions_get(symbol=self.symbol)
+        tick = mt5.symbol_info_tick(self.symbol)
+        if positions is None or tick is None:
+            return False
+        since = max(0, int(tick.time) - BOOTSTRAP_SECONDS)
+        deals = mt5.history_deals_get(since, FAR_FUTURE)
+        if deals is None:  # Loi IPC, khong phai "khong co deal" -> con tro 0 se phat lai deal cu
+            return False
+        self.legs = {
+            p.ticket: {'magic': p.magic, 'type': 'buy' if p.type == mt5.POSITION_TYPE_BUY else 'sell',
+                       'price': p.price_open, 'volume': p.volume}
+            for p in positions if p.magic in self.magics
+        }
+        self.last_ticket = max((d.ticket for d in deals), default=0)
+        self.last_time = max([since] + [d.time for d in deals])
+        return True
+
+    def poll(self):
+        """Doc deal moi tu lan truoc. Returns danh sach DealEvent theo thu tu ticket."""
+        if self.last_ticket is None:
+            if not self._bootstrap():
+                log(f"[Deals] {self.symbol}: chua doc duoc lich su deal, thu lai lan sau")
+            return []
+
+        deals = mt5.history_deals_get(self.last_time, FAR_FUTURE)
+        if not deals:
+            return []
+
+        events = []
+        for deal in sorted((d for d in deals if d.ticket > self.last_ticket), key=lambda d: d.ticket):
+            self.last_ticket = deal.ticket
+            self.last_time = max(self.last_time, deal.time)
+            if deal.symbol != self.symbol:
+                continue
+            event = self._apply(deal)
+            if event is not None:
+                events.append(event)
+        return events
+
+    def _apply(self, deal):
+        if deal.entry == mt5.DEAL_ENTRY_IN:
+            if deal.magic not in self.magics:
+                return None
+            leg = {'magic': deal.magic, 'type': 'buy' if deal.type == mt5.DEAL_TYPE_BUY else 'sell',
+                   'price': deal.price, 'volume': deal.volume}
+            self.legs[deal.position_id] = leg
+            return DealEvent('open', deal.magic, deal.position_id, leg['type'], deal.price, deal.volume,
+                             deal.profit, deal.time)
+
+        leg = self.legs.get(deal.position_id)
+        if leg is None:
+            return None
+        leg['volume'] = round(leg['volume'] - deal.volume, 8)
+        if leg['volume'] > 0:
+            return None  # Dong 1 phan
+        del self.legs[deal.position_id]
+
+        if deal.reason == mt5.DEAL_REASON_TP:
+            kind = 'tp'
+        elif deal.reason in (mt5.DEAL_REASON_SL, mt5.DEAL_REASON_SO):
+            kind = 'sl'
+        else:
+            kind = 'manual'
+        return DealEvent(kind, leg['magic'], deal.position_id, leg['type'], deal.price, deal.volume,
+                         deal.profit, deal.time)
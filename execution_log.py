@@ -0,0 +1,109 @@
+"""
+Execution log - do tre va truot gia cua tung lenh ET1-ET4
+
+Logic:
+- Moi lenh 1 ban ghi: thoi gian tu luc quyet dinh vao lenh toi luc goi order_send
+  (decide_us), tu luc gui toi luc broker tra loi (send_ms), gia yeu cau / gia khop,
+  truot gia (USD, duong = bat loi: BUY khop cao hon / SELL khop thap hon)
+- Moc thoi gian lay tu time.perf_counter (monotonic), khong bi anh huong khi chinh gio may
+- Ghi noi tiep ra file JSON lines (1 dong / lenh, 1 lan write -> nhieu process cung ghi
+  1 file khong xen dong) de phan tich sau
+- Giu `window` mau gan nhat cua tung ET -> p50/p90/max de log sau moi cluster
+"""
+
+import json
+import time
+from collections import deque
+
+import numpy as np
+
+from telegram_bot import log
+
+
+METRICS = ('decide_us', 'send_ms', 'slippage')
+
+
+class ExecutionLog:
+    """
+    Ghi / thong ke ket qua khop lenh.
+
+    path: file JSON lines (None = chi giu thong ke trong bo nho).
+    """
+    def __init__(self, path=None, window=200):
+        self.path = path
+        self.window = window
+        self.samples = {}  # (ET, metric) -> deque `window` mau gan nhat
+
+    def record(self, entry):
+        """Them 1 ban ghi (dict JSON, co 'leg' va cac METRICS co the la None)."""
+        for metric in METRICS:
+            value = entry.get(metric)
+            if value is not None:
+                key = (entry['leg'], metric)
+                if key not in self.samples:
+                    self.samples[key] = deque(maxlen=self.window)
+                self.samples[key].append(value)
+
+        if self.path is None:
+            return
+        try:
+            with open(self.path, 'a') as f:
+                f.write(json.dumps(entry, separators=(',', ':')) + "\n")
+        except OSError as e:
+            log(f"Khong ghi duoc execution log: {e}")
+
+    def stats(self, leg, metric):
+        """(p50, p90, max, so mau) cua metric cho ET `leg`, None neu chua co mau."""
+        values = self.samples.get((leg, metric))
+        if not values:
+            return None
+        values = np.fromiter(values, dtype=float, count=len(values))
+        p50, p90 = np.percentile(values, [50, 90])
+        return p50, p90, values.max(), len(values)
+
+    def summary(self):
+        """Cac dong log tom tat theo ET: gui (ms), truot gia (USD)."""
+        lines = []
+        for leg in sorted({leg for leg, _ in self.samples}):
+            parts = []
+            send = self.stats(leg, 'send_ms')
+            if send is not None:
+                parts.append(f"gui p50={send[0]:.0f} p90={send[1]:.0f} max={send[2]:.0f}ms (n={send[3]})")
+            slip = self.stats(leg, 'slippage')
+            if slip is not None:
+                parts.append(f"truot p50={slip[0]:+.2f} p90={slip[1]:+.2f} max={slip[2]:+.2f}$")
+            if parts:
+                lines.append(f"  ET{leg}: " + " | ".join(parts))
+        return lines
+
+
+def leg_entry(symbol, leg, side, market, request, result, decided, sent, acked, done, retry=0):
+    """
+    Ban ghi cho 1 lenh: request/result cua order_send, cac moc perf_counter
+    (decided: luc quyet dinh vao lenh, sent/acked: truoc/sau order_send).
+    done: broker bao da khop (TRADE_RETCODE_DONE); lenh bi tu choi (requote...) van co gia
+    bao trong result.price nhung khong phai gia khop.
+    Truot gia chi tinh cho lenh thi truong (market); lenh limit khop sau, khong co gia khop.
+    retry: lan gui lai thu may (0 = lan dau).
+    """
+    requested = request["price"]
+    filled = result.price if done and getattr(result, 'price', 0) else None
+    slippage = None
+    if filled is not None and market:
+        slippage = round((filled - requested) if side == "BUY" else (requested - filled), 5)
+    return {
+        'time': time.time(),
+        'symbol': symbol,
+        'leg': leg,
+        'side': side,
+        'volume': request["volume"],
+        'requested': requested,
+        'filled': filled,
+        'slippage': slippage,
+        'decide_us': round((sent - decided) * 1e6, 1),
+        'send_ms': round((acked - sent) * 1000, 3),
+        'retry': retry,
+        'retcode': result.retcode if result is not None else None,
+        'order': getattr(result, 'order', None),
+        'deal': getattr(result, 'deal', None),
+    }
@@ -1,3 +1,6 @@
+from collections import deque
+
+
 def calculate_sma(prices, period):
     """
     Calculate Simple Moving Average.
@@ -59,3 +62,334 @@ def calculate_rsi(prices, period=14):
     rsi = 100 - (100 / (1 + rs))
     
     return rsi
+
+
+class SMA:
+    """
+    Streaming Simple Moving Average - moi lan update 1 gia, O(1) moi nen.
+    value = None khi chua du `period` gia.
+    """
+    def __init__(self, period):
+        self.period = period
+        self.window = deque(maxlen=period)
+        self.total = 0
+        self.value = None
+    
+    def update(self, price):
+        if len(self.window) == self.period:
+            self.total -= self.window[0]
+        self.window.append(price)
+        self.total += price
+        if len(self.window) == self.period:
+            self.value = self.total / self.period
+        return self.value
+    
+    def snapshot(self):
+        return {'period': self.period, 'window': list(self.window), 'total': self.total, 'value': self.value}
+    
+    def restore(self, state):
+        self.period = state['period']
+        self.window = deque(state['window'], maxlen=self.period)
+        self.total = state['total']
+        self.value = state['value']
+
+
+class EMA:
+    """
+    Streaming Exponential Moving Average - moi lan update 1 gia, O(1) moi nen.
+    seed='first': EMA bat dau tu gia dau tien (giong strategy.calculate_ema_array).
+    seed='sma': EMA bat dau tu SMA cua `period` gia dau (giong calculate_ema).
+    """
+    def __init__(self, period, seed='first'):
+        self.period = period
+        self.seed = seed
+        self.alpha = 2 / (period + 1)
+        self.count = 0
+        self.seed_sum = 0
+        self.value = None
+    
+    def update(self, price):
+        self.count += 1
+        if self.seed == 'sma' and self.count <= self.period:
+            self.seed_sum += price
+            if self.count == self.period:
+                self.value = self.seed_sum / self.period
+        elif self.value is None:
+            self.value = price
+        else:
+            self.value = self.value + self.alpha * (price - self.value)
+        return self.value
+    
+    def snapshot(self):
+        return {'period': self.period, 'seed': self.seed, 'count': self.count,
+                'seed_sum': self.seed_sum, 'value': self.value}
+    
+    def restore(self, state):
+        self.period = state['period']
+        self.seed = state['seed']
+        self.alpha = 2 / (self.period + 1)
+        self.count = state['count']
+        self.seed_sum = state['seed_sum']
+        self.value = state['value']
+
+
+class RSI:
+    """
+    Streaming Wilder RSI - moi lan update 1 gia, O(1) moi nen.
+    Gia tri dau tien co sau period + 1 gia (giong calculate_rsi/calculate_rsi_array).
+    """
+    def __init__(self, period=14):
+        self.period = period
+        self.count = 0
+        self.prev = None
+        self.gain_sum = 0
+        self.loss_sum = 0
+        self.avg_gain = None
+        self.avg_loss = None
+        self.value = None
+    
+    def update(self, price):
+        prev = self.prev
+        self.prev = price
+        self.count += 1
+        if prev is None:
+            return self.value
+        
+        diff = price - prev
+        if self.avg_gain is None:
+            # Giai doan seed: trung binh cong `period` bien dong dau tien
+            if diff >= 0:
+                self.gain_sum += diff
+            else:
+                self.loss_sum += -diff
+            if self.count == self.period + 1:
+                self.avg_gain = self.gain_sum / self.period
+                self.avg_loss = self.loss_sum / self.period
+                self.value = self._rsi()
+            return self.value
+        
+        gain = diff if diff > 0 else 0
+        loss = -diff if diff < 0 else 0
+        self.avg_gain = (self.avg_gain * (self.period - 1) + gain) / self.period
+        self.avg_loss = (self.avg_loss * (self.period - 1) + loss) / self.period
+        self.value = self._rsi()
+        return self.value
+    
+    def _rsi(self):
+        if self.avg_loss == 0:
+            return 100
+        if self.avg_gain == 0:
+            return 0
+        return 100 - 100 / (1 + self.avg_gain / self.avg_loss)
+    
+    def snapshot(self):
+        return {'period': self.period, 'count': self.count, 'prev': self.prev,
+                'gain_sum': self.gain_sum, 'loss_sum': self.loss_sum,
+                'avg_gain': self.avg_gain, 'avg_loss': self.avg_loss, 'value': self.value}
+    
+    def restore(self, state):
+        self.period = state['period']
+        self.count = state['count']
+        self.prev = state['prev']
+        self.gain_sum = state['gain_sum']
+        self.loss_sum = state['loss_sum']
+        self.avg_gain = state['avg_gain']
+        self.avg_loss = state['avg_loss']
+        self.value = state['value']
+
+
+class RollingMax:
+    """
+    Max cua `period` gia gan nhat (cua so truot) - deque don dieu, O(1) khau hao moi nen.
+    update tra ve (gia tri, index), index = so thu tu cua gia do (tu 0, tinh tu gia dau tien);
+    nhieu gia bang nhau -> lay gia den truoc (giong argmax). None khi chua du `period` gia.
+    """
+    lows = False
+    
+    def __init__(self, period):
+        self.period = period
+        self.count = 0
+        self.window = deque()  # (index, gia) - gia giam dan (RollingMin: tang dan) tu dau den cuoi
+        self.value = None
+    
+    def update(self, price):
+        window = self.window
+        if self.lows:
+            while window and window[-1][1] > price:
+                window.pop()
+        else:
+            while window and window[-1][1] < price:
+                window.pop()
+        window.append((self.count, price))
+        self.count += 1
+        
+        # Bo cuc tri da ra khoi cua so
+        if window[0][0] < self.count - self.period:
+            window.popleft()
+        if self.count >= self.period:
+            index, extreme = window[0]
+            self.value = (extreme, index)
+        return self.value
+    
+    def snapshot(self):
+        return {'period': self.period, 'count': self.count,
+                'window': [list(item) for item in self.window],
+                'value': list(self.value) if self.value is not None else None}
+    
+    def restore(self, state):
+        self.period = state['period']
+        self.count = state['count']
+        self.window = deque(tuple(item) for item in state['window'])
+        self.value = tuple(state['value']) if state['value'] is not None else None
+
+
+class RollingMin(RollingMax):
+    """Min cua `period` gia gan nhat - giong RollingMax."""
+    lows = True
+
+
+def _concave(left, mid, right):
+    """mid nam tren doan left-right (bao loi tren giu duoc mid)."""
+    return (mid[1] - left[1]) * (right[0] - mid[0]) > (right[1] - mid[1]) * (mid[0] - left[0])
+
+
+def _hull_best(hull, slope):
+    """Dinh cua bao loi tren co y - slope * x lon nhat (ham lom theo thu tu dinh -> chia doi)."""
+    lo, hi = 0, len(hull) - 1
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if hull[mid][1] - slope * hull[mid][0] < hull[mid + 1][1] - slope * hull[mid + 1][0]:
+            lo = mid + 1
+        else:
+            hi = mid
+    return hull[lo]
+
+
+class _HullWindow:
+    """
+    Bao loi tren cua cac diem (x, y) trong cua so truot (x tang dan), dung 2 stack:
+    - back: bao loi cac diem moi them ben phai (chi them)
+    - front: bao loi cac diem cu, dung tu phai sang trai; bo diem trai nhat = hoan tac lan them cuoi
+    Moi diem vao/ra O(1) khau hao, truy van max(y - slope * x) O(log n).
+    """
+    def __init__(self):
+        self.front = []    # phan tu cuoi = diem trai nhat
+        self.undo = []     # (diem, cac diem bi loai khi them diem do vao front)
+        self.pending = []  # cac diem cua phan back, trai -> phai
+        self.back = []
+    
+    def push(self, point):
+        self.pending.append(point)
+        back = self.back
+        while len(back) >= 2 and not _concave(back[-2], back[-1], point):
+            back.pop()
+        back.append(point)
+    
+    def pop_left(self):
+        if not self.undo:
+            for point in reversed(self.pending):
+                front = self.front
+                removed = []
+                while len(front) >= 2 and not _concave(point, front[-1], front[-2]):
+                    removed.append(front.pop())
+                front.append(point)
+                self.undo.append((point, removed))
+            self.pending = []
+            self.back = []
+        point, removed = self.undo.pop()
+        self.front.pop()
+        self.front.extend(reversed(removed))
+    
+    def best(self, slope):
+        candidates = [_hull_best(hull, slope) for hull in (self.front, self.back) if hull]
+        return max(candidates, key=lambda p: p[1] - slope * p[0])
+
+
+class RegressionChannel:
+    """
+    Kenh hoi quy tuyen tinh cua `period` nen gan nhat (cua so truot), giong Factor 8:
+    duong giua hoi quy theo close, bien tren/duoi = do lech lon nhat cua high/low.
+    
+    Tong sum_y / sum_xy truot O(1) moi nen (tinh lai chinh xac moi `period` nen de khong
+    tich luy sai so), bien kenh lay tu bao loi cua high/low - khong quet lai cua so.
+    update(high, low, close) tra ve (slope, intercept, dev_above, dev_below) voi x = 0..period-1
+    trong cua so; None khi chua du `period` nen.
+    """
+    inputs = ('high', 'low', 'close')
+    
+    def __init__(self, period):
+        self.period = period
+        self.count = 0
+        self.bars = deque()  # (high, low, close) trong cua so
+        self.sum_y = 0.0
+        self.sum_xy = 0.0
+        self.since_resync = 0
+        self.highs = _HullWindow()  # diem (index, high)
+        self.lows = _HullWindow()   # diem (index, -low): bao loi duoi cua low
+        self.value = None
+    
+    def update(self, high, low, close):
+        n = self.period
+        if len(self.bars) == n:
+            old_close = self.bars.popleft()[2]
+            self.highs.pop_left()
+            self.lows.pop_left()
+            # Doi goc x sang trai 1 nen: moi x giam 1
+            self.sum_xy += (n - 1) * close - (self.sum_y - old_close)
+            self.sum_y += close - old_close
+        else:
+            self.sum_xy += len(self.bars) * close
+            self.sum_y += close
+        self.bars.append((high, low, close))
+        self.highs.push((self.count, high))
+        self.lows.push((self.count, -low))
+        self.count += 1
+        
+        self.since_resync += 1
+        if self.since_resync >= n:
+            self._resync()
+        
+        if len(self.bars) == n:
+            self.value = self._channel()
+        return self.value
+    
+    def _resync(self):
+        """Tinh lai tong tuan tu (giong cach Factor 8 cong) de sai so khong tich luy."""
+        sum_y = 0.0
+        sum_xy = 0.0
+        for x, bar in enumerate(self.bars):
+            sum_y += bar[2]
+            sum_xy += x * bar[2]
+        self.sum_y = sum_y
+        self.sum_xy = sum_xy
+        self.since_resync = 0
+    
+    def _channel(self):
+        n = self.period
+        sum_x = n * (n - 1) // 2
+        sum_x2 = (n - 1) * n * (2 * n - 1) // 6
+        slope = (n * self.sum_xy - sum_x * self.sum_y) / (n * sum_x2 - sum_x * sum_x)
+        intercept = (self.sum_y - slope * sum_x) / n
+        
+        start = self.count - n
+        index, high = self.highs.best(slope)
+        dev_above = max(0, high - (intercept + slope * (index - start)))
+        index, neg_low = self.lows.best(-slope)
+        dev_below = max(0, (intercept + slope * (index - start)) + neg_low)
+        return (slope, intercept, dev_above, dev_below)
+    
+    def snapshot(self):
+        return {'period': self.period, 'count': self.count, 'bars': [list(bar) for bar in self.bars],
+                'sum_y': self.sum_y, 'sum_xy': self.sum_xy, 'since_resync': self.since_resync}
+    
+    def restore(self, state):
+        # Dung lai bao loi tu cac nen trong cua so, giu nguyen tong dang truot
+        self.__init__(state['period'])
+        self.count = state['count'] - len(state['bars'])
+        for high, low, close in state['bars']:
+            self.update(high, low, close)
+        self.sum_y = state['sum_y']
+        self.sum_xy = state['sum_xy']
+        self.since_resync = state['since_resync']
+        if len(self.bars) == self.period:
+            self.value = self._channel()
@@ -1,72 +1,63 @@
-import time
-import MetaTrader5 as mt5
-from strategy import evaluate_signals, Signal
-from trade import process_trade
+from mt5_gate import mt5
 from telegram_bot import log, flush_logs
-from be_manager import check_be
+from runner import run_symbols
 
-SYMBOL = "XAUUSD"
+# Cac symbol cham diem / vao lenh; nhieu symbol -> moi symbol 1 process (toi da PROCESSES)
+# Moi symbol can 1 profile trong profiles.PROFILES (sai so factor / SL / TP tinh bang gia)
+SYMBOLS = ["XAUUSD"]
+PROCESSES = None  # None = so core
 TIMEFRAME = mt5.TIMEFRAME_H1
 
-# ========== KET NOI ==========
-
-if not mt5.initialize():
-    log("Khong the ket noi MT5:", mt5.last_error())
-    quit()
-else:
-    log("Da ket noi MT5 thanh cong!")
-    acc = mt5.account_info()
-    log(f"Tai khoan: {acc.login} | Balance: {acc.balance}")
-    flush_logs()  # Gui ngay thong bao khoi dong
-
-# ========== VONG LAP ==========
-
-last_candle = None
-accumulated_score = Signal()
-
-while True:
-    # Kiem tra va keo BE neu can
-    check_be()
-    
-    rates = mt5.copy_rates_from_pos(SYMBOL, TIMEFRAME, 0, 2)
-    if rates is None:
-        time.sleep(1)
-        continue
-
-    candle_time = rates[-1]['time']
-
-    if last_candle != candle_time:
-        last_candle = candle_time
-        log("\n=== New Candle ===")
-        
-        # Lay du lieu cac khung thoi gian
-        rates_m15 = mt5.copy_rates_from_pos(SYMBOL, mt5.TIMEFRAME_M15, 1, 100)
-        rates_h4 = mt5.copy_rates_from_pos(SYMBOL, mt5.TIMEFRAME_H4, 1, 100)
-        rates_h1 = mt5.copy_rates_from_pos(SYMBOL, mt5.TIMEFRAME_H1, 1, 150)
-        rates_m30 = mt5.copy_rates_from_pos(SYMBOL, mt5.TIMEFRAME_M30, 1, 200)
-        
-        if rates_m15 is None or rates_h4 is None or rates_h1 is None or rates_m30 is None:
-            log("Khong lay duoc du lieu nen")
-            time.sleep(1)
-            continue
-
-        # Tinh diem nen hien tai
-        current_signal = evaluate_signals(SYMBOL, rates_m15, rates_h4, rates_h1, rates_m30)
-        
-        # Tich luy diem
-        accumulated_score.buy_score += current_signal.buy_score
-        accumulated_score.sell_score += current_signal.sell_score
-        
-        log(f"This candle: Buy +{current_signal.buy_score} | Sell +{current_signal.sell_score}")
-        log(f"ACCUMULATED: Buy = {accumulated_score.buy_score} | Sell = {accumulated_score.sell_score}")
-
-        # Process trade
-        trade_executed = process_trade(SYMBOL, accumulated_score)
-        
-        # Reset score if trade executed
-        if trade_executed:
-            log(">>> RESET SCORE <<<")
-            accumulated_score = Signal()
-            flush_logs()  # Gui ngay khi co lenh
-
-    time.sleep(2)
+# Do tre toi da cua tung viec (giay): keo BE; nen moi duoc phat hien ngay luc dong nen
+# (ngu den moc nen theo gio server), POLL_SECONDS chi dung khi cho tick / nhip cham giua nen
+BE_SECONDS = 0.5
+POLL_SECONDS = 1.0
+
+# EMA/RSI streaming: moi nen chi cap nhat nen moi dong thay vi tinh lai ca cua so
+# (EMA duoc seed 1 lan tu cua so dau tien, khong seed lai moi nen)
+INCREMENTAL_INDICATORS = True
+
+# Chi lay 1 chuoi M15 tu MT5 va tu dung M30/H1/H4 (1 lan goi moi nen, cac khung cung 1 snapshot)
+# False = moi khung lay rieng tu MT5 (van qua BarCache)
+LOCAL_RESAMPLE = True
+
+# Cham diem ca nen H1 dang chay (gia = bid tick moi nhat, indicator giu trang thai nen da dong)
+# moi INTRA_CANDLE_TICKS tick moi hoac INTRA_CANDLE_SECONDS giay; diem chi duoc cong khi
+# giu nguyen INTRA_CANDLE_CONFIRM lan cham lien tiep (xem IntraCandleAccumulator)
+INTRA_CANDLE = False
+INTRA_CANDLE_TICKS = 20
+INTRA_CANDLE_SECONDS = 10
+INTRA_CANDLE_CONFIRM = 3
+
+# Luu trang thai (diem tich luy, nen da xu ly, BE, indicator) de khoi dong lai chay tiep ngay
+# (runtime_state_<SYMBOL>.json) sau moi lan cham diem / vao lenh va it nhat moi STATE_SAVE_SECONDS giay
+STATE_SAVE_SECONDS = 30
+
+CONFIG = {
+    'timeframe': TIMEFRAME,
+    'be_seconds': BE_SECONDS,
+    'poll_seconds': POLL_SECONDS,
+    'incremental_indicators': INCREMENTAL_INDICATORS,
+    'local_resample': LOCAL_RESAMPLE,
+    'intra_candle': INTRA_CANDLE,
+    'intra_ticks': INTRA_CANDLE_TICKS,
+    'intra_seconds': INTRA_CANDLE_SECONDS,
+    'intra_confirm': INTRA_CANDLE_CONFIRM,
+    'state_save_seconds': STATE_SAVE_SECONDS,
+}
+
+if __name__ == "__main__":
+    # ========== KET NOI ==========
+
+    if not mt5.initialize():
+        log("Khong the ket noi MT5:", mt5.last_error())
+        quit()
+    else:
+        log("Da ket noi MT5 thanh cong!")
+        acc = mt5.account_info()
+        log(f"Tai khoan: {acc.login} | Balance: {acc.balance} | Symbols: {', '.join(SYMBOLS)}")
+        flush_logs()  # Gui ngay thong bao khoi dong
+
+    # ========== VONG LAP ==========
+
+    run_symbols(SYMBOLS, CONFIG, PROCESSES)
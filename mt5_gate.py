@@ -0,0 +1,48 @@
+"""
+MT5 gate - moi lenh goi MT5 trong process di qua 1 khoa (goi lan luot, khong xen nhau)
+
+Logic:
+- Thu vien MetaTrader5 khong dam bao an toan khi nhieu thread goi cung luc (tick feed,
+  keo BE, cham diem / vao lenh, lay thong so symbol deu chay tren thread rieng)
+- Cac module dung `from mt5_gate import mt5` thay `import MetaTrader5 as mt5`: ham MT5 duoc
+  goi trong LOCK, hang so giu nguyen
+- Khoa theo tung lenh goi (khong theo ca viec): viec dai (tai nen, gui lai ET1...) gom nhieu
+  lenh ngan, thread khac (keo BE) chen vao giua duoc -> cho toi da 1 lenh MT5 dang chay
+- Ngoai le duy nhat, tat mac dinh (trade.PARALLEL_ORDERS, thu nghiem): 4 lenh order_send
+  cua 1 cluster gui song song - giu LOCK ca luc gui de khong lenh MT5 nao khac xen vao,
+  cac thread gui dung unlocked()
+"""
+
+import threading
+
+import MetaTrader5
+
+
+LOCK = threading.RLock()
+
+
+class _Gate:
+    """Thay cho module MetaTrader5: ham -> goi trong LOCK, hang so -> tra ve nguyen."""
+    def __init__(self, module):
+        self._module = module
+
+    def __getattr__(self, name):
+        value = getattr(self._module, name)
+        if callable(value):
+            module = self._module
+
+            def call(*args, **kwargs):
+                with LOCK:
+                    return getattr(module, name)(*args, **kwargs)
+            call.__name__ = name
+            value = call
+        setattr(self, name, value)
+        return value
+
+
+mt5 = _Gate(MetaTrader5)
+
+
+def unlocked(module):
+    """Module MT5 goc (khong khoa) - chi dung khi da giu LOCK (gui song song thu nghiem trong send_orders)."""
+    return module._module if isinstance(module, _Gate) else module
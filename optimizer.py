@@ -0,0 +1,190 @@
+"""
+Optimizer - quet tham so cluster/diem bang backtest tren nhieu core
+
+Logic:
+- Tinh diem tung factor (evaluate_signals_batch) 1 lan duy nhat
+- Dua nen M15 + mang diem vao shared memory, cac worker chi attach (khong copy)
+- Moi bo tham so = 1 lan run_backtest(params=...) tren 1 process
+- Xep hang theo net P&L (hoa -> drawdown nho hon), kem win rate tung ET
+
+Tham so (xem DEFAULT_SPACE):
+- base_score: diem tich luy toi thieu de vao lenh (trade.BASE_SCORE)
+- sl_usd / tp_usd / et_offsets_usd / risk_allocation: cau hinh cluster cua TradeManager
+- factor_weights: he so diem tung factor, vd. {'F8': 0} = tat F8
+
+Cach dung:
+    python optimizer.py 2023-01-01 2024-01-01            # grid DEFAULT_SPACE
+    python optimizer.py 2023-01-01 2024-01-01 XAUUSD 200 # 200 bo ngau nhien
+"""
+
+import sys
+import random
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from datetime import datetime
+
+import numpy as np
+
+from backtest import run_backtest
+from strategy import BatchSignals, evaluate_signals_batch
+from profiles import get_profile
+
+
+DEFAULT_SPACE = {
+    'base_score': [25, 30, 35, 40, 45],
+    'tp_usd': [[3, 5, 10, 15], [2, 4, 8, 12], [4, 6, 12, 18]],
+    'sl_usd': [[9, 10, 11, 12], [6, 7, 8, 9]],
+    'et_offsets_usd': [[0, 0.2, 0.5, 0.7], [0, 0.5, 1.0, 1.5]],
+    'risk_allocation': [[0.20, 0.20, 0.40, 0.20], [0.25, 0.25, 0.25, 0.25]],
+    'factor_weights': [{}, {'F8': 0}, {'F14': 0}],
+}
+
+
+def grid(space):
+    """Tat ca to hop cua space {ten: [gia tri, ...]}."""
+    names = list(space)
+    return [dict(zip(names, values)) for values in itertools.product(*space.values())]
+
+
+def random_candidates(space, n, seed=None):
+    """n bo tham so chon ngau nhien trong space (khong trung nhau neu du to hop)."""
+    rng = random.Random(seed)
+    total = 1
+    for values in space.values():
+        total *= len(values)
+    candidates, seen = [], set()
+    while len(candidates) < min(n, total):
+        index = tuple(rng.randrange(len(values)) for values in space.values())
+        if index in seen:
+            continue
+        seen.add(index)
+        candidates.append({name: values[i] for (name, values), i in zip(space.items(), index)})
+    return candidates
+
+
+# ========== SHARED MEMORY ==========
+def _share(arrays):
+    """Copy cac mang vao shared memory 1 lan. Returns (blocks, specs) - specs gui cho worker."""
+    blocks, specs = [], {}
+    for name, values in arrays.items():
+        # BarSlice (bar_store) -> copy 1 lan ra structured array
+        values = np.ascontiguousarray(values.to_records() if hasattr(values, 'to_records') else values)
+        block = shared_memory.SharedMemory(create=True, size=max(values.nbytes, 1))
+        np.ndarray(values.shape, values.dtype, buffer=block.buf)[...] = values
+        blocks.append(block)
+        specs[name] = (block.name, values.shape, values.dtype)
+    return blocks, specs
+
+
+# Du lieu cua worker (attach tu shared memory trong _init_worker)
+_worker = {}
+
+
+def _init_worker(specs, factors, config):
+    blocks = []
+    for name, (block_name, shape, dtype) in specs.items():
+        block = shared_memory.SharedMemory(name=block_name)
+        blocks.append(block)  # giu block song cung worker
+        _worker[name] = np.ndarray(shape, dtype, buffer=block.buf)
+    _worker['blocks'] = blocks
+    _worker['factors'] = factors
+    _worker['config'] = config
+
+
+def _run_candidate(params):
+    factors = _worker['factors']
+    signals = BatchSignals(_worker['time'],
+                           dict(zip(factors, _worker['factor_buy'])),
+                           dict(zip(factors, _worker['factor_sell'])))
+    result = run_backtest(_worker['m15'], None, None, None, signals=signals,
+                          params=params, **_worker['config'])
+    summary = result.summary()
+    return {
+        'params': params,
+        'net_pnl': summary['net_pnl'],
+        'max_drawdown': summary['max_drawdown'],
+        'clusters': summary['clusters'],
+        'trades': summary['trades'],
+        'win_rate': {et: s['win_rate'] for et, s in summary['by_et'].items()},
+    }
+
+
+def run_sweep(rates_m15, rates_h4, rates_h1, rates_m30, candidates, symbol="XAUUSD",
+              balance=10000.0, spread=None, point=0.01, signals=None, processes=None):
+    """
+    Chay run_backtest cho tung bo tham so trong candidates tren process pool.
+
+    candidates: list dict params (grid / random_candidates).
+    signals: BatchSignals tinh san, mac dinh tu tinh 1 lan tu rates_*.
+    processes: so worker, mac dinh = so core.
+    Returns list ket qua da xep hang (tot nhat truoc).
+    """
+    if signals is None:
+        signals = evaluate_signals_batch(rates_m15, rates_h4, rates_h1, rates_m30, profile=get_profile(symbol))
+
+    factors = list(signals.factor_buy)
+    blocks, specs = _share({
+        'm15': rates_m15,
+        'time': signals.time,
+        'factor_buy': np.array([signals.factor_buy[f] for f in factors]),
+        'factor_sell': np.array([signals.factor_sell[f] for f in factors]),
+    })
+    config = {'symbol': symbol, 'balance': balance, 'spread': spread, 'point': point}
+    try:
+        with ProcessPoolExecutor(max_workers=processes, initializer=_init_worker,
+                                 initargs=(specs, factors, config)) as pool:
+            results = list(pool.map(_run_candidate, candidates))
+    finally:
+        for block in blocks:
+            block.close()
+            block.unlink()
+
+    results.sort(key=lambda r: (-r['net_pnl'], r['max_drawdown']))
+    return results
+
+
+def format_table(results, top=20):
+    """Bang xep hang dang text."""
+    lines = [f"{'#':>3} {'Net P&L':>10} {'Max DD':>9} {'Clus':>5} "
+             f"{'ET1':>6} {'ET2':>6} {'ET3':>6} {'ET4':>6}  Params"]
+    for rank, r in enumerate(results[:top], 1):
+        wins = " ".join(f"{r['win_rate'][et]*100:5.1f}%" for et in range(1, 5))
+        lines.append(f"{rank:>3} {r['net_pnl']:>10.2f} {r['max_drawdown']:>9.2f} "
+                     f"{r['clusters']:>5} {wins}  {r['params']}")
+    return "\n".join(lines)
+
+
+# ========== CHAY TU DONG LENH ==========
+if __name__ == "__main__":
+    import MetaTrader5 as mt5
+
+    if len(sys.argv) < 3:
+        print("Cach dung: python optimizer.py YYYY-MM-DD YYYY-MM-DD [SYMBOL] [SO_BO_NGAU_NHIEN]")
+        sys.exit(1)
+
+    date_from = datetime.strptime(sys.argv[1], "%Y-%m-%d")
+    date_to = datetime.strptime(sys.argv[2], "%Y-%m-%d")
+    symbol = sys.argv[3] if len(sys.argv) > 3 else "XAUUSD"
+
+    if not mt5.initialize():
+        print("Khong the ket noi MT5:", mt5.last_error())
+        sys.exit(1)
+
+    rates = {}
+    for name, tf in (('m15', mt5.TIMEFRAME_M15), ('h4', mt5.TIMEFRAME_H4),
+                     ('h1', mt5.TIMEFRAME_H1), ('m30', mt5.TIMEFRAME_M30)):
+        rates[name] = mt5.copy_rates_range(symbol, tf, date_from, date_to)
+        if rates[name] is None:
+            print(f"Khong lay duoc du lieu {name}:", mt5.last_error())
+            sys.exit(1)
+    mt5.shutdown()
+
+    if len(sys.argv) > 4:
+        candidates = random_candidates(DEFAULT_SPACE, int(sys.argv[4]))
+    else:
+        candidates = grid(DEFAULT_SPACE)
+
+    print(f"=== Optimizer {symbol} {sys.argv[1]} -> {sys.argv[2]} | {len(candidates)} bo tham so ===")
+    results = run_sweep(rates['m15'], rates['h4'], rates['h1'], rates['m30'], candidates, symbol=symbol)
+    print(format_table(results))
@@ -0,0 +1,53 @@
+"""
+Profiles - tham so tinh bang gia tuyet doi (USD voi vang) cua tung symbol
+
+Logic:
+- Sai so / nguong cua factor (strategy, ca evaluate_signals va evaluate_signals_batch), thang
+  khoang cach ET / SL / TP cua cluster (trade, be_manager) la so USD tuyet doi chinh cho vang
+  -> moi symbol 1 profile rieng, khong dung chung so cua XAUUSD
+- USD / lot / 1 USD gia khong nam o day: lay tu symbol_info.trade_contract_size (trade.MarketInfo)
+- Symbol khong co profile -> get_profile bao loi (khong chay voi tham so cua symbol khac)
+"""
+
+from collections import namedtuple
+
+
+# fib_tol_*: sai so toi thieu F1 (M15) / F2 (H4); level_tol_*: F4 / F5 / F6 (600 nen H4);
+# triangle_flat: canh ngang F9/F10 (chenh 2 dinh/day), triangle_tol: sai so cham canh;
+# ema100_gap: F13; sma25_gap / sma25_gap_strong: F14 (+5 / +10 diem);
+# et_offsets_usd / sl_usd / tp_usd: ET1-ET4; min_stop_usd: SL/TP toi thieu;
+# max_slippage_usd: ET1 gui lai khi gia chua chay qua; digits: so chu so thap phan cua gia
+SymbolProfile = namedtuple('SymbolProfile', 'fib_tol_m15 fib_tol_h4 level_tol_m15 level_tol_h4 level_tol_h4_600 '
+                                            'triangle_flat triangle_tol ema100_gap sma25_gap sma25_gap_strong '
+                                            'et_offsets_usd sl_usd tp_usd min_stop_usd max_slippage_usd digits')
+
+XAUUSD = SymbolProfile(
+    fib_tol_m15=0.1, fib_tol_h4=0.5,
+    level_tol_m15=0.5, level_tol_h4=0.8, level_tol_h4_600=2.0,
+    triangle_flat=1.0, triangle_tol=0.5,
+    ema100_gap=1.0,  # 10 points
+    sma25_gap=6, sma25_gap_strong=10,  # 60 / 100 pips
+    et_offsets_usd=(0, 0.2, 0.5, 0.7),
+    sl_usd=(9, 10, 11, 12),
+    tp_usd=(3, 5, 10, 15),
+    min_stop_usd=0.5,
+    max_slippage_usd=0.5,
+    digits=2,
+)
+
+# Symbol -> profile; them symbol moi = them profile da chinh cho symbol do
+PROFILES = {
+    "XAUUSD": XAUUSD,
+}
+
+# Profile khi khong chi dinh symbol (backtest, optimizer, TradeManager mac dinh)
+DEFAULT_PROFILE = XAUUSD
+
+
+def get_profile(symbol):
+    """Profile cua symbol, ValueError neu symbol chua co profile."""
+    profile = PROFILES.get(symbol)
+    if profile is None:
+        raise ValueError(f"Symbol {symbol} chua co profile tham so (profiles.PROFILES: {', '.join(PROFILES)}) "
+                         f"- sai so factor / SL / TP tinh bang gia tuyet doi, can chinh rieng")
+    return profile
@@ -0,0 +1,97 @@
+"""
+Resampler - dung nen M30/H1/H4 tu 1 chuoi nen goc (M15 hoac M1)
+
+Logic:
+- Giu chuoi nen goc trong BarCache (luu file), moi nen chi lay cac nen moi (1 lan goi MT5)
+- Gop nen goc theo moc thoi gian server cua khung (time // giay_khung), giong MT5
+- Bo nhom dau (co the thieu nen) va nhom chua dong
+- Tat ca khung lay tu cung 1 snapshot nen goc
+"""
+
+import numpy as np
+
+from bar_cache import BarCache, CACHE_DIR
+
+
+TIMEFRAME_SECONDS = {'m1': 60, 'm15': 900, 'm30': 1800, 'h1': 3600, 'h4': 14400}
+
+
+def resample(rates, seconds, now=None):
+    """
+    Gop nen (structured array cua MT5, time tang dan) thanh khung `seconds` giay.
+
+    Nen moi: time = moc dau khung, open = open dau, high/low = max/min, close = close cuoi,
+    tick_volume/real_volume = tong, spread = nho nhat.
+    Nhom dau tien bi bo (nen goc co the bat dau giua khung); now: bo them cac nhom
+    chua dong (time + seconds > now), vd. now = time cua nen goc dang chay.
+    """
+    if len(rates) == 0:
+        return rates[:0]
+
+    times = rates['time']
+    keys = times - times % seconds
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    ends = np.r_[starts[1:], len(rates)] - 1
+
+    out = np.zeros(len(starts), dtype=rates.dtype)
+    out['time'] = keys[starts]
+    out['open'] = rates['open'][starts]
+    out['high'] = np.maximum.reduceat(rates['high'], starts)
+    out['low'] = np.minimum.reduceat(rates['low'], starts)
+    out['close'] = rates['close'][ends]
+    for name in ('tick_volume', 'real_volume'):
+        if name in rates.dtype.names:
+            out[name] = np.add.reduceat(rates[name], starts)
+    if 'spread' in rates.dtype.names:
+        out['spread'] = np.minimum.reduceat(rates['spread'], starts)
+
+    out = out[1:]
+    if now is not None:
+        out = out[out['time'] + seconds <= now]
+    return out
+
+
+class TimeframeFeed:
+    """
+    Du lieu cac khung cho main.py tu BarCache (luu file, moi nen chi lay nen moi tu MT5).
+
+    bars: so nen dong can cho tung khung, vd. strategy.LIVE_BARS.
+    base: 'm15' hoac 'm1' - chi cache khung nay va tu dung cac khung khac (1 lan goi MT5
+          moi nen, cac khung cung 1 snapshot); None = moi khung 1 BarCache rieng.
+    directory: thu muc luu BarCache (None = chi trong bo nho).
+    """
+    def __init__(self, symbol, bars, base='m15', directory=CACHE_DIR):
+        self.symbol = symbol
+        self.bars = dict(bars)
+        self.base = base
+        if base is None:
+            self.caches = {tf: BarCache(symbol, tf, count, directory) for tf, count in self.bars.items()}
+            return
+
+        # So nen goc can cho tung khung: + 2 nhom (nhom dau bi bo, nhom dang chay),
+        # du 25% cho cac khung thieu nen (nghi giua phien, cuoi tuan)
+        self.needed = {
+            tf: int((count + 2) * TIMEFRAME_SECONDS[tf] // TIMEFRAME_SECONDS[base] * 1.25)
+            for tf, count in self.bars.items()}
+        self.caches = {base: BarCache(symbol, base, max(self.needed.values()), directory)}
+
+    def update(self):
+        """
+        Lay nen moi va dung lai cac khung.
+        Returns {khung: structured array cac nen da dong (toi da bars[khung] nen)} hoac None neu loi.
+        """
+        for cache in self.caches.values():
+            if not cache.update():
+                return None
+        if self.base is None:
+            return {tf: self.caches[tf].tail(count) for tf, count in self.bars.items()}
+
+        cache = self.caches[self.base]
+        frames = {}
+        for tf, count in self.bars.items():
+            if tf == self.base:
+                frames[tf] = cache.tail(count)
+            else:
+                # Nen cuoi cache.now dang chay -> chi lay cac nhom da dong truoc no
+                frames[tf] = resample(cache.tail(self.needed[tf]), TIMEFRAME_SECONDS[tf], cache.now)[-count:]
+        return frames
@@ -0,0 +1,329 @@
+"""
+Runner - vong lap cham diem / vao lenh cho 1 hoac nhieu symbol
+
+Logic:
+- SymbolRunner: toan bo trang thai cua 1 symbol (nen, tick, indicator, diem tich luy,
+  diem giua nen, BE, file trang thai)
+- asyncio: moi symbol 5 task doc lap - keo BE (moi be_seconds), phat hien nen moi (ngu den
+  luc dong nen theo gio server, xem scheduler.py), cham diem (thread rieng), luu trang thai,
+  lay lai thong so symbol / balance (trade.MarketInfo)
+- Thread: viec co goi MT5 chay tren MT5_EXECUTOR (1 thread, theo thu tu), keo BE tren thread
+  rieng cua symbol (be_executor) -> khong xep hang sau process_trade / tai nen; moi lenh goi
+  MT5 (ca tick feed) van lan luot qua mt5_gate.LOCK, nen keo BE cho toi da 1 lenh MT5 dang chay
+- run_symbols: chia symbol cho cac process (mac dinh 1 process / symbol, toi da so core);
+  moi process tu ket noi MT5 va chay vong lap cua cac symbol cua no -> symbol nay
+  cham diem khong lam cham symbol khac, tang symbol ~ tang tuyen tinh theo so core
+- Process chet (loi, mat ket noi) duoc khoi dong lai, trang thai lay tu file
+"""
+
+import os
+import time
+import asyncio
+import functools
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor
+
+from mt5_gate import mt5
+
+from strategy import evaluate_signals, Signal, IndicatorState, FactorEngine, IntraCandleAccumulator, LIVE_BARS
+from trade import process_trade, arm_trade, get_market_info
+from telegram_bot import log, flush_logs
+from be_manager import get_be_manager
+from resampler import TimeframeFeed, TIMEFRAME_SECONDS
+from ticks import TickFeed
+from state_store import save_state, load_state
+from scheduler import ServerClock
+from bar_cache import TIMEFRAMES
+from profiles import get_profile
+
+
+STATE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Viec co goi MT5 (tru keo BE) chay lan luot tren 1 thread rieng (khong chan event loop);
+# tung lenh MT5 duoc khoa boi mt5_gate
+MT5_EXECUTOR = ThreadPoolExecutor(max_workers=1, thread_name_prefix="mt5")
+
+
+async def call_mt5(func, *args, executor=MT5_EXECUTOR):
+    """Chay func(*args) (co goi MT5) tren `executor` (mac dinh MT5_EXECUTOR)."""
+    return await asyncio.get_running_loop().run_in_executor(executor, func, *args)
+
+
+class SymbolRunner:
+    """
+    Cham diem / vao lenh cho 1 symbol: run() chay cac task asyncio doc lap
+    (keo BE, phat hien nen moi, cham diem, luu trang thai) - moi viec co do tre rieng.
+
+    Tham so tuong ung cac cau hinh trong main.py (INCREMENTAL_INDICATORS, LOCAL_RESAMPLE,
+    INTRA_CANDLE*, *_SECONDS); state_file None = khong luu trang thai.
+    profile: profiles.SymbolProfile (sai so factor, SL/TP/ET) - mac dinh theo symbol,
+    ValueError neu symbol chua co profile.
+    """
+    def __init__(self, symbol, timeframe=mt5.TIMEFRAME_H1, incremental_indicators=True, local_resample=True,
+                 intra_candle=False, intra_ticks=20, intra_seconds=10, intra_confirm=3,
+                 state_file=None, state_save_seconds=30, be_seconds=0.5, poll_seconds=1.0,
+                 confirm_seconds=2.0, confirm_interval=0.05, profile=None):
+        self.symbol = symbol
+        self.profile = profile or get_profile(symbol)
+        self.timeframe = timeframe
+        self.timeframe_seconds = next(TIMEFRAME_SECONDS[tf] for tf, value in TIMEFRAMES.items() if value == timeframe)
+        self.be_seconds = be_seconds
+        self.poll_seconds = poll_seconds
+        self.confirm_seconds = confirm_seconds
+        self.confirm_interval = confirm_interval
+        self.clock = ServerClock()
+        self.intra_candle = intra_candle
+        self.intra_ticks = intra_ticks
+        self.intra_seconds = intra_seconds
+        self.state_file = state_file
+        self.state_save_seconds = state_save_seconds
+
+        self.last_candle = None
+        self.accumulated_score = Signal()
+        self.indicator_state = IndicatorState() if incremental_indicators else None
+        self.factor_engine = FactorEngine()  # factor tat: strategy.DISABLED_FACTORS
+        self.timeframe_feed = TimeframeFeed(symbol, LIVE_BARS, base='m15' if local_resample else None)
+        self.be = get_be_manager(symbol, self.profile)
+        self.be_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"be-{symbol}")
+        self.market = get_market_info(symbol)  # thong so symbol / balance san trong cache khi vao lenh
+
+        # Tick lien tuc vao ring buffer (thread rieng); doc qua tick_feed.buffer (view, khong copy)
+        self.tick_feed = TickFeed(symbol)
+        self.tick_feed.start()
+        self.tick_cursor = 0
+
+        self.intra_accumulator = IntraCandleAccumulator(intra_confirm)
+        self.intra_count = 0  # tick_feed.buffer.count o lan cham giua nen truoc
+        self.intra_time = 0.0
+
+        self._events = asyncio.Queue()  # 'close' / 'intra' -> _signal_task
+        self._lock = asyncio.Lock()  # cham diem va luu trang thai khong chay xen nhau
+
+        self._restore()
+        self.state_saved = time.time()
+
+    def _log(self, message):
+        log(f"[{self.symbol}] {message}")
+
+    def _restore(self):
+        """Khoi phuc trang thai lan chay truoc (neu co)."""
+        if self.state_file is None:
+            return
+        saved = load_state(self.state_file)
+        if saved is None or saved.get('symbol') != self.symbol:
+            return
+        self.last_candle = saved['last_candle']
+        self.accumulated_score.buy_score, self.accumulated_score.sell_score = saved['accumulated_score']
+        self.intra_accumulator.restore(saved['intra'])
+        self.be.restore(saved['be'])
+        if self.indicator_state is not None and saved['indicators'] is not None:
+            self.indicator_state.restore(saved['indicators'])
+        self._log(f"Khoi phuc trang thai: Buy = {self.accumulated_score.buy_score} | "
+                  f"Sell = {self.accumulated_score.sell_score}")
+
+    async def _trade(self):
+        """process_trade voi diem tich luy, reset diem neu da vao lenh."""
+        if await call_mt5(process_trade, self.symbol, self.accumulated_score, self.profile):
+            self._log(">>> RESET SCORE <<<")
+            self.accumulated_score = Signal()
+            flush_logs()  # Gui ngay khi co lenh
+
+    async def _save(self):
+        self.state_saved = time.time()
+        if self.state_file is None:
+            return
+        state = {
+            'symbol': self.symbol,
+            'last_candle': int(self.last_candle) if self.last_candle is not None else None,
+            'accumulated_score': [self.accumulated_score.buy_score, self.accumulated_score.sell_score],
+            'intra': self.intra_accumulator.snapshot(),
+            'be': await call_mt5(self.be.snapshot, executor=self.be_executor),  # thread cua check_and_manage_be
+            'indicators': self.indicator_state.snapshot() if self.indicator_state is not None else None,
+        }
+        await asyncio.get_running_loop().run_in_executor(None, save_state, self.state_file, state)
+
+    async def _evaluate(self, frames, **kwargs):
+        """evaluate_signals tren thread rieng (khong chan event loop / thread MT5)."""
+        return await asyncio.get_running_loop().run_in_executor(None, functools.partial(
+            evaluate_signals, self.symbol, frames['m15'], frames['h4'], frames['h1'], frames['m30'],
+            state=self.indicator_state, engine=self.factor_engine, profile=self.profile, **kwargs))
+
+    def _add(self, signal):
+        self.accumulated_score.buy_score += signal.buy_score
+        self.accumulated_score.sell_score += signal.sell_score
+
+    async def run(self):
+        """Chay cac task doc lap cua symbol: keo BE, phat hien nen moi, cham diem, luu trang thai."""
+        await asyncio.gather(self._be_task(), self._candle_task(), self._signal_task(), self._save_task(),
+                             self._market_task())
+
+    async def _be_task(self):
+        # Kiem tra va keo BE moi be_seconds tren thread rieng, khong doi cham diem / vao lenh
+        while True:
+            await call_mt5(self.be.check_and_manage_be, executor=self.be_executor)
+            await asyncio.sleep(self.be_seconds)
+
+    async def _market_task(self):
+        # Lay lai thong so symbol / balance moi market.ttl giay, hoac ngay khi broker tu choi
+        # lenh (MarketInfo.invalidate, goi tu thread MT5_EXECUTOR)
+        loop = asyncio.get_running_loop()
+        wake = asyncio.Event()
+        self.market.on_invalidate = lambda: loop.call_soon_threadsafe(wake.set)
+        while True:
+            wake.clear()
+            try:
+                await call_mt5(self.market.refresh)
+            except Exception as e:
+                self._log(f"Loi lay thong so symbol: {e}")
+            try:
+                await asyncio.wait_for(wake.wait(), self.market.ttl if self.market.info is not None else 1)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _candle_task(self):
+        # Ngu den luc nen dong (gio server tu tick), roi hoi MT5 moi confirm_interval toi khi
+        # co nen moi; qua confirm_seconds (chua co tick moi, nghi cuoi tuan...) chi hoi lai
+        # khi co tick moi, toi da 1 lan / poll_seconds
+        seconds = self.timeframe_seconds
+        checked = None  # tick_feed.buffer.count o lan hoi MT5 truoc
+        while True:
+            if self.tick_feed.last_seen is not None:
+                time_msc, received = self.tick_feed.last_seen
+                self.clock.observe(time_msc / 1000, received)
+            known = self.clock.offset is not None and self.last_candle is not None
+
+            if not known or self.clock.bar_open(seconds) > self.last_candle:
+                late = not known or self.clock.now() - self.clock.bar_open(seconds) > self.confirm_seconds
+                count = self.tick_feed.buffer.count
+                if not late or count != checked:
+                    checked = count
+                    rates = await call_mt5(mt5.copy_rates_from_pos, self.symbol, self.timeframe, 0, 2)
+                    if rates is not None and len(rates) and rates[-1]['time'] != self.last_candle:
+                        self.last_candle = rates[-1]['time']
+                        self._events.put_nowait('close')
+                        continue
+                await asyncio.sleep(self.poll_seconds if late else self.confirm_interval)
+                continue
+
+            if (self.intra_candle and self._events.empty()
+                    and (self.tick_feed.buffer.count - self.intra_count >= self.intra_ticks
+                         or time.time() - self.intra_time >= self.intra_seconds)):
+                self.intra_count, self.intra_time = self.tick_feed.buffer.count, time.time()
+                self._events.put_nowait('intra')
+
+            delay = self.clock.until_close(seconds)
+            if self.intra_candle:
+                delay = min(delay, self.poll_seconds)
+            await asyncio.sleep(delay)
+
+    async def _signal_task(self):
+        while True:
+            event = await self._events.get()
+            async with self._lock:
+                if event == 'close':
+                    await self._close_candle()
+                else:
+                    await self._intra_candle()
+
+    async def _save_task(self):
+        while True:
+            await asyncio.sleep(max(0.0, self.state_saved + self.state_save_seconds - time.time()))
+            async with self._lock:
+                if time.time() - self.state_saved >= self.state_save_seconds:
+                    await self._save()
+
+    async def _close_candle(self):
+        self._log("\n=== New Candle ===")
+
+        # Lay du lieu cac khung thoi gian (BarCache: chi tai cac nen moi tu MT5)
+        frames = await call_mt5(self.timeframe_feed.update) or {}
+        if any(frames.get(tf) is None for tf in ('m15', 'h4', 'h1', 'm30')):
+            self._log("Khong lay duoc du lieu nen")
+            return
+
+        # Tinh diem nen hien tai
+        current_signal = await self._evaluate(frames)
+
+        # Tich luy diem (che do giua nen: chi phan chua cong trong luc nen chay)
+        self._add(self.intra_accumulator.close(current_signal) if self.intra_candle else current_signal)
+
+        self._log(f"This candle: Buy +{current_signal.buy_score} | Sell +{current_signal.sell_score}")
+        self._log(f"ACCUMULATED: Buy = {self.accumulated_score.buy_score} | "
+                  f"Sell = {self.accumulated_score.sell_score}")
+        self._log(f"Cache khung (hit, miss): {self.factor_engine.timeframes.stats()}")
+
+        ticks, self.tick_cursor, lost = self.tick_feed.buffer.since(self.tick_cursor)
+        if len(ticks):
+            self._log(f"Ticks: {len(ticks)} (mat {lost}) | Spread TB: {(ticks['ask'] - ticks['bid']).mean():.2f}")
+
+        # Process trade (reset score if trade executed)
+        await self._trade()
+        await call_mt5(arm_trade, self.symbol, self.profile)  # Cluster tinh san cho tin hieu tiep theo
+        self.intra_count, self.intra_time = self.tick_feed.buffer.count, time.time()
+        await self._save()
+
+    async def _intra_candle(self):
+        tick = self.tick_feed.buffer.last()
+        frames = await call_mt5(self.timeframe_feed.update)  # Chi nen M15 moi dong (neu co)
+        if tick is None or not frames:
+            return
+
+        intra_signal = await self._evaluate(frames, verbose=False, price=float(tick['bid']))
+        added = self.intra_accumulator.add(intra_signal)
+        if added.buy_score or added.sell_score:
+            self._add(added)
+            self._log(f"Intra-candle: Buy +{added.buy_score} | Sell +{added.sell_score} "
+                      f"(nen: Buy {intra_signal.buy_score} | Sell {intra_signal.sell_score})")
+            self._log(f"ACCUMULATED: Buy = {self.accumulated_score.buy_score} | "
+                      f"Sell = {self.accumulated_score.sell_score}")
+            await self._trade()
+            await self._save()
+
+
+def state_file(symbol):
+    """File trang thai mac dinh cua symbol."""
+    return os.path.join(STATE_DIR, f"runtime_state_{symbol}.json")
+
+
+async def _run_runners(symbols, config):
+    runners = [SymbolRunner(symbol, state_file=state_file(symbol), **config) for symbol in symbols]
+    await asyncio.gather(*(runner.run() for runner in runners))
+
+
+def run_group(symbols, config):
+    """Chay cac symbol tren 1 event loop trong process hien tai (MT5 da ket noi)."""
+    asyncio.run(_run_runners(symbols, config))
+
+
+def _worker(symbols, config):
+    if not mt5.initialize():
+        log(f"{symbols}: Khong the ket noi MT5:", mt5.last_error())
+        return
+    run_group(symbols, config)
+
+
+def run_symbols(symbols, config, processes=None):
+    """
+    Chay cac symbol tren `processes` process (mac dinh: 1 / symbol, toi da so core).
+    1 process -> chay ngay trong process hien tai. Khong tra ve.
+    ValueError ngay (truoc khi tao process) neu co symbol chua co profile tham so.
+    """
+    for symbol in symbols:
+        get_profile(symbol)
+    processes = min(len(symbols), processes or os.cpu_count() or 1)
+    if processes <= 1:
+        run_group(symbols, config)
+        return
+
+    groups = [symbols[i::processes] for i in range(processes)]
+    workers = [None] * processes
+    while True:
+        for i, group in enumerate(groups):
+            if workers[i] is None or not workers[i].is_alive():
+                if workers[i] is not None:
+                    log(f"{group}: process dung (exit {workers[i].exitcode}), khoi dong lai")
+                    flush_logs()
+                workers[i] = multiprocessing.Process(target=_worker, args=(group, config),
+                                                     name=f"runner-{'-'.join(group)}", daemon=True)
+                workers[i].start()
+        time.sleep(5)
@@ -0,0 +1,46 @@
+"""
+Scheduler - tinh thoi diem dong nen theo gio server MT5 de ngu den dung luc do
+
+Logic:
+- Gio server = gio may + offset; offset uoc luong tu timestamp tick (time_msc) luc nhan
+- Tick den tre (mang, poll) chi lam offset nho di -> lay max offset cac mau trong
+  `window` giay gan nhat (deque don dieu), tu theo kip lech dong ho may
+- Moc nen khung `seconds` giay: boi so cua `seconds` theo gio server (giong MT5)
+"""
+
+import time
+from collections import deque
+
+
+class ServerClock:
+    """
+    Gio server MT5 uoc luong tu tick.
+
+    offset: gio server - gio may (giay), None khi chua co tick nao.
+    """
+    def __init__(self, window=600):
+        self.window = window
+        self.samples = deque()  # (gio may, offset) - offset giam dan tu dau den cuoi
+        self.offset = None
+
+    def observe(self, server_time, local_time):
+        """1 mau: tick co gio server `server_time` nhan duoc luc `local_time` (gio may)."""
+        offset = server_time - local_time
+        samples = self.samples
+        while samples and samples[-1][1] <= offset:
+            samples.pop()
+        samples.append((local_time, offset))
+        while samples[0][0] < local_time - self.window:
+            samples.popleft()
+        self.offset = samples[0][1]
+
+    def now(self):
+        return time.time() + self.offset
+
+    def bar_open(self, seconds):
+        """Gio server mo cua nen khung `seconds` hien tai."""
+        return int(self.now() // seconds * seconds)
+
+    def until_close(self, seconds, guard=0.02):
+        """So giay (gio may) toi khi nen hien tai dong, + guard."""
+        return max(0.0, self.bar_open(seconds) + seconds - self.now() + guard)
@@ -0,0 +1,48 @@
+"""
+State store - luu / khoi phuc trang thai chay cua bot sau khi khoi dong lai
+
+Logic:
+- Trang thai = dict JSON (diem tich luy, nen da xu ly, tien do BE, IndicatorState...)
+- Ghi ra file tmp + fsync roi os.replace: file luon la ban day du (cu hoac moi),
+  mat dien giua chung khong lam hong
+- File loi / khac phien ban / khong co -> None (bot chay tu dau nhu truoc)
+"""
+
+import os
+import json
+
+from telegram_bot import log
+
+
+STATE_VERSION = 1
+
+
+def save_state(path, state):
+    """Ghi state (dict JSON) ra `path` (atomic). Returns True neu thanh cong."""
+    tmp = path + ".tmp"
+    try:
+        with open(tmp, 'w') as f:
+            json.dump({'version': STATE_VERSION, 'state': state}, f, separators=(',', ':'))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+        return True
+    except (OSError, TypeError, ValueError) as e:
+        log(f"Khong luu duoc trang thai: {e}")
+        return False
+
+
+def load_state(path):
+    """Doc state da luu boi save_state, None neu chua co / khong dung duoc."""
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path) as f:
+            data = json.load(f)
+    except (OSError, ValueError) as e:
+        log(f"Khong doc duoc trang thai ({e}), chay tu dau")
+        return None
+    if not isinstance(data, dict) or data.get('version') != STATE_VERSION:
+        log("Trang thai da luu khac phien ban, chay tu dau")
+        return None
+    return data['state']
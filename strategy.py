@@ -1,643 +1,1327 @@
-from indicators import calculate_rsi, calculate_ema, calculate_sma
+from indicators import EMA, RSI, RollingMax, RollingMin, RegressionChannel
+from profiles import DEFAULT_PROFILE
 from telegram_bot import log
-import math
+import time
+import threading
+from collections import deque
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+BUY = 1
+SELL = -1
+
+# 1 lan factor cong diem: (factor, phia, diem, gia tri, mau chu) - chi doi ra chu khi can log
+HIT_DTYPE = np.dtype([('factor', '<i2'), ('side', 'i1'), ('points', '<f8'), ('value', '<f8'), ('text', '<i2')])
+
+# Mau chu cua hit (format voi value/points), index = cot 'text'; -1 = khong co dong rieng
+HIT_TEXTS = []
+_TEXT_IDS = {}
+_text_lock = threading.Lock()  # evaluate_signals chay tren nhieu thread (runner)
+
+
+def _text(template, *parts):
+    """Index mau chu trong HIT_TEXTS (template % parts), chi tao chuoi lan dau gap."""
+    key = (template, parts)
+    text = _TEXT_IDS.get(key)
+    if text is None:
+        with _text_lock:
+            text = _TEXT_IDS.get(key)
+            if text is None:
+                HIT_TEXTS.append(template % parts if parts else template)
+                text = _TEXT_IDS[key] = len(HIT_TEXTS) - 1
+    return text
+
 
 class Signal:
     """
     Container for buy and sell scores.
+    
+    hits: mang HIT_DTYPE cac lan factor cong diem (cap phat khi co hit dau tien);
+    details: chu tuong ung, chi tao khi doc (log).
     """
+    __slots__ = ('buy_score', 'sell_score', '_hits', 'count')
+    
     def __init__(self):
         self.buy_score = 0
         self.sell_score = 0
-        self.details = []  # Chi tiết các factor đã cộng điểm
+        self._hits = None
+        self.count = 0
+    
+    def _reserve(self, n):
+        if self._hits is None:
+            self._hits = np.empty(max(8, n), dtype=HIT_DTYPE)
+        elif self.count + n > len(self._hits):
+            grown = np.empty(max(2 * len(self._hits), self.count + n), dtype=HIT_DTYPE)
+            grown[:self.count] = self._hits[:self.count]
+            self._hits = grown
+    
+    def hit(self, side, points, text=-1, value=np.nan, factor=-1):
+        """Cong `points` cho phia side (BUY/SELL) va ghi lai 1 hit."""
+        if side == BUY:
+            self.buy_score += points
+        else:
+            self.sell_score += points
+        self._reserve(1)
+        self._hits[self.count] = (factor, side, points, value, text)
+        self.count += 1
+    
+    def extend(self, other):
+        """Them cac hit cua other (khong cong diem)."""
+        if other.count:
+            self._reserve(other.count)
+            self._hits[self.count:self.count + other.count] = other.hits
+            self.count += other.count
+    
+    @property
+    def hits(self):
+        if self._hits is None:
+            return np.empty(0, dtype=HIT_DTYPE)
+        return self._hits[:self.count]
+    
+    @property
+    def details(self):
+        """Chi tiết các factor đã cộng điểm (dang chu)."""
+        return [HIT_TEXTS[text].format(value=value, points=points)
+                for text, value, points in zip(self.hits['text'].tolist(), self.hits['value'].tolist(),
+                                               self.hits['points'].tolist())
+                if text >= 0]
+
+
+class IntraCandleAccumulator:
+    """
+    Quyet dinh khi nao diem cham giua nen (evaluate_signals(price=...)) duoc cong vao diem tich luy.
+    
+    Moi lan cham giua nen la diem cua ca nen tai gia hien tai (khong cong don): diem chi
+    duoc tinh khi giu nguyen `confirm` lan cham lien tiep, va moi nen chi cong phan tang
+    so voi phan da cong truoc do. Luc dong nen, close() cong phan diem dong nen con thieu,
+    nen 1 nen dong gop max(diem giua nen da xac nhan, diem dong nen).
+    """
+    def __init__(self, confirm=3):
+        self.confirm = confirm
+        self._reset()
+    
+    def _reset(self):
+        self.last = None
+        self.streak = 0
+        self.counted = [0, 0]  # Diem buy/sell cua nen nay da cong vao tich luy
+    
+    def _delta(self, signal):
+        delta = Signal()
+        delta.buy_score = max(0, signal.buy_score - self.counted[0])
+        delta.sell_score = max(0, signal.sell_score - self.counted[1])
+        self.counted[0] += delta.buy_score
+        self.counted[1] += delta.sell_score
+        if delta.buy_score or delta.sell_score:
+            delta.extend(signal)
+        return delta
+    
+    def add(self, signal):
+        """Ket qua 1 lan cham giua nen. Returns Signal phan diem can cong vao tich luy (co the = 0)."""
+        scores = (signal.buy_score, signal.sell_score)
+        self.streak = self.streak + 1 if scores == self.last else 1
+        self.last = scores
+        if self.streak < self.confirm:
+            return Signal()
+        return self._delta(signal)
+    
+    def close(self, signal):
+        """Diem luc dong nen. Returns phan diem con thieu can cong vao tich luy."""
+        delta = self._delta(signal)
+        self._reset()
+        return delta
+    
+    def snapshot(self):
+        return {'last': self.last, 'streak': self.streak, 'counted': list(self.counted)}
+    
+    def restore(self, state):
+        self.last = tuple(state['last']) if state['last'] is not None else None
+        self.streak = state['streak']
+        self.counted = list(state['counted'])
 
 
+class IndicatorState:
+    """
+    Trang thai EMA/RSI, max/min va kenh hoi quy cua so truot streaming cho evaluate_signals(state=...).
+    
+    Moi lan goi chi dua cac nen moi dong (theo cot 'time') vao indicator,
+    O(1) moi nen thay vi tinh lai / quet lai 100-600 nen moi khung. Lan dau (hoac khi
+    bi mat nen giua 2 lan goi) indicator duoc seed tu nen dau cua so, nen
+    ket qua lan dau trung khop voi cach tinh theo cua so.
+    """
+    # ten: (khung, tao indicator, so gia tri gan nhat can giu)
+    SPEC = {
+        'rsi14_m15': ('m15', lambda: RSI(14), 7),
+        'ema9_m15': ('m15', lambda: EMA(9), 2),
+        'ema21_m15': ('m15', lambda: EMA(21), 2),
+        'ema21_h4': ('h4', lambda: EMA(21), 2),
+        'ema50_h4': ('h4', lambda: EMA(50), 2),
+        'ema100_h1': ('h1', lambda: EMA(100), 3),
+        # Max/min close cua cua so truot: (gia, index) - F1/F2 dung cua so ket thuc o nen truoc
+        'max_close99_m15': ('m15', lambda: RollingMax(99), 2),
+        'min_close99_m15': ('m15', lambda: RollingMin(99), 2),
+        'max_close100_m15': ('m15', lambda: RollingMax(100), 1),
+        'min_close100_m15': ('m15', lambda: RollingMin(100), 1),
+        'max_close99_h4': ('h4', lambda: RollingMax(99), 2),
+        'min_close99_h4': ('h4', lambda: RollingMin(99), 2),
+        'max_close100_h4': ('h4', lambda: RollingMax(100), 1),
+        'min_close100_h4': ('h4', lambda: RollingMin(100), 1),
+        'max_close600_h4': ('h4', lambda: RollingMax(600), 1),
+        'min_close600_h4': ('h4', lambda: RollingMin(600), 1),
+        # Kenh hoi quy Factor 8: (slope, intercept, dev_above, dev_below)
+        'channel200_m30': ('m30', lambda: RegressionChannel(200), 1),
+    }
+    
+    def __init__(self):
+        self.last_time = {'m15': None, 'h4': None, 'h1': None, 'm30': None}
+        self.indicators = {}
+        self.history = {}
+        for tf in self.last_time:
+            self._reset(tf)
+    
+    def _reset(self, tf):
+        for name, (spec_tf, factory, keep) in self.SPEC.items():
+            if spec_tf == tf:
+                self.indicators[name] = factory()
+                self.history[name] = deque(maxlen=keep)
+    
+    def update(self, rates_m15, rates_h4, rates_h1, rates_m30=None):
+        """Cap nhat indicator voi cac nen dong moi cua tung khung."""
+        self._feed('m15', rates_m15)
+        self._feed('h4', rates_h4)
+        self._feed('h1', rates_h1)
+        if rates_m30 is not None:
+            self._feed('m30', rates_m30)
+    
+    def _feed(self, tf, rates):
+        times = _column(rates, 'time', 0)
+        if len(times) == 0:
+            return
+        
+        last = self.last_time[tf]
+        if last is None or times[0] > last or times[-1] < last:
+            # Lan dau / mat nen / du lieu lui lai -> seed lai tu dau cua so
+            self._reset(tf)
+            start = 0
+        else:
+            start = int(np.searchsorted(times, last, side='right'))
+        
+        # Indicator nhan close, tru khi khai bao inputs khac (vd. RegressionChannel: high, low, close)
+        feeds = []
+        columns = {}
+        for name, spec in self.SPEC.items():
+            if spec[0] == tf:
+                fields = getattr(self.indicators[name], 'inputs', ('close',))
+                for field in fields:
+                    if field not in columns:
+                        columns[field] = _column(rates, field, _FIELD_INDEX[field])[start:].tolist()
+                feeds.append((self.indicators[name].update, self.history[name].append,
+                              [columns[field] for field in fields]))
+        
+        for i in range(len(times) - start):
+            for update, append, values in feeds:
+                append(update(*[column[i] for column in values]))
+        self.last_time[tf] = int(times[-1])
+    
+    def tail(self, name):
+        """Cac gia tri gan nhat cua indicator (nan neu chua co)."""
+        return _tail(list(self.history[name]), self.SPEC[name][2])
+    
+    def value(self, name, lag=0):
+        """Gia tri cua indicator `name` tai nen thu `lag` tinh tu cuoi (None neu chua co)."""
+        history = self.history[name]
+        return history[-1 - lag] if len(history) > lag else None
+    
+    def snapshot(self):
+        return {
+            'last_time': dict(self.last_time),
+            'indicators': {name: ind.snapshot() for name, ind in self.indicators.items()},
+            'history': {name: list(hist) for name, hist in self.history.items()},
+        }
+    
+    def restore(self, state):
+        self.last_time.update(state['last_time'])
+        for name, snap in state['indicators'].items():
+            self.indicators[name].restore(snap)
+            # JSON: tuple (max/min, kenh) -> list
+            history = (tuple(v) if isinstance(v, list) else v for v in state['history'][name])
+            self.history[name] = deque(history, maxlen=self.SPEC[name][2])
+
+
+# So nen dong main.py lay moi khung moi lan cham diem (H4 600 nen cho Factor 6)
+LIVE_BARS = {'m15': 100, 'h4': 600, 'h1': 150, 'm30': 200}
+
 # Điểm thủ công (manual bias) - có thể điều chỉnh từ -10 đến +10
 MANUAL_BIAS = 0  # 0 = không thiên vị, >0 = thiên buy, <0 = thiên sell
 
 
-def evaluate_signals(symbol, rates_m15, rates_h4, rates_h1, rates_m30, verbose=True):
+def _column(rates, name, index):
     """
-    Evaluate trading signals based on the provided historical rates.
-    Returns a Signal object with buy_score and sell_score.
+    Lay 1 cot gia (close/high/low) cua rates duoi dang mang numpy float64.
+    Structured array tra ve tu mt5.copy_rates_from_pos / BarSlice cua bar_store -> view, khong copy.
+    List dict/tuple (du lieu test) -> chuyen sang mang.
     """
-    signal = Signal()
+    if getattr(getattr(rates, 'dtype', None), 'names', None):
+        return rates[name]
+    return np.array([bar[name] if isinstance(bar, dict) else bar[index] for bar in rates], dtype=float)
+
+
+def _seq_sum(values):
+    """Cong tuan tu tu trai sang phai (giong sum() cua Python) de diem so khong doi."""
+    return np.cumsum(values)[-1]
+
+
+# Cac muc Fib (theo thu tu cham diem): 3 muc hoi nong, 2 muc hoi sau, 2 muc mo rong
+_FIB_NEAR_LEVELS = (0.236, 0.382, 1.0, 0.618, 0.786)
+_FIB_NEAR_RATIOS = np.array(_FIB_NEAR_LEVELS)
+_FIB_EXT_LEVELS = (1.618, 2.618)
+_FIB_EXT_UP_RATIOS = np.array([1.618, 2.618])
+_FIB_EXT_DOWN_RATIOS = np.array([0.618, 1.618])
+
+
+def _fib_hits(high, low, current_price, min_tol):
+    """
+    Song Fib tu dinh/day close cua 99 nen dong gan nhat (bo nen hien tai).
+    high/low: (gia, index) - index chi dung de biet dinh hay day den sau.
+    Returns (trend, near, ext): near/ext la mask cac muc Fib gia dang cham,
+    hoac None neu khong xac dinh duoc xu huong.
+    """
+    window_high, idx_high = high
+    window_low, idx_low = low
+    range_val = abs(window_high - window_low)
     
-    # Extract data from rates
-    closes_m15 = [bar['close'] if isinstance(bar, dict) else bar[4] for bar in rates_m15]
-    highs_m15 = [bar['high'] if isinstance(bar, dict) else bar[2] for bar in rates_m15]
-    lows_m15 = [bar['low'] if isinstance(bar, dict) else bar[3] for bar in rates_m15]
+    if range_val <= 0:
+        return None
     
-    closes_h4 = [bar['close'] if isinstance(bar, dict) else bar[4] for bar in rates_h4]
-    highs_h4 = [bar['high'] if isinstance(bar, dict) else bar[2] for bar in rates_h4]
-    lows_h4 = [bar['low'] if isinstance(bar, dict) else bar[3] for bar in rates_h4]
+    fib_tol = max(min_tol, 0.02 * range_val)
     
-    closes_h1 = [bar['close'] if isinstance(bar, dict) else bar[4] for bar in rates_h1]
+    if idx_high > idx_low:
+        # Uptrend: A = day, B = dinh
+        near_levels = window_high - _FIB_NEAR_RATIOS * range_val
+        near_levels[2] = window_low
+        ext_levels = window_low + _FIB_EXT_UP_RATIOS * range_val
+        ext = current_price >= ext_levels - fib_tol
+        trend = "uptrend"
+    else:
+        # Downtrend: A = dinh, B = day
+        near_levels = window_low + _FIB_NEAR_RATIOS * range_val
+        near_levels[2] = window_high
+        ext_levels = window_low - _FIB_EXT_DOWN_RATIOS * range_val
+        ext = current_price <= ext_levels + fib_tol
+        trend = "downtrend"
     
-    closes_m30 = [bar['close'] if isinstance(bar, dict) else bar[4] for bar in rates_m30]
-    highs_m30 = [bar['high'] if isinstance(bar, dict) else bar[2] for bar in rates_m30]
-    lows_m30 = [bar['low'] if isinstance(bar, dict) else bar[3] for bar in rates_m30]
+    near = np.abs(current_price - near_levels) <= fib_tol
+    return trend, near, ext
+
+
+def _score_fib(signal, name, label, hits, buy_points, sell_points):
+    """
+    Cong diem Fib cho ca 2 phia.
+    buy_points/sell_points = (diem muc 0.236/0.382/1.0, diem muc 0.618/0.786, diem muc mo rong)
+    """
+    trend, near, ext = hits
+    for side, label_side, points in ((BUY, "Buy", buy_points), (SELL, "Sell", sell_points)):
+        for k in np.flatnonzero(near):
+            pts = points[0] if k < 3 else points[1]
+            signal.hit(side, pts, _text("%s: Fib %s %s {value} -> %s +{points:g}", name, label, trend, label_side),
+                       _FIB_NEAR_LEVELS[k])
+        for k in np.flatnonzero(ext):
+            signal.hit(side, points[2], _text("%s: Fib %s %s ext {value} -> %s +{points:g}", name, label, trend,
+                                              label_side), _FIB_EXT_LEVELS[k])
+
+
+def _tail(values, n):
+    """n gia tri cuoi cua values duoi dang mang float (None -> nan, thieu -> nan o dau)."""
+    out = np.full(n, np.nan)
+    last = np.array(values[-n:], dtype=float)
+    if len(last):
+        out[n - len(last):] = last
+    return out
+
+
+def _rsi_double_extreme(rsi_window, lows):
+    """
+    Kiem tra 2 day (lows=True) hoac 2 dinh RSI trong cua so 7 nen:
+    cuc tri thu 2 phai thap hon (day) / cao hon (dinh) cuc tri thu 1.
+    """
+    mid = rsi_window[1:-1]
+    if lows:
+        mask = (mid < rsi_window[:-2]) & (mid < rsi_window[2:])
+    else:
+        mask = (mid > rsi_window[:-2]) & (mid > rsi_window[2:])
+    idx = np.flatnonzero(mask)
+    if len(idx) < 2:
+        return False
+    first, second = mid[idx[0]], mid[idx[1]]
+    return second < first if lows else second > first
+
+
+# Chi so cot trong tuple (time, open, high, low, close, ...) cua MT5
+_FIELD_INDEX = {'time': 0, 'open': 1, 'high': 2, 'low': 3, 'close': 4}
+
+
+class TimeframeCache:
+    """
+    Gia tri dan xuat tu 1 khung (EMA, max/min, kenh, SMA...) giu theo nen dong cuoi cua khung do:
+    khung chua co nen moi (vd. H4 giua 4 lan cham H1) -> dung lai thay vi tinh lai.
+    hits/misses: {khung: so lan lay tu cache / phai tinh}.
+    """
+    def __init__(self):
+        self.bars = {}    # khung -> (time nen dong cuoi, so nen)
+        self.values = {}  # khung -> {ten: gia tri}
+        self.hits = {}
+        self.misses = {}
     
-    len_m15 = len(closes_m15)
-    len_h4 = len(closes_h4)
-    len_h1 = len(closes_h1)
-    len_m30 = len(closes_m30)
+    def get(self, tf, bar, name, compute):
+        if self.bars.get(tf) != bar:
+            # Khung da sang nen moi -> bo gia tri cu
+            self.bars[tf] = bar
+            self.values[tf] = {}
+        values = self.values[tf]
+        if name in values:
+            self.hits[tf] = self.hits.get(tf, 0) + 1
+        else:
+            self.misses[tf] = self.misses.get(tf, 0) + 1
+            values[name] = compute()
+        return values[name]
     
-    if len_m15 == 0:
-        return signal
+    def stats(self):
+        """{khung: (hits, misses)}."""
+        return {tf: (self.hits.get(tf, 0), self.misses.get(tf, 0))
+                for tf in sorted(set(self.hits) | set(self.misses))}
+
+
+class FactorInputs:
+    """
+    Du lieu cua 1 lan cham diem cho cac factor.
+    Cot gia va EMA/RSI chi duoc doc/tinh khi co factor can toi (factor tat -> khong ton chi phi).
+    
+    rates: {'m15': ..., 'h4': ..., 'h1': ..., 'm30': ...}
+    state: IndicatorState (tuy chon), giong evaluate_signals(state=...).
+    cache: TimeframeCache dung chung giua cac lan cham (mac dinh chi dung trong lan nay).
+    price: gia hien tai (vd. bid cua tick moi nhat khi cham giua nen), mac dinh close nen M15 cuoi.
+    profile: profiles.SymbolProfile (sai so / nguong tinh bang gia), mac dinh XAUUSD.
+    """
+    def __init__(self, rates, state=None, cache=None, price=None, profile=None):
+        self.rates = rates
+        self.state = state
+        self.profile = profile or DEFAULT_PROFILE
+        self.cache = cache if cache is not None else TimeframeCache()
+        self._columns = {}
+        self._bars = {}
+        if price is None:
+            closes_m15 = self.close('m15')
+            price = closes_m15[-1] if len(closes_m15) else None
+        self.price = price
     
-    current_price = closes_m15[-1]
-    i = len_m15 - 1  # Current index
+    def length(self, tf):
+        return len(self.rates[tf])
     
-    # Calculate RSI array for M15
-    RSI = calculate_rsi_array(closes_m15, 14)
+    def column(self, tf, name):
+        key = (tf, name)
+        if key not in self._columns:
+            self._columns[key] = _column(self.rates[tf], name, _FIELD_INDEX[name])
+        return self._columns[key]
     
-    # Calculate EMA arrays
-    EMA9 = calculate_ema_array(closes_m15, 9)
-    EMA21 = calculate_ema_array(closes_m15, 21)
-    EMA21_H4 = calculate_ema_array(closes_h4, 21)
-    EMA50_H4 = calculate_ema_array(closes_h4, 50)
-    EMA100_H1 = calculate_ema_array(closes_h1, 100)
+    def close(self, tf):
+        return self.column(tf, 'close')
     
-    # ========== FACTOR 1: Fibonacci M15 ==========
-    if len_m15 >= 100:
-        start_idx = len_m15 - 100
-        end_idx = len_m15 - 2
+    def high(self, tf):
+        return self.column(tf, 'high')
+    
+    def low(self, tf):
+        return self.column(tf, 'low')
+    
+    def derived(self, tf, name, compute):
+        """Gia tri `name` tinh tu khung tf bang compute(), lay lai tu cache neu khung chua co nen moi."""
+        if tf not in self._bars:
+            times = self.column(tf, 'time')
+            self._bars[tf] = (int(times[-1]), len(times)) if len(times) else None
+        return self.cache.get(tf, self._bars[tf], name, compute)
+    
+    def tail(self, name):
+        """Cac gia tri gan nhat cua indicator trong IndicatorState.SPEC (nan = chua du du lieu)."""
+        tf, factory, keep = IndicatorState.SPEC[name]
         
-        window_high = -float('inf')
-        window_low = float('inf')
-        idx_high = start_idx
-        idx_low = start_idx
+        def compute():
+            if self.state is not None:
+                return self.state.tail(name)
+            # EMA/RSI la de quy nen tinh tuan tu tren list float
+            indicator = factory()
+            calculate = calculate_rsi_array if isinstance(indicator, RSI) else calculate_ema_array
+            return _tail(calculate(self.close(tf).tolist(), indicator.period), keep)
+        return self.derived(tf, name, compute)
+    
+    def extremum(self, name, lag=0):
+        """
+        (gia, index) max/min close cua cua so RollingMax/RollingMin `name` trong
+        IndicatorState.SPEC, ket thuc truoc `lag` nen cuoi. Co state -> deque don dieu
+        cap nhat O(1) moi nen; khong co -> argmax/argmin tren cua so.
+        """
+        tf, factory, keep = IndicatorState.SPEC[name]
         
-        for k in range(start_idx, end_idx + 1):
-            if closes_m15[k] > window_high:
-                window_high = closes_m15[k]
-                idx_high = k
-            if closes_m15[k] < window_low:
-                window_low = closes_m15[k]
-                idx_low = k
+        def compute():
+            if self.state is not None:
+                return self.state.value(name, lag)
+            tracker = factory()
+            closes = self.close(tf)
+            end = len(closes) - lag
+            window = closes[end - tracker.period:end]
+            index = int(window.argmin() if tracker.lows else window.argmax())
+            return (window[index], end - tracker.period + index)
+        return self.derived(tf, (name, lag), compute)
+    
+    def channel(self, name):
+        """(slope, intercept, dev_above, dev_below) cua RegressionChannel `name` trong IndicatorState.SPEC."""
+        tf, factory, keep = IndicatorState.SPEC[name]
         
-        trending_up = idx_high > idx_low
-        trending_down = idx_low > idx_high
-        range_val = abs(window_high - window_low)
+        def compute():
+            if self.state is not None:
+                return self.state.value(name)
+            return _regression_channel(self.high(tf), self.low(tf), self.close(tf), factory().period)
+        return self.derived(tf, name, compute)
+    
+    def sma(self, tf, period):
+        """SMA close `period` nen cuoi (cong tuan tu)."""
+        return self.derived(tf, f"sma{period}", lambda: _seq_sum(self.close(tf)[-period:]) / period)
+    
+    def signature(self, tfs, price=True):
+        """Dinh danh du lieu cua cac khung tfs (+ gia hien tai) - khong doi thi ket qua factor khong doi."""
+        key = []
+        for tf in tfs:
+            times = self.column(tf, 'time')
+            key.append((len(times), times[0], times[-1]) if len(times) else (0,))
+        if price:
+            key.append(self.price)
+        return tuple(key)
+
+
+class Factor:
+    """
+    1 factor da dang ky: func(inputs, signal) cong diem vao signal.
+    bars: so nen dong toi thieu cua tung khung, thieu -> factor khong cham.
+    price: factor co dung gia hien tai (close nen M15 cuoi) hay khong.
+    """
+    def __init__(self, name, func, bars, price):
+        if name not in FACTOR_NAMES:
+            FACTOR_NAMES.append(name)
+        self.id = FACTOR_NAMES.index(name)  # cot 'factor' cua Signal.hits
+        self.name = name
+        self.func = func
+        self.bars = bars
+        self.price = price
+    
+    def ready(self, inputs):
+        return all(inputs.length(tf) >= n for tf, n in self.bars.items())
+    
+    def run(self, inputs):
+        """Cham diem rieng factor nay. Returns Signal."""
+        signal = Signal()
+        if self.ready(inputs):
+            self.func(inputs, signal)
+            if signal.count:
+                signal.hits['factor'] = self.id
+        return signal
+
+
+# Cac factor da dang ky (ten -> Factor), theo thu tu cham diem
+FACTORS = {}
+
+# Ten factor theo id (cot 'factor' cua Signal.hits)
+FACTOR_NAMES = []
+
+# Factor tat, vd. {'F8'} khi can do tre thap - ap dung ca cho evaluate_signals_batch
+DISABLED_FACTORS = set()
+
+
+def factor(name, price=True, **bars):
+    """
+    Decorator dang ky factor moi, vd.:
         
-        if range_val > 0:
-            fib_tol = max(0.1, 0.02 * range_val)
-            
-            if trending_up:
-                A = window_low
-                B = window_high
-                # Các mức Fib
-                fib_levels = {
-                    0.236: B - 0.236 * range_val,
-                    0.382: B - 0.382 * range_val,
-                    1.0: A,
-                    0.618: B - 0.618 * range_val,
-                    0.786: B - 0.786 * range_val,
-                    1.618: A + 1.618 * range_val,
-                    2.618: A + 2.618 * range_val,
-                }
-                # Uptrend Buy
-                for lvl in [0.236, 0.382, 1.0]:
-                    if abs(current_price - fib_levels[lvl]) <= fib_tol:
-                        signal.buy_score += 2
-                        signal.details.append(f"F1: Fib M15 uptrend {lvl} -> Buy +2")
-                for lvl in [0.618, 0.786]:
-                    if abs(current_price - fib_levels[lvl]) <= fib_tol:
-                        signal.buy_score += 2
-                        signal.details.append(f"F1: Fib M15 uptrend {lvl} -> Buy +2")
-                for lvl in [1.618, 2.618]:
-                    if current_price >= fib_levels[lvl] - fib_tol:
-                        signal.buy_score += 4
-                        signal.details.append(f"F1: Fib M15 uptrend ext {lvl} -> Buy +4")
-                # Uptrend Sell
-                for lvl in [0.236, 0.382, 1.0]:
-                    if abs(current_price - fib_levels[lvl]) <= fib_tol:
-                        signal.sell_score += 2
-                        signal.details.append(f"F1: Fib M15 uptrend {lvl} -> Sell +2")
-                for lvl in [0.618, 0.786]:
-                    if abs(current_price - fib_levels[lvl]) <= fib_tol:
-                        signal.sell_score += 3
-                        signal.details.append(f"F1: Fib M15 uptrend {lvl} -> Sell +3")
-                for lvl in [1.618, 2.618]:
-                    if current_price >= fib_levels[lvl] - fib_tol:
-                        signal.sell_score += 5
-                        signal.details.append(f"F1: Fib M15 uptrend ext {lvl} -> Sell +5")
+        @factor('F16', m30=50)
+        def _my_factor(inputs, signal): ...
+    """
+    def register(func):
+        FACTORS[name] = Factor(name, func, bars, price)
+        return func
+    return register
+
+
+def enabled_factors(names=None):
+    """Ten cac factor se chay (theo thu tu dang ky): names (mac dinh tat ca) tru DISABLED_FACTORS."""
+    return [name for name in FACTORS
+            if (names is None or name in names) and name not in DISABLED_FACTORS]
+
+
+class FactorEngine:
+    """
+    Chay cac factor cho evaluate_signals(engine=...).
+    
+    Ket qua moi factor duoc giu lai theo du lieu cac khung no khai bao (+ gia hien tai):
+    lan cham sau chi chay lai factor co dau vao thay doi. Factor khong khai bao khung
+    (F15) luon chay lai.
+    
+    factors: chi chay cac factor nay (mac dinh tat ca, tru DISABLED_FACTORS).
+    timings: {ten: thoi gian chay lan gan nhat (giay)}.
+    timeframes: TimeframeCache - gia tri tinh tu tung khung, dung lai toi khi khung co nen moi
+    (1 engine chi nen dung voi 1 IndicatorState / hoac luon khong state).
+    """
+    def __init__(self, factors=None):
+        self.factors = factors
+        self.cache = {}
+        self.timings = {}
+        self.timeframes = TimeframeCache()
+    
+    def run(self, inputs, signal):
+        for name in enabled_factors(self.factors):
+            entry = FACTORS[name]
+            key = inputs.signature(entry.bars, entry.price) if entry.bars else None
+            cached = self.cache.get(name)
+            if key is None or cached is None or cached[0] != key:
+                start = time.perf_counter()
+                cached = (key, entry.run(inputs))
+                self.timings[name] = time.perf_counter() - start
+                self.cache[name] = cached
             
-            elif trending_down:
-                A = window_high
-                B = window_low
-                # Các mức Fib
-                fib_levels = {
-                    0.236: B + 0.236 * range_val,
-                    0.382: B + 0.382 * range_val,
-                    1.0: A,
-                    0.618: B + 0.618 * range_val,
-                    0.786: B + 0.786 * range_val,
-                    1.618: B - 0.618 * range_val,
-                    2.618: B - 1.618 * range_val,
-                }
-                # Downtrend Buy
-                for lvl in [0.236, 0.382, 1.0]:
-                    if abs(current_price - fib_levels[lvl]) <= fib_tol:
-                        signal.buy_score += 2
-                        signal.details.append(f"F1: Fib M15 downtrend {lvl} -> Buy +2")
-                for lvl in [0.618, 0.786]:
-                    if abs(current_price - fib_levels[lvl]) <= fib_tol:
-                        signal.buy_score += 3
-                        signal.details.append(f"F1: Fib M15 downtrend {lvl} -> Buy +3")
-                for lvl in [1.618, 2.618]:
-                    if current_price <= fib_levels[lvl] + fib_tol:
-                        signal.buy_score += 5
-                        signal.details.append(f"F1: Fib M15 downtrend ext {lvl} -> Buy +5")
-                # Downtrend Sell
-                for lvl in [0.236, 0.382, 1.0]:
-                    if abs(current_price - fib_levels[lvl]) <= fib_tol:
-                        signal.sell_score += 2
-                        signal.details.append(f"F1: Fib M15 downtrend {lvl} -> Sell +2")
-                for lvl in [0.618, 0.786]:
-                    if abs(current_price - fib_levels[lvl]) <= fib_tol:
-                        signal.sell_score += 2
-                        signal.details.append(f"F1: Fib M15 downtrend {lvl} -> Sell +2")
-                for lvl in [1.618, 2.618]:
-                    if current_price <= fib_levels[lvl] + fib_tol:
-                        signal.sell_score += 4
-                        signal.details.append(f"F1: Fib M15 downtrend ext {lvl} -> Sell +4")
+            result = cached[1]
+            signal.buy_score += result.buy_score
+            signal.sell_score += result.sell_score
+            signal.extend(result)
+        return signal
+
+
+# ========== FACTOR 1: Fibonacci M15 ==========
+@factor('F1', m15=100)
+def _fib_m15(inputs, signal):
+    hits = _fib_hits(inputs.extremum('max_close99_m15', lag=1), inputs.extremum('min_close99_m15', lag=1),
+                     inputs.price, inputs.profile.fib_tol_m15)
+    if hits is not None:
+        if hits[0] == "uptrend":
+            _score_fib(signal, "F1", "M15", hits, (2, 2, 4), (2, 3, 5))
+        else:
+            _score_fib(signal, "F1", "M15", hits, (2, 3, 5), (2, 2, 4))
+
+
+# ========== FACTOR 2: Fibonacci H4 ==========
+@factor('F2', h4=100)
+def _fib_h4(inputs, signal):
+    hits = _fib_hits(inputs.extremum('max_close99_h4', lag=1), inputs.extremum('min_close99_h4', lag=1),
+                     inputs.price, inputs.profile.fib_tol_h4)
+    if hits is not None:
+        if hits[0] == "uptrend":
+            _score_fib(signal, "F2", "H4", hits, (5, 7, 9), (7, 9, 15))
+        else:
+            _score_fib(signal, "F2", "H4", hits, (7, 9, 15), (5, 7, 9))
+
+
+# ========== FACTOR 3: RSI(14) M15 ==========
+@factor('F3', m15=15)
+def _rsi_m15(inputs, signal):
+    RSI = inputs.tail('rsi14_m15')
+    if np.isnan(RSI[-1]):
+        return
+    rsi_val = RSI[-1]
     
-    # ========== FACTOR 2: Fibonacci H4 ==========
-    if len_h4 >= 100:
-        start_idx = len_h4 - 100
-        end_idx = len_h4 - 2
-        
-        window_high = -float('inf')
-        window_low = float('inf')
-        idx_high = start_idx
-        idx_low = start_idx
+    # RSI < 30 (quá bán)
+    if rsi_val < 30:
+        signal.hit(BUY, 5, _text("F3: RSI={value:.1f} < 30 -> Buy +5"), rsi_val)
         
-        for k in range(start_idx, end_idx + 1):
-            if closes_h4[k] > window_high:
-                window_high = closes_h4[k]
-                idx_high = k
-            if closes_h4[k] < window_low:
-                window_low = closes_h4[k]
-                idx_low = k
+        # 2 đáy RSI
+        if _rsi_double_extreme(RSI, lows=True):
+            signal.hit(BUY, 7, _text("F3: RSI 2-bottom -> Buy +7"))
         
-        trending_up = idx_high > idx_low
-        trending_down = idx_low > idx_high
-        range_val = abs(window_high - window_low)
-        
-        if range_val > 0:
-            fib_tol = max(0.5, 0.02 * range_val)
-            
-            if trending_up:
-                A = window_low
-                B = window_high
-                fib_levels = {
-                    0.236: B - 0.236 * range_val,
-                    0.382: B - 0.382 * range_val,
-                    1.0: A,
-                    0.618: B - 0.618 * range_val,
-                    0.786: B - 0.786 * range_val,
-                    1.618: A + 1.618 * range_val,
-                    2.618: A + 2.618 * range_val,
-                }
-                # Uptrend Buy
-                for lvl in [0.236, 0.382, 1.0]:
-                    if abs(current_price - fib_levels[lvl]) <= fib_tol:
-                        signal.buy_score += 5
-                        signal.details.append(f"F2: Fib H4 uptrend {lvl} -> Buy +5")
-                for lvl in [0.618, 0.786]:
-                    if abs(current_price - fib_levels[lvl]) <= fib_tol:
-                        signal.buy_score += 7
-                        signal.details.append(f"F2: Fib H4 uptrend {lvl} -> Buy +7")
-                for lvl in [1.618, 2.618]:
-                    if current_price >= fib_levels[lvl] - fib_tol:
-                        signal.buy_score += 9
-                        signal.details.append(f"F2: Fib H4 uptrend ext {lvl} -> Buy +9")
-                # Uptrend Sell
-                for lvl in [0.236, 0.382, 1.0]:
-                    if abs(current_price - fib_levels[lvl]) <= fib_tol:
-                        signal.sell_score += 7
-                        signal.details.append(f"F2: Fib H4 uptrend {lvl} -> Sell +7")
-                for lvl in [0.618, 0.786]:
-                    if abs(current_price - fib_levels[lvl]) <= fib_tol:
-                        signal.sell_score += 9
-                        signal.details.append(f"F2: Fib H4 uptrend {lvl} -> Sell +9")
-                for lvl in [1.618, 2.618]:
-                    if current_price >= fib_levels[lvl] - fib_tol:
-                        signal.sell_score += 15
-                        signal.details.append(f"F2: Fib H4 uptrend ext {lvl} -> Sell +15")
-            
-            elif trending_down:
-                A = window_high
-                B = window_low
-                fib_levels = {
-                    0.236: B + 0.236 * range_val,
-                    0.382: B + 0.382 * range_val,
-                    1.0: A,
-                    0.618: B + 0.618 * range_val,
-                    0.786: B + 0.786 * range_val,
-                    1.618: B - 0.618 * range_val,
-                    2.618: B - 1.618 * range_val,
-                }
-                # Downtrend Buy
-                for lvl in [0.236, 0.382, 1.0]:
-                    if abs(current_price - fib_levels[lvl]) <= fib_tol:
-                        signal.buy_score += 7
-                        signal.details.append(f"F2: Fib H4 downtrend {lvl} -> Buy +7")
-                for lvl in [0.618, 0.786]:
-                    if abs(current_price - fib_levels[lvl]) <= fib_tol:
-                        signal.buy_score += 9
-                        signal.details.append(f"F2: Fib H4 downtrend {lvl} -> Buy +9")
-                for lvl in [1.618, 2.618]:
-                    if current_price <= fib_levels[lvl] + fib_tol:
-                        signal.buy_score += 15
-                        signal.details.append(f"F2: Fib H4 downtrend ext {lvl} -> Buy +15")
-                # Downtrend Sell
-                for lvl in [0.236, 0.382, 1.0]:
-                    if abs(current_price - fib_levels[lvl]) <= fib_tol:
-                        signal.sell_score += 5
-                        signal.details.append(f"F2: Fib H4 downtrend {lvl} -> Sell +5")
-                for lvl in [0.618, 0.786]:
-                    if abs(current_price - fib_levels[lvl]) <= fib_tol:
-                        signal.sell_score += 7
-                        signal.details.append(f"F2: Fib H4 downtrend {lvl} -> Sell +7")
-                for lvl in [1.618, 2.618]:
-                    if current_price <= fib_levels[lvl] + fib_tol:
-                        signal.sell_score += 9
-                        signal.details.append(f"F2: Fib H4 downtrend ext {lvl} -> Sell +9")
+        # RSI < 20 trong 2 nến
+        if RSI[-1] < 20 and RSI[-2] < 20:
+            signal.hit(BUY, 10, _text("F3: RSI < 20 for 2 candles -> Buy +10"))
     
-    # ========== FACTOR 3: RSI(14) M15 ==========
-    if len_m15 >= 15 and RSI[i] is not None:
-        rsi_val = RSI[i]
+    # RSI > 70 (quá mua)
+    if rsi_val > 70:
+        signal.hit(SELL, 3, _text("F3: RSI={value:.1f} > 70 -> Sell +3"), rsi_val)
         
-        # RSI < 30 (quá bán)
-        if rsi_val < 30:
-            signal.buy_score += 5
-            signal.details.append(f"F3: RSI={rsi_val:.1f} < 30 -> Buy +5")
-            
-            # 2 đáy RSI
-            if i >= 6:
-                rsi_window = RSI[max(0, i - 6):i + 1]
-                first_low = None
-                second_low = None
-                for j in range(1, len(rsi_window) - 1):
-                    if rsi_window[j] is not None and rsi_window[j-1] is not None and rsi_window[j+1] is not None:
-                        if rsi_window[j] < rsi_window[j - 1] and rsi_window[j] < rsi_window[j + 1]:
-                            if first_low is None:
-                                first_low = {'value': rsi_window[j], 'idx': j}
-                            elif second_low is None:
-                                second_low = {'value': rsi_window[j], 'idx': j}
-                
-                if first_low and second_low and second_low['idx'] > first_low['idx'] and second_low['value'] < first_low['value']:
-                    signal.buy_score += 7
-                    signal.details.append("F3: RSI 2-bottom -> Buy +7")
-            
-            # RSI < 20 trong 2 nến
-            if i >= 1 and RSI[i] < 20 and RSI[i - 1] is not None and RSI[i - 1] < 20:
-                signal.buy_score += 10
-                signal.details.append("F3: RSI < 20 for 2 candles -> Buy +10")
+        # 2 đỉnh RSI
+        if _rsi_double_extreme(RSI, lows=False):
+            signal.hit(SELL, 5, _text("F3: RSI 2-top -> Sell +5"))
         
-        # RSI > 70 (quá mua)
-        if rsi_val > 70:
-            signal.sell_score += 3
-            signal.details.append(f"F3: RSI={rsi_val:.1f} > 70 -> Sell +3")
-            
-            # 2 đỉnh RSI
-            if i >= 6:
-                rsi_window = RSI[max(0, i - 6):i + 1]
-                first_high = None
-                second_high = None
-                for j in range(1, len(rsi_window) - 1):
-                    if rsi_window[j] is not None and rsi_window[j-1] is not None and rsi_window[j+1] is not None:
-                        if rsi_window[j] > rsi_window[j - 1] and rsi_window[j] > rsi_window[j + 1]:
-                            if first_high is None:
-                                first_high = {'value': rsi_window[j], 'idx': j}
-                            elif second_high is None:
-                                second_high = {'value': rsi_window[j], 'idx': j}
-                
-                if first_high and second_high and second_high['idx'] > first_high['idx'] and second_high['value'] > first_high['value']:
-                    signal.sell_score += 5
-                    signal.details.append("F3: RSI 2-top -> Sell +5")
-            
-            # RSI > 80 trong 2 nến
-            if i >= 1 and RSI[i] > 80 and RSI[i - 1] is not None and RSI[i - 1] > 80:
-                signal.sell_score += 10
-                signal.details.append("F3: RSI > 80 for 2 candles -> Sell +10")
-    
-    # ========== FACTOR 4: Cản tĩnh ngang 100 nến M15 ==========
-    if len_m15 >= 100:
-        recent_closes = closes_m15[len_m15 - 100:len_m15]
-        max_close = max(recent_closes)
-        min_close = min(recent_closes)
-        tol = 0.5
+        # RSI > 80 trong 2 nến
+        if RSI[-1] > 80 and RSI[-2] > 80:
+            signal.hit(SELL, 10, _text("F3: RSI > 80 for 2 candles -> Sell +10"))
+
+
+def _score_level(signal, name, label, inputs, tf, count, tol, points):
+    """Cản tĩnh ngang: gia cham min/max close cua `count` nen gan nhat."""
+    current_price = inputs.price
+    max_close = inputs.extremum(f"max_close{count}_{tf}")[0]
+    min_close = inputs.extremum(f"min_close{count}_{tf}")[0]
+    
+    if abs(current_price - min_close) <= tol:
+        signal.hit(BUY, points, _text("%s: Price at %s %s-low -> Buy +{points:g}", name, label, count))
+    if abs(current_price - max_close) <= tol:
+        signal.hit(SELL, points, _text("%s: Price at %s %s-high -> Sell +{points:g}", name, label, count))
+
+
+# ========== FACTOR 4: Cản tĩnh ngang 100 nến M15 ==========
+@factor('F4', m15=100)
+def _level_m15_100(inputs, signal):
+    _score_level(signal, "F4", "M15", inputs, 'm15', 100, inputs.profile.level_tol_m15, 5)
+
+
+# ========== FACTOR 5: Cản tĩnh ngang 100 nến H4 ==========
+@factor('F5', h4=100)
+def _level_h4_100(inputs, signal):
+    _score_level(signal, "F5", "H4", inputs, 'h4', 100, inputs.profile.level_tol_h4, 8)
+
+
+# ========== FACTOR 6: Cản tĩnh ngang 600 nến H4 ==========
+@factor('F6', h4=600)
+def _level_h4_600(inputs, signal):
+    _score_level(signal, "F6", "H4", inputs, 'h4', 600, inputs.profile.level_tol_h4_600, 15)
+
+
+# ========== FACTOR 7: Phiên Á, Âu, Mỹ ==========
+@factor('F7', m15=192)
+def _sessions(inputs, signal):
+    current_price = inputs.price
+    highs_m15 = inputs.high('m15')
+    lows_m15 = inputs.low('m15')
+    
+    # Ngay hom truoc: 96 nen M15 = 3 phien x 32 nen (Asia, Euro, US)
+    prev_day_start = len(highs_m15) - 192
+    session_highs = highs_m15[prev_day_start:prev_day_start + 96].reshape(3, 32).max(axis=1)
+    session_lows = lows_m15[prev_day_start:prev_day_start + 96].reshape(3, 32).min(axis=1)
+    asia_high, euro_high, us_high = session_highs
+    asia_low, euro_low, us_low = session_lows
+    
+    # Asia
+    if current_price >= asia_high:
+        signal.hit(BUY, 5, _text("F7: Price >= Asia high -> Buy +5, Sell +3"))
+        signal.hit(SELL, 3)
+    if current_price <= asia_low:
+        signal.hit(BUY, 3, _text("F7: Price <= Asia low -> Buy +3, Sell +5"))
+        signal.hit(SELL, 5)
+    
+    # Europe
+    if current_price >= euro_high:
+        signal.hit(BUY, 7, _text("F7: Price >= Euro high -> Buy +7, Sell +5"))
+        signal.hit(SELL, 5)
+    if current_price <= euro_low:
+        signal.hit(BUY, 5, _text("F7: Price <= Euro low -> Buy +5, Sell +7"))
+        signal.hit(SELL, 7)
+    
+    # US
+    if current_price >= us_high:
+        signal.hit(BUY, 9, _text("F7: Price >= US high -> Buy +9, Sell +7"))
+        signal.hit(SELL, 7)
+    if current_price <= us_low:
+        signal.hit(BUY, 7, _text("F7: Price <= US low -> Buy +7, Sell +9"))
+        signal.hit(SELL, 9)
+
+
+def _regression_channel(highs, lows, closes, n):
+    """
+    Kenh hoi quy cua n nen cuoi (quet ca cua so) - ban khong state cua indicators.RegressionChannel.
+    Returns (slope, intercept, dev_above, dev_below) voi x = 0..n-1.
+    """
+    start = len(closes) - n
+    x = np.arange(n)
+    
+    sum_x = n * (n - 1) // 2
+    sum_x2 = (n - 1) * n * (2 * n - 1) // 6
+    sum_y = _seq_sum(closes[start:])
+    sum_xy = _seq_sum(x * closes[start:])
+    
+    slope = (n * sum_xy - sum_x * sum_y) / (n * sum_x2 - sum_x * sum_x)
+    intercept = (sum_y - slope * sum_x) / n
+    
+    expected = intercept + slope * x
+    max_dev_above = max(0, (highs[start:] - expected).max())
+    max_dev_below = max(0, (expected - lows[start:]).max())
+    return slope, intercept, max_dev_above, max_dev_below
+
+
+# ========== FACTOR 8: Kênh giá 200 nến M30 ==========
+@factor('F8', m30=200)
+def _channel_m30(inputs, signal):
+    current_price = inputs.price
+    slope, intercept, max_dev_above, max_dev_below = inputs.channel('channel200_m30')
+    n = 200
+    
+    x_curr = n - 1
+    mid_curr = intercept + slope * x_curr
+    top_line = mid_curr + max_dev_above
+    bottom_line = mid_curr - max_dev_below
+    tol = 0.001 * mid_curr
+    
+    # Xác định loại kênh
+    if slope > 0.0001:
+        channel_type = "uptrend"
+    elif slope < -0.0001:
+        channel_type = "downtrend"
+    else:
+        channel_type = "sideway"
+    
+    # Chạm biên dưới
+    if current_price <= bottom_line + tol:
+        if channel_type == "uptrend":
+            signal.hit(BUY, 10, _text("F8: Channel uptrend lower -> Buy +10"))
+        else:
+            signal.hit(BUY, 5, _text("F8: Channel %s lower -> Buy +5", channel_type))
+    
+    # Chạm biên trên
+    if current_price >= top_line - tol:
+        if channel_type == "downtrend":
+            signal.hit(SELL, 10, _text("F8: Channel downtrend upper -> Sell +10"))
+        else:
+            signal.hit(SELL, 5, _text("F8: Channel %s upper -> Sell +5", channel_type))
+
+
+def _triangle_points(inputs):
+    """Dinh/day cua 2 nua cua so 100 nen M30: (high1, high2, low1, low2)."""
+    def compute():
+        start = inputs.length('m30') - 100
+        high1, high2 = inputs.high('m30')[start:].reshape(2, 50).max(axis=1)
+        low1, low2 = inputs.low('m30')[start:].reshape(2, 50).min(axis=1)
+        return high1, high2, low1, low2
+    return inputs.derived('m30', 'triangle100', compute)
+
+
+# ========== FACTOR 9: Tam giác giảm (break up) ==========
+@factor('F9', m30=100)
+def _triangle_down(inputs, signal):
+    current_price = inputs.price
+    high1, high2, low1, low2 = _triangle_points(inputs)
+    
+    # Tam giác giảm: cạnh dưới ngang, cạnh trên giảm
+    if abs(low2 - low1) < inputs.profile.triangle_flat and high2 < high1:
+        bottom_line = (low1 + low2) / 2
+        slope_top = (high2 - high1) / 50
+        m30_idx = 99
+        top_line_current = high1 + slope_top * m30_idx
+        tol = inputs.profile.triangle_tol
+        is_first_half = m30_idx < 50
         
-        if abs(current_price - min_close) <= tol:
-            signal.buy_score += 5
-            signal.details.append("F4: Price at M15 100-low -> Buy +5")
-        if abs(current_price - max_close) <= tol:
-            signal.sell_score += 5
-            signal.details.append("F4: Price at M15 100-high -> Sell +5")
-    
-    # ========== FACTOR 5: Cản tĩnh ngang 100 nến H4 ==========
-    if len_h4 >= 100:
-        recent_closes = closes_h4[len_h4 - 100:len_h4]
-        max_close = max(recent_closes)
-        min_close = min(recent_closes)
-        tol = 0.8
+        if abs(current_price - bottom_line) <= tol:
+            if is_first_half:
+                signal.hit(BUY, 4, _text("F9: Triangle down, first half -> Buy +4"))
+            else:
+                signal.hit(BUY, 7, _text("F9: Triangle down, second half -> Buy +7"))
         
-        if abs(current_price - min_close) <= tol:
-            signal.buy_score += 8
-            signal.details.append("F5: Price at H4 100-low -> Buy +8")
-        if abs(current_price - max_close) <= tol:
-            signal.sell_score += 8
-            signal.details.append("F5: Price at H4 100-high -> Sell +8")
-    
-    # ========== FACTOR 6: Cản tĩnh ngang 600 nến H4 ==========
-    if len_h4 >= 600:
-        recent_closes = closes_h4[len_h4 - 600:len_h4]
-        max_close = max(recent_closes)
-        min_close = min(recent_closes)
-        tol = 2.0
+        if abs(current_price - top_line_current) <= tol and is_first_half:
+            signal.hit(SELL, 2, _text("F9: Triangle down, top first half -> Sell +2"))
         
-        if abs(current_price - min_close) <= tol:
-            signal.buy_score += 15
-            signal.details.append("F6: Price at H4 600-low -> Buy +15")
-        if abs(current_price - max_close) <= tol:
-            signal.sell_score += 15
-            signal.details.append("F6: Price at H4 600-high -> Sell +15")
+        # Breakout + retest
+        prev_close = inputs.close('m30')[-2]
+        if prev_close < top_line_current and current_price > top_line_current:
+            if inputs.low('m30')[-1] <= top_line_current + tol:
+                signal.hit(BUY, 9, _text("F9: Triangle breakout + retest -> Buy +9"))
+
+
+# ========== FACTOR 10: Tam giác tăng (break down) ==========
+@factor('F10', m30=100)
+def _triangle_up(inputs, signal):
+    current_price = inputs.price
+    high1, high2, low1, low2 = _triangle_points(inputs)
     
-    # ========== FACTOR 7: Phiên Á, Âu, Mỹ ==========
-    if len_m15 >= 192:
-        bars_per_day = 96
-        prev_day_start = len_m15 - 192
+    # Tam giác tăng: cạnh trên ngang, cạnh dưới tăng
+    if abs(high2 - high1) < inputs.profile.triangle_flat and low2 > low1:
+        top_line = (high1 + high2) / 2
+        slope_bottom = (low2 - low1) / 50
+        m30_idx = 99
+        bottom_line_current = low1 + slope_bottom * m30_idx
+        tol = inputs.profile.triangle_tol
+        is_first_half = m30_idx < 50
         
-        asia_start = prev_day_start
-        asia_end = prev_day_start + 31
-        euro_start = prev_day_start + 32
-        euro_end = prev_day_start + 63
-        us_start = prev_day_start + 64
-        us_end = prev_day_start + 95
+        if abs(current_price - top_line) <= tol:
+            if is_first_half:
+                signal.hit(SELL, 4, _text("F10: Triangle up, first half -> Sell +4"))
+            else:
+                signal.hit(SELL, 7, _text("F10: Triangle up, second half -> Sell +7"))
+        
+        if abs(current_price - bottom_line_current) <= tol and is_first_half:
+            signal.hit(BUY, 2, _text("F10: Triangle up, bottom first half -> Buy +2"))
         
-        asia_high = max(highs_m15[asia_start:asia_end + 1])
-        asia_low = min(lows_m15[asia_start:asia_end + 1])
-        euro_high = max(highs_m15[euro_start:euro_end + 1])
-        euro_low = min(lows_m15[euro_start:euro_end + 1])
-        us_high = max(highs_m15[us_start:us_end + 1])
-        us_low = min(lows_m15[us_start:us_end + 1])
+        # Breakdown + retest
+        prev_close = inputs.close('m30')[-2]
+        if prev_close > bottom_line_current and current_price < bottom_line_current:
+            if inputs.high('m30')[-1] >= bottom_line_current - tol:
+                signal.hit(SELL, 9, _text("F10: Triangle breakdown + retest -> Sell +9"))
+
+
+# ========== FACTOR 11: EMA9 cắt EMA21 (M15) ==========
+@factor('F11', price=False, m15=22)
+def _ema_cross_m15(inputs, signal):
+    EMA9 = inputs.tail('ema9_m15')
+    EMA21 = inputs.tail('ema21_m15')
+    if not np.isnan(EMA9).any() and not np.isnan(EMA21).any():
+        prev_diff = EMA9[-2] - EMA21[-2]
+        curr_diff = EMA9[-1] - EMA21[-1]
         
-        # Asia
-        if current_price >= asia_high:
-            signal.buy_score += 5
-            signal.sell_score += 3
-            signal.details.append("F7: Price >= Asia high -> Buy +5, Sell +3")
-        if current_price <= asia_low:
-            signal.buy_score += 3
-            signal.sell_score += 5
-            signal.details.append("F7: Price <= Asia low -> Buy +3, Sell +5")
+        if prev_diff < 0 and curr_diff > 0:
+            signal.hit(BUY, 7, _text("F11: EMA9 cross up EMA21 (M15) -> Buy +7"))
+        if prev_diff > 0 and curr_diff < 0:
+            signal.hit(SELL, 7, _text("F11: EMA9 cross down EMA21 (M15) -> Sell +7"))
+
+
+# ========== FACTOR 12: EMA21 cắt EMA50 (H4) ==========
+@factor('F12', price=False, h4=51)
+def _ema_cross_h4(inputs, signal):
+    EMA21_H4 = inputs.tail('ema21_h4')
+    EMA50_H4 = inputs.tail('ema50_h4')
+    if not np.isnan(EMA21_H4).any() and not np.isnan(EMA50_H4).any():
+        if EMA21_H4[-2] < EMA50_H4[-2] and EMA21_H4[-1] > EMA50_H4[-1]:
+            signal.hit(BUY, 5, _text("F12: EMA21 cross up EMA50 (H4) -> Buy +5"))
+        if EMA21_H4[-2] > EMA50_H4[-2] and EMA21_H4[-1] < EMA50_H4[-1]:
+            signal.hit(SELL, 5, _text("F12: EMA21 cross down EMA50 (H4) -> Sell +5"))
+
+
+# ========== FACTOR 13: EMA100 H1 (giá > EMA100 trong 3 nến & > 10 điểm) ==========
+@factor('F13', h1=103)
+def _ema100_h1(inputs, signal):
+    EMA100_H1 = inputs.tail('ema100_h1')
+    if not np.isnan(EMA100_H1).any():
+        ema_val = EMA100_H1[-1]
+        diff = abs(inputs.price - ema_val)
         
-        # Europe
-        if current_price >= euro_high:
-            signal.buy_score += 7
-            signal.sell_score += 5
-            signal.details.append("F7: Price >= Euro high -> Buy +7, Sell +5")
-        if current_price <= euro_low:
-            signal.buy_score += 5
-            signal.sell_score += 7
-            signal.details.append("F7: Price <= Euro low -> Buy +5, Sell +7")
+        # Kiểm tra 3 nến liên tục
+        closes_h1 = inputs.close('h1')
+        above_3_candles = bool(np.all(closes_h1[-3:] > EMA100_H1))
+        below_3_candles = bool(np.all(closes_h1[-3:] < EMA100_H1))
         
-        # US
-        if current_price >= us_high:
-            signal.buy_score += 9
-            signal.sell_score += 7
-            signal.details.append("F7: Price >= US high -> Buy +9, Sell +7")
-        if current_price <= us_low:
-            signal.buy_score += 7
-            signal.sell_score += 9
-            signal.details.append("F7: Price <= US low -> Buy +7, Sell +9")
+        gap = inputs.profile.ema100_gap  # XAUUSD: > 10 points = 1.0 USD
+        if above_3_candles and diff >= gap:
+            signal.hit(BUY, 5, _text("F13: Price > EMA100(H1) 3 candles, diff={value:.1f} -> Buy +5"), diff)
+        elif below_3_candles and diff >= gap:
+            signal.hit(SELL, 5, _text("F13: Price < EMA100(H1) 3 candles, diff={value:.1f} -> Sell +5"), diff)
+
+
+# ========== FACTOR 14: SMA25 H4 (khoảng cách) ==========
+@factor('F14', h4=25)
+def _sma25_h4(inputs, signal):
+    sma25 = inputs.sma('h4', 25)
+    diff = inputs.price - sma25
+    gap, strong = inputs.profile.sma25_gap, inputs.profile.sma25_gap_strong  # XAUUSD: 60 / 100 pips
+    
+    if diff < 0:  # Giá dưới SMA25
+        if abs(diff) >= strong:
+            signal.hit(BUY, 10, _text("F14: Price below SMA25(H4) {value:.1f}$ -> Buy +10"), abs(diff))
+        elif abs(diff) >= gap:
+            signal.hit(BUY, 5, _text("F14: Price below SMA25(H4) {value:.1f}$ -> Buy +5"), abs(diff))
+    else:  # Giá trên SMA25
+        if diff >= strong:
+            signal.hit(SELL, 10, _text("F14: Price above SMA25(H4) {value:.1f}$ -> Sell +10"), diff)
+        elif diff >= gap:
+            signal.hit(SELL, 5, _text("F14: Price above SMA25(H4) {value:.1f}$ -> Sell +5"), diff)
+
+
+# ========== FACTOR 15: Manual Bias ==========
+@factor('F15', price=False)
+def _manual_bias(inputs, signal):
+    if MANUAL_BIAS > 0:
+        signal.hit(BUY, min(MANUAL_BIAS, 10), _text("F15: Manual bias -> Buy +{points:g}"))
+    elif MANUAL_BIAS < 0:
+        signal.hit(SELL, min(abs(MANUAL_BIAS), 10), _text("F15: Manual bias -> Sell +{points:g}"))
+
+
+def evaluate_signals(symbol, rates_m15, rates_h4, rates_h1, rates_m30, verbose=True, state=None,
+                     engine=None, price=None, profile=None):
+    """
+    Evaluate trading signals based on the provided historical rates.
+    Returns a Signal object with buy_score and sell_score.
+    
+    rates_* co the la structured array cua MT5 (doc truc tiep cac cot
+    close/high/low, khong copy) hoac list dict/tuple.
+    state: IndicatorState (tuy chon) - EMA/RSI chi cap nhat cac nen moi dong
+    thay vi tinh lai ca cua so.
+    engine: FactorEngine (tuy chon) - chon factor va bo qua factor co dau vao
+    khong doi tu lan truoc; mac dinh chay tat ca factor (tru DISABLED_FACTORS).
+    price: gia hien tai thay cho close nen M15 cuoi - cham diem giua nen (nen dang chay):
+    rates_* van chi gom nen da dong, indicator giu nguyen, chi factor dung gia chay lai.
+    profile: profiles.SymbolProfile cua symbol, mac dinh XAUUSD.
+    """
+    signal = Signal()
+    
+    if len(rates_m15) == 0:
+        return signal
+    
+    # State phai thay moi nen dong, ke ca khi factor dung no khong chay
+    if state is not None:
+        state.update(rates_m15, rates_h4, rates_h1, rates_m30)
+    
+    engine = engine or FactorEngine()
+    inputs = FactorInputs({'m15': rates_m15, 'h4': rates_h4, 'h1': rates_h1, 'm30': rates_m30}, state,
+                          engine.timeframes, price, profile)
+    engine.run(inputs, signal)
+    
+    # In chi tiết nếu có điểm
+    if verbose and signal.details:
+        log("  [Score details]:")
+        for detail in signal.details:
+            log(f"    - {detail}")
+    
+    return signal
+
+
+class BatchSignals:
+    """
+    Ket qua evaluate_signals_batch - moi phan tu ung voi 1 lan main.py cham diem
+    (luc xuat hien nen H1 moi).
+    
+    time: thoi gian mo cua nen H1 moi
+    buy_score / sell_score: diem cua nen do (giong Signal cua evaluate_signals)
+    factor_buy / factor_sell: {'F1'..'F15': mang diem cua tung factor}
+    """
+    def __init__(self, time, factor_buy, factor_sell):
+        self.time = time
+        self.factor_buy = factor_buy
+        self.factor_sell = factor_sell
+        self.buy_score = sum(factor_buy.values())
+        self.sell_score = sum(factor_sell.values())
+    
+    def __len__(self):
+        return len(self.time)
+    
+    def weighted(self, weights):
+        """BatchSignals moi voi diem tung factor nhan he so weights {'F8': 0, 'F2': 1.5, ...}."""
+        factor_buy = {name: pts * weights.get(name, 1) for name, pts in self.factor_buy.items()}
+        factor_sell = {name: pts * weights.get(name, 1) for name, pts in self.factor_sell.items()}
+        return BatchSignals(self.time, factor_buy, factor_sell)
+
+
+def _closed_counts(times, eval_times):
+    """
+    So nen da dong cua 1 khung tai moi thoi diem cham diem:
+    bo nen dang chay (nen cuoi co time <= T), giong copy_rates_from_pos(..., 1, n).
+    """
+    return np.searchsorted(times, eval_times, side='right') - 1
+
+
+def _rows(values, ends, width):
+    """Ma tran (so lan cham, width): moi hang la values[end - width:end]."""
+    return sliding_window_view(values, width)[ends - width]
+
+
+def _rsi_values(avg_gain, avg_loss):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rsi = 100 - 100 / (1 + avg_gain / avg_loss)
+    return np.where(avg_loss == 0, 100.0, np.where(avg_gain == 0, 0.0, rsi))
+
+
+def _stream_tail(indicator, closes, ends, width, keep):
+    """
+    Gia tri indicator streaming (IndicatorState) cua `keep` nen cuoi moi hang:
+    seed 1 lan tu dau cua so dau tien roi cap nhat lien tuc.
+    """
+    first = ends[0] - width
+    values = np.array([indicator.update(price) for price in closes[first:ends[-1]].tolist()], dtype=float)
+    return _rows(values, ends - first, keep)
+
+
+def _batch_ema_tail(closes, ends, width, period, keep, incremental):
+    """EMA cua `keep` nen cuoi moi hang, seed tu nen dau cua so (giong calculate_ema_array)."""
+    if incremental:
+        return _stream_tail(EMA(period), closes, ends, width, keep)
+    
+    alpha = 2 / (period + 1)
+    starts = ends - width
+    out = np.full((len(ends), keep), np.nan)
+    ema = closes[starts]
+    for j in range(width):
+        if j > 0:
+            ema = ema + alpha * (closes[starts + j] - ema)
+        if j >= width - keep:
+            out[:, j - (width - keep)] = ema
+    return out
+
+
+def _batch_rsi_tail(closes, ends, width, period, keep, incremental):
+    """RSI cua `keep` nen cuoi moi hang, seed tu dau cua so (giong calculate_rsi_array)."""
+    if incremental:
+        return _stream_tail(RSI(period), closes, ends, width, keep)
+    
+    out = np.full((len(ends), keep), np.nan)
+    if width < period + 1:
+        return out
+    
+    starts = ends - width
+    gain_sum = np.zeros(len(ends))
+    loss_sum = np.zeros(len(ends))
+    prev = closes[starts]
+    for j in range(1, width):
+        cur = closes[starts + j]
+        diff = cur - prev
+        prev = cur
+        if j <= period:
+            gain_sum = gain_sum + np.where(diff >= 0, diff, 0.0)
+            loss_sum = loss_sum + np.where(diff < 0, -diff, 0.0)
+            if j < period:
+                continue
+            avg_gain = gain_sum / period
+            avg_loss = loss_sum / period
+        else:
+            avg_gain = (avg_gain * (period - 1) + np.where(diff > 0, diff, 0.0)) / period
+            avg_loss = (avg_loss * (period - 1) + np.where(diff < 0, -diff, 0.0)) / period
+        if j >= width - keep:
+            out[:, j - (width - keep)] = _rsi_values(avg_gain, avg_loss)
+    return out
+
+
+def _batch_fib(closes, ends, price, min_tol, up_points, down_points):
+    """
+    Diem Fib (buy, sell) cho tung hang - ban vector hoa cua _fib_hits/_score_fib.
+    up_points/down_points = (buy_points, sell_points) theo xu huong.
+    """
+    window = _rows(closes, ends - 1, 99)
+    idx_high = window.argmax(axis=1)
+    idx_low = window.argmin(axis=1)
+    window_high = np.take_along_axis(window, idx_high[:, None], axis=1)[:, 0]
+    window_low = np.take_along_axis(window, idx_low[:, None], axis=1)[:, 0]
+    range_val = np.abs(window_high - window_low)
+    
+    uptrend = (range_val > 0) & (idx_high > idx_low)
+    downtrend = (range_val > 0) & (idx_low > idx_high)
+    fib_tol = np.maximum(min_tol, 0.02 * range_val)[:, None]
+    
+    near_up = window_high[:, None] - _FIB_NEAR_RATIOS * range_val[:, None]
+    near_up[:, 2] = window_low
+    near_down = window_low[:, None] + _FIB_NEAR_RATIOS * range_val[:, None]
+    near_down[:, 2] = window_high
+    near = np.abs(price[:, None] - np.where(uptrend[:, None], near_up, near_down)) <= fib_tol
+    n_shallow = near[:, :3].sum(axis=1)
+    n_deep = near[:, 3:].sum(axis=1)
+    
+    ext_up = (price[:, None] >= window_low[:, None] + _FIB_EXT_UP_RATIOS * range_val[:, None] - fib_tol).sum(axis=1)
+    ext_down = (price[:, None] <= window_low[:, None] - _FIB_EXT_DOWN_RATIOS * range_val[:, None] + fib_tol).sum(axis=1)
+    
+    scores = []
+    for side in range(2):
+        up = up_points[side]
+        down = down_points[side]
+        scores.append(np.where(uptrend, up[0] * n_shallow + up[1] * n_deep + up[2] * ext_up, 0)
+                      + np.where(downtrend, down[0] * n_shallow + down[1] * n_deep + down[2] * ext_down, 0))
+    return scores[0], scores[1]
+
+
+def _batch_double_extreme(rsi, lows):
+    """Ban vector hoa cua _rsi_double_extreme cho ma tran RSI (so hang, 7)."""
+    mid = rsi[:, 1:-1]
+    if lows:
+        mask = (mid < rsi[:, :-2]) & (mid < rsi[:, 2:])
+    else:
+        mask = (mid > rsi[:, :-2]) & (mid > rsi[:, 2:])
+    count = np.cumsum(mask, axis=1)
+    first = np.where(mask & (count == 1), mid, 0.0).sum(axis=1)
+    second = np.where(mask & (count == 2), mid, 0.0).sum(axis=1)
+    found = count[:, -1] >= 2
+    return found & ((second < first) if lows else (second > first))
+
+
+# Factor co ban vector hoa trong evaluate_signals_batch
+_BATCH_FACTORS = {f"F{k}" for k in range(1, 16)}
+
+
+def evaluate_signals_batch(rates_m15, rates_h4, rates_h1, rates_m30, bars=None, incremental=True, profile=None):
+    """
+    Cham diem toan bo lich su trong 1 lan thay vi goi evaluate_signals tung nen.
+    
+    rates_*: structured array day du (co cot time) cua tung khung, cung 1 symbol.
+    Moi nen H1 (tu khi du `bars` nen dong cho moi khung) la 1 lan cham diem,
+    voi dung cac cua so ma main.py lay bang copy_rates_from_pos(..., 1, n).
+    incremental: giong main.INCREMENTAL_INDICATORS (EMA/RSI streaming tu lan
+    cham dau tien) - False de khop evaluate_signals khong co state.
+    Factor trong DISABLED_FACTORS = 0 diem. Factor dang ky them bang @factor
+    (chua co ban vector hoa) duoc cham tung lan tren cua so, EMA/RSI tinh theo cua so.
+    profile: giong evaluate_signals(profile=...).
+    Returns BatchSignals.
+    """
+    profile = profile or DEFAULT_PROFILE
+    bars = dict(LIVE_BARS if bars is None else bars)
+    w15, w4, w1, w30 = bars['m15'], bars['h4'], bars['h1'], bars['m30']
+    
+    closes_m15 = rates_m15['close']
+    highs_m15 = rates_m15['high']
+    lows_m15 = rates_m15['low']
+    closes_h4 = rates_h4['close']
+    closes_h1 = rates_h1['close']
+    closes_m30 = rates_m30['close']
+    highs_m30 = rates_m30['high']
+    lows_m30 = rates_m30['low']
+    
+    # Moi nen H1 moi = 1 lan cham diem; chi giu cac lan du cua so cho ca 4 khung
+    eval_times = rates_h1['time']
+    n15 = _closed_counts(rates_m15['time'], eval_times)
+    n4 = _closed_counts(rates_h4['time'], eval_times)
+    n1 = _closed_counts(eval_times, eval_times)
+    n30 = _closed_counts(rates_m30['time'], eval_times)
+    valid = (n15 >= w15) & (n4 >= w4) & (n1 >= w1) & (n30 >= w30)
+    eval_times = eval_times[valid]
+    n15, n4, n1, n30 = n15[valid], n4[valid], n1[valid], n30[valid]
+    
+    count = len(eval_times)
+    factor_buy = {name: np.zeros(count, dtype=np.int64) for name in FACTORS}
+    factor_sell = {name: np.zeros(count, dtype=np.int64) for name in FACTORS}
+    if count == 0:
+        return BatchSignals(eval_times, factor_buy, factor_sell)
+    
+    on = enabled_factors()
+    price = closes_m15[n15 - 1]
+    
+    # ========== FACTOR 1: Fibonacci M15 ==========
+    if 'F1' in on and w15 >= 100:
+        factor_buy['F1'], factor_sell['F1'] = _batch_fib(
+            closes_m15, n15, price, profile.fib_tol_m15, ((2, 2, 4), (2, 3, 5)), ((2, 3, 5), (2, 2, 4)))
+    
+    # ========== FACTOR 2: Fibonacci H4 ==========
+    if 'F2' in on and w4 >= 100:
+        factor_buy['F2'], factor_sell['F2'] = _batch_fib(
+            closes_h4, n4, price, profile.fib_tol_h4, ((5, 7, 9), (7, 9, 15)), ((7, 9, 15), (5, 7, 9)))
+    
+    # ========== FACTOR 3: RSI(14) M15 ==========
+    if 'F3' in on and w15 >= 15:
+        rsi = _batch_rsi_tail(closes_m15, n15, w15, 14, 7, incremental)
+        oversold = rsi[:, -1] < 30
+        overbought = rsi[:, -1] > 70
+        factor_buy['F3'] = np.where(oversold, 5 + 7 * _batch_double_extreme(rsi, lows=True)
+                                    + 10 * ((rsi[:, -1] < 20) & (rsi[:, -2] < 20)), 0)
+        factor_sell['F3'] = np.where(overbought, 3 + 5 * _batch_double_extreme(rsi, lows=False)
+                                     + 10 * ((rsi[:, -1] > 80) & (rsi[:, -2] > 80)), 0)
+    
+    # ========== FACTOR 4, 5, 6: Cản tĩnh ngang ==========
+    for name, closes, ends, width, min_bars, tol, points in (
+            ('F4', closes_m15, n15, 100, w15, profile.level_tol_m15, 5),
+            ('F5', closes_h4, n4, 100, w4, profile.level_tol_h4, 8),
+            ('F6', closes_h4, n4, 600, w4, profile.level_tol_h4_600, 15)):
+        if name in on and min_bars >= width:
+            recent_closes = _rows(closes, ends, width)
+            factor_buy[name] = points * (np.abs(price - recent_closes.min(axis=1)) <= tol)
+            factor_sell[name] = points * (np.abs(price - recent_closes.max(axis=1)) <= tol)
+    
+    # ========== FACTOR 7: Phiên Á, Âu, Mỹ ==========
+    if 'F7' in on and w15 >= 192:
+        # (offset dau phien tinh tu nen dau ngay hom truoc, diem khi pha dinh, diem khi pha day)
+        for offset, high_points, low_points in ((0, (5, 3), (3, 5)), (32, (7, 5), (5, 7)), (64, (9, 7), (7, 9))):
+            start = n15 - 192 + offset
+            session_high = _rows(highs_m15, start + 32, 32).max(axis=1)
+            session_low = _rows(lows_m15, start + 32, 32).min(axis=1)
+            above = price >= session_high
+            below = price <= session_low
+            factor_buy['F7'] += high_points[0] * above + low_points[0] * below
+            factor_sell['F7'] += high_points[1] * above + low_points[1] * below
     
     # ========== FACTOR 8: Kênh giá 200 nến M30 ==========
-    if len_m30 >= 200:
-        start = len_m30 - 200
-        end = len_m30 - 1
-        n = end - start + 1
+    if 'F8' in on and w30 >= 200:
+        n = 200
+        x = np.arange(n)
+        y = _rows(closes_m30, n30, n)
         
-        sum_x = sum(range(n))
-        sum_y = sum(closes_m30[start:end + 1])
-        sum_xy = sum(x * closes_m30[start + x] for x in range(n))
-        sum_x2 = sum(x * x for x in range(n))
+        sum_x = n * (n - 1) // 2
+        sum_x2 = (n - 1) * n * (2 * n - 1) // 6
+        sum_y = np.cumsum(y, axis=1)[:, -1]
+        sum_xy = np.cumsum(x * y, axis=1)[:, -1]
         
         slope = (n * sum_xy - sum_x * sum_y) / (n * sum_x2 - sum_x * sum_x)
         intercept = (sum_y - slope * sum_x) / n
         
-        max_dev_above = 0
-        max_dev_below = 0
-        for j in range(start, end + 1):
-            x = j - start
-            expected = intercept + slope * x
-            dev_above = highs_m30[j] - expected
-            dev_below = expected - lows_m30[j]
-            if dev_above > max_dev_above:
-                max_dev_above = dev_above
-            if dev_below > max_dev_below:
-                max_dev_below = dev_below
+        expected = intercept[:, None] + slope[:, None] * x
+        max_dev_above = np.maximum(0, (_rows(highs_m30, n30, n) - expected).max(axis=1))
+        max_dev_below = np.maximum(0, (expected - _rows(lows_m30, n30, n)).max(axis=1))
         
-        x_curr = end - start
-        mid_curr = intercept + slope * x_curr
-        top_line = mid_curr + max_dev_above
-        bottom_line = mid_curr - max_dev_below
+        mid_curr = intercept + slope * (n - 1)
         tol = 0.001 * mid_curr
+        uptrend = slope > 0.0001
+        downtrend = slope < -0.0001
         
-        # Xác định loại kênh
-        if slope > 0.0001:
-            channel_type = "uptrend"
-        elif slope < -0.0001:
-            channel_type = "downtrend"
-        else:
-            channel_type = "sideway"
-        
-        # Chạm biên dưới
-        if current_price <= bottom_line + tol:
-            if channel_type == "uptrend":
-                signal.buy_score += 10
-                signal.details.append("F8: Channel uptrend lower -> Buy +10")
-            else:
-                signal.buy_score += 5
-                signal.details.append(f"F8: Channel {channel_type} lower -> Buy +5")
-        
-        # Chạm biên trên
-        if current_price >= top_line - tol:
-            if channel_type == "downtrend":
-                signal.sell_score += 10
-                signal.details.append("F8: Channel downtrend upper -> Sell +10")
-            else:
-                signal.sell_score += 5
-                signal.details.append(f"F8: Channel {channel_type} upper -> Sell +5")
-    
-    # ========== FACTOR 9: Tam giác giảm (break up) ==========
-    if len_m30 >= 100:
-        start = len_m30 - 100
-        mid = start + 49
-        end = len_m30 - 1
-        
-        high1 = max(highs_m30[start:mid + 1])
-        high2 = max(highs_m30[mid + 1:end + 1])
-        low1 = min(lows_m30[start:mid + 1])
-        low2 = min(lows_m30[mid + 1:end + 1])
+        factor_buy['F8'] = np.where(price <= mid_curr - max_dev_below + tol, np.where(uptrend, 10, 5), 0)
+        factor_sell['F8'] = np.where(price >= mid_curr + max_dev_above - tol, np.where(downtrend, 10, 5), 0)
+    
+    # ========== FACTOR 9, 10: Tam giác ==========
+    if ('F9' in on or 'F10' in on) and w30 >= 100:
+        high1 = _rows(highs_m30, n30 - 50, 50).max(axis=1)
+        high2 = _rows(highs_m30, n30, 50).max(axis=1)
+        low1 = _rows(lows_m30, n30 - 50, 50).min(axis=1)
+        low2 = _rows(lows_m30, n30, 50).min(axis=1)
+        prev_close = closes_m30[n30 - 2]
+        m30_idx = 99
+        is_first_half = m30_idx < 50
+        tol = profile.triangle_tol
         
-        # Tam giác giảm: cạnh dưới ngang, cạnh trên giảm
-        if abs(low2 - low1) < 1 and high2 < high1:
+        # F9: Tam giác giảm: cạnh dưới ngang, cạnh trên giảm
+        if 'F9' in on:
+            triangle = (np.abs(low2 - low1) < profile.triangle_flat) & (high2 < high1)
             bottom_line = (low1 + low2) / 2
-            slope_top = (high2 - high1) / 50
-            top_line_current = high1 + slope_top * (end - start)
-            tol = 0.5
-            
-            m30_idx = end - start
-            is_first_half = m30_idx < 50
-            
-            if abs(current_price - bottom_line) <= tol:
-                if is_first_half:
-                    signal.buy_score += 4
-                    signal.details.append("F9: Triangle down, first half -> Buy +4")
-                else:
-                    signal.buy_score += 7
-                    signal.details.append("F9: Triangle down, second half -> Buy +7")
-            
-            if abs(current_price - top_line_current) <= tol and is_first_half:
-                signal.sell_score += 2
-                signal.details.append("F9: Triangle down, top first half -> Sell +2")
-            
-            # Breakout + retest
-            if len_m30 >= 2:
-                prev_close = closes_m30[-2]
-                if prev_close < top_line_current and current_price > top_line_current:
-                    if lows_m30[-1] <= top_line_current + tol:
-                        signal.buy_score += 9
-                        signal.details.append("F9: Triangle breakout + retest -> Buy +9")
-    
-    # ========== FACTOR 10: Tam giác tăng (break down) ==========
-    if len_m30 >= 100:
-        start = len_m30 - 100
-        mid = start + 49
-        end = len_m30 - 1
-        
-        high1 = max(highs_m30[start:mid + 1])
-        high2 = max(highs_m30[mid + 1:end + 1])
-        low1 = min(lows_m30[start:mid + 1])
-        low2 = min(lows_m30[mid + 1:end + 1])
+            top_line_current = high1 + (high2 - high1) / 50 * m30_idx
+            at_bottom = triangle & (np.abs(price - bottom_line) <= tol)
+            breakout = (triangle & (prev_close < top_line_current) & (price > top_line_current)
+                        & (lows_m30[n30 - 1] <= top_line_current + tol))
+            factor_buy['F9'] = (4 if is_first_half else 7) * at_bottom + 9 * breakout
+            if is_first_half:
+                factor_sell['F9'] = 2 * (triangle & (np.abs(price - top_line_current) <= tol))
         
-        # Tam giác tăng: cạnh trên ngang, cạnh dưới tăng
-        if abs(high2 - high1) < 1 and low2 > low1:
+        # F10: Tam giác tăng: cạnh trên ngang, cạnh dưới tăng
+        if 'F10' in on:
+            triangle = (np.abs(high2 - high1) < profile.triangle_flat) & (low2 > low1)
             top_line = (high1 + high2) / 2
-            slope_bottom = (low2 - low1) / 50
-            bottom_line_current = low1 + slope_bottom * (end - start)
-            tol = 0.5
-            
-            m30_idx = end - start
-            is_first_half = m30_idx < 50
-            
-            if abs(current_price - top_line) <= tol:
-                if is_first_half:
-                    signal.sell_score += 4
-                    signal.details.append("F10: Triangle up, first half -> Sell +4")
-                else:
-                    signal.sell_score += 7
-                    signal.details.append("F10: Triangle up, second half -> Sell +7")
-            
-            if abs(current_price - bottom_line_current) <= tol and is_first_half:
-                signal.buy_score += 2
-                signal.details.append("F10: Triangle up, bottom first half -> Buy +2")
-            
-            # Breakdown + retest
-            if len_m30 >= 2:
-                prev_close = closes_m30[-2]
-                if prev_close > bottom_line_current and current_price < bottom_line_current:
-                    if highs_m30[-1] >= bottom_line_current - tol:
-                        signal.sell_score += 9
-                        signal.details.append("F10: Triangle breakdown + retest -> Sell +9")
+            bottom_line_current = low1 + (low2 - low1) / 50 * m30_idx
+            at_top = triangle & (np.abs(price - top_line) <= tol)
+            breakdown = (triangle & (prev_close > bottom_line_current) & (price < bottom_line_current)
+                         & (highs_m30[n30 - 1] >= bottom_line_current - tol))
+            factor_sell['F10'] = (4 if is_first_half else 7) * at_top + 9 * breakdown
+            if is_first_half:
+                factor_buy['F10'] = 2 * (triangle & (np.abs(price - bottom_line_current) <= tol))
     
     # ========== FACTOR 11: EMA9 cắt EMA21 (M15) ==========
-    if len_m15 >= 22 and i >= 1:
-        if EMA9[i-1] is not None and EMA21[i-1] is not None and EMA9[i] is not None and EMA21[i] is not None:
-            prev_diff = EMA9[i - 1] - EMA21[i - 1]
-            curr_diff = EMA9[i] - EMA21[i]
-            
-            if prev_diff < 0 and curr_diff > 0:
-                signal.buy_score += 7
-                signal.details.append("F11: EMA9 cross up EMA21 (M15) -> Buy +7")
-            if prev_diff > 0 and curr_diff < 0:
-                signal.sell_score += 7
-                signal.details.append("F11: EMA9 cross down EMA21 (M15) -> Sell +7")
+    if 'F11' in on and w15 >= 22:
+        ema9 = _batch_ema_tail(closes_m15, n15, w15, 9, 2, incremental)
+        ema21 = _batch_ema_tail(closes_m15, n15, w15, 21, 2, incremental)
+        prev_diff = ema9[:, 0] - ema21[:, 0]
+        curr_diff = ema9[:, 1] - ema21[:, 1]
+        factor_buy['F11'] = 7 * ((prev_diff < 0) & (curr_diff > 0))
+        factor_sell['F11'] = 7 * ((prev_diff > 0) & (curr_diff < 0))
     
     # ========== FACTOR 12: EMA21 cắt EMA50 (H4) ==========
-    if len_h4 >= 51:
-        h4_idx = len_h4 - 1
-        if h4_idx >= 1 and EMA21_H4[h4_idx-1] is not None and EMA50_H4[h4_idx-1] is not None:
-            if EMA21_H4[h4_idx - 1] < EMA50_H4[h4_idx - 1] and EMA21_H4[h4_idx] > EMA50_H4[h4_idx]:
-                signal.buy_score += 5
-                signal.details.append("F12: EMA21 cross up EMA50 (H4) -> Buy +5")
-            if EMA21_H4[h4_idx - 1] > EMA50_H4[h4_idx - 1] and EMA21_H4[h4_idx] < EMA50_H4[h4_idx]:
-                signal.sell_score += 5
-                signal.details.append("F12: EMA21 cross down EMA50 (H4) -> Sell +5")
-    
-    # ========== FACTOR 13: EMA100 H1 (giá > EMA100 trong 3 nến & > 10 điểm) ==========
-    if len_h1 >= 103:
-        h1_idx = len_h1 - 1
-        if EMA100_H1[h1_idx] is not None and EMA100_H1[h1_idx-1] is not None and EMA100_H1[h1_idx-2] is not None:
-            ema_val = EMA100_H1[h1_idx]
-            diff = abs(current_price - ema_val)
-            
-            # Kiểm tra 3 nến liên tục
-            above_3_candles = (closes_h1[-1] > EMA100_H1[-1] and 
-                              closes_h1[-2] > EMA100_H1[-2] and 
-                              closes_h1[-3] > EMA100_H1[-3])
-            below_3_candles = (closes_h1[-1] < EMA100_H1[-1] and 
-                              closes_h1[-2] < EMA100_H1[-2] and 
-                              closes_h1[-3] < EMA100_H1[-3])
-            
-            if above_3_candles and diff >= 1.0:  # > 10 points = 1.0 USD
-                signal.buy_score += 5
-                signal.details.append(f"F13: Price > EMA100(H1) 3 candles, diff={diff:.1f} -> Buy +5")
-            elif below_3_candles and diff >= 1.0:
-                signal.sell_score += 5
-                signal.details.append(f"F13: Price < EMA100(H1) 3 candles, diff={diff:.1f} -> Sell +5")
-    
-    # ========== FACTOR 14: SMA25 H4 (khoảng cách) ==========
-    if len_h4 >= 25:
-        sma25 = calculate_sma(closes_h4, 25)
-        if sma25 is not None:
-            diff = current_price - sma25
-            
-            if diff < 0:  # Giá dưới SMA25
-                if abs(diff) >= 10:  # >= 100 pips = 10 USD
-                    signal.buy_score += 10
-                    signal.details.append(f"F14: Price below SMA25(H4) {abs(diff):.1f}$ -> Buy +10")
-                elif abs(diff) >= 6:  # >= 60 pips
-                    signal.buy_score += 5
-                    signal.details.append(f"F14: Price below SMA25(H4) {abs(diff):.1f}$ -> Buy +5")
-            else:  # Giá trên SMA25
-                if diff >= 10:
-                    signal.sell_score += 10
-                    signal.details.append(f"F14: Price above SMA25(H4) {diff:.1f}$ -> Sell +10")
-                elif diff >= 6:
-                    signal.sell_score += 5
-                    signal.details.append(f"F14: Price above SMA25(H4) {diff:.1f}$ -> Sell +5")
+    if 'F12' in on and w4 >= 51:
+        ema21 = _batch_ema_tail(closes_h4, n4, w4, 21, 2, incremental)
+        ema50 = _batch_ema_tail(closes_h4, n4, w4, 50, 2, incremental)
+        factor_buy['F12'] = 5 * ((ema21[:, 0] < ema50[:, 0]) & (ema21[:, 1] > ema50[:, 1]))
+        factor_sell['F12'] = 5 * ((ema21[:, 0] > ema50[:, 0]) & (ema21[:, 1] < ema50[:, 1]))
+    
+    # ========== FACTOR 13: EMA100 H1 ==========
+    if 'F13' in on and w1 >= 103:
+        ema100 = _batch_ema_tail(closes_h1, n1, w1, 100, 3, incremental)
+        last3 = _rows(closes_h1, n1, 3)
+        far = np.abs(price - ema100[:, -1]) >= profile.ema100_gap
+        above = np.all(last3 > ema100, axis=1) & far
+        factor_buy['F13'] = 5 * above
+        factor_sell['F13'] = 5 * (~above & np.all(last3 < ema100, axis=1) & far)
+    
+    # ========== FACTOR 14: SMA25 H4 ==========
+    if 'F14' in on and w4 >= 25:
+        sma25 = np.cumsum(_rows(closes_h4, n4, 25), axis=1)[:, -1] / 25
+        diff = price - sma25
+        below = diff < 0
+        gap, strong = profile.sma25_gap, profile.sma25_gap_strong
+        factor_buy['F14'] = np.where(below, np.where(-diff >= strong, 10, np.where(-diff >= gap, 5, 0)), 0)
+        factor_sell['F14'] = np.where(below, 0, np.where(diff >= strong, 10, np.where(diff >= gap, 5, 0)))
     
     # ========== FACTOR 15: Manual Bias ==========
-    if MANUAL_BIAS > 0:
-        signal.buy_score += min(MANUAL_BIAS, 10)
-        signal.details.append(f"F15: Manual bias -> Buy +{min(MANUAL_BIAS, 10)}")
-    elif MANUAL_BIAS < 0:
-        signal.sell_score += min(abs(MANUAL_BIAS), 10)
-        signal.details.append(f"F15: Manual bias -> Sell +{min(abs(MANUAL_BIAS), 10)}")
+    if 'F15' in on:
+        if MANUAL_BIAS > 0:
+            factor_buy['F15'] += min(MANUAL_BIAS, 10)
+        elif MANUAL_BIAS < 0:
+            factor_sell['F15'] += min(abs(MANUAL_BIAS), 10)
     
-    # In chi tiết nếu có điểm
-    if verbose and signal.details:
-        log("  [Score details]:")
-        for detail in signal.details:
-            log(f"    - {detail}")
+    # ========== Factor dang ky them: cham tung lan tren cua so ==========
+    extra = [FACTORS[name] for name in on if name not in _BATCH_FACTORS]
+    for i in range(count if extra else 0):
+        inputs = FactorInputs({
+            'm15': rates_m15[n15[i] - w15:n15[i]],
+            'h4': rates_h4[n4[i] - w4:n4[i]],
+            'h1': rates_h1[n1[i] - w1:n1[i]],
+            'm30': rates_m30[n30[i] - w30:n30[i]],
+        }, profile=profile)
+        for entry in extra:
+            result = entry.run(inputs)
+            factor_buy[entry.name][i] = result.buy_score
+            factor_sell[entry.name][i] = result.sell_score
     
-    return signal
+    return BatchSignals(eval_times, factor_buy, factor_sell)
 
 
 def calculate_rsi_array(prices, period=14):
@@ -15,6 +15,7 @@ CHAT_IDS = [
 # Buffer để gom nhiều log lại gửi 1 lần (tránh spam Telegram)
 _log_buffer = []
 _buffer_lock = threading.Lock()
+_flush_event = threading.Event()  # Bao thread gui ngay, khong doi BUFFER_DELAY
 _last_send_time = 0
 BUFFER_DELAY = 3  # Gom log trong 3 giây rồi gửi 1 lần
 
@@ -95,12 +96,13 @@ def _flush_buffer():
 
 
 def _buffer_sender():
-    """Thread gửi buffer định kỳ."""
+    """Thread gửi buffer định kỳ (hoặc ngay khi có flush_logs)."""
     global _last_send_time
     while True:
-        time.sleep(1)
+        urgent = _flush_event.wait(1)
+        _flush_event.clear()
         with _buffer_lock:
-            if _log_buffer and (time.time() - _last_send_time) >= BUFFER_DELAY:
+            if _log_buffer and (urgent or (time.time() - _last_send_time) >= BUFFER_DELAY):
                 pass  # Will flush below
             else:
                 continue
@@ -130,12 +132,15 @@ def log(*args, flush_now=False, **kwargs):
     
     # Nếu cần gửi ngay (ví dụ: khi có lệnh trade)
     if flush_now:
-        _flush_buffer()
+        flush_logs()
 
 
 def flush_logs():
-    """Gửi ngay tất cả log đang đợi trong buffer."""
-    _flush_buffer()
+    """
+    Gửi ngay tất cả log đang đợi trong buffer.
+    Không block: thread gửi lo phần HTTP, Telegram chậm không làm chậm vòng lặp.
+    """
+    _flush_event.set()
 
 
 def format_trade_message(action, cluster_info, orders_info):
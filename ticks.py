@@ -0,0 +1,146 @@
+"""
+Ticks - lay tick lien tuc tu MT5 vao ring buffer co dinh (bid/ask/time_msc)
+
+Logic:
+- TickBuffer: mang cap phat 1 lan, ghi vong tron -> bo nho khong doi du bot chay bao lau
+- Moi tick ghi 2 lan (o i va i + capacity) nen N tick gan nhat (N <= capacity)
+  luon nam lien tiep -> doc = view numpy, khong copy
+- 1 writer (TickFeed), nhieu reader khong khoa: writer ghi du lieu truoc roi moi
+  tang `count`, reader chi doc cac tick < count
+- TickFeed: copy_ticks_from tu tick cuoi da nhan (chi lay tick moi), chay trong thread rieng
+"""
+
+import time
+import threading
+
+import numpy as np
+from mt5_gate import mt5
+
+from telegram_bot import log
+
+
+TICK_DTYPE = np.dtype([('time_msc', '<i8'), ('bid', '<f8'), ('ask', '<f8')])
+
+
+class TickBuffer:
+    """
+    Ring buffer tick (TICK_DTYPE) cho 1 writer va nhieu reader.
+
+    count: tong so tick da ghi tu luc tao (tang dan, dung lam "con tro" cua reader).
+    View tra ve hop le cho toi khi co them `capacity` tick moi (sau do bi ghi de).
+    """
+    def __init__(self, capacity=100000):
+        self.capacity = capacity
+        self._data = np.zeros(2 * capacity, dtype=TICK_DTYPE)
+        self.count = 0
+
+    def append(self, ticks):
+        """Ghi them tick (structured array co time_msc/bid/ask, vd. tu copy_ticks_from)."""
+        ticks = ticks[-self.capacity:]
+        if len(ticks) == 0:
+            return
+        slots = (self.count + np.arange(len(ticks))) % self.capacity
+        for name in TICK_DTYPE.names:
+            self._data[name][slots] = ticks[name]
+            self._data[name][slots + self.capacity] = ticks[name]
+        self.count += len(ticks)  # Cong bo sau khi da ghi xong du lieu
+
+    def _window(self, count, n):
+        end = count % self.capacity + self.capacity
+        return self._data[end - n:end]
+
+    def latest(self, n=None):
+        """n tick gan nhat (mac dinh: tat ca tick con trong buffer) - view, khong copy."""
+        count = self.count
+        available = min(count, self.capacity)
+        n = available if n is None else min(n, available)
+        return self._window(count, n)
+
+    def since(self, cursor):
+        """
+        Cac tick moi tu con tro `cursor` (= count o lan doc truoc).
+        Returns (view tick moi, con tro moi, so tick bi mat do reader cham hon writer).
+        """
+        count = self.count
+        new = count - cursor
+        lost = max(0, new - self.capacity)
+        return self._window(count, new - lost), count, lost
+
+    def last(self):
+        """Tick cuoi cung (record) hoac None neu chua co tick."""
+        if self.count == 0:
+            return None
+        return self._window(self.count, 1)[0]
+
+
+class TickFeed:
+    """
+    Lay tick moi cua `symbol` tu MT5 vao `buffer`.
+
+    poll(): 1 lan lay (goi tu vong lap chinh); start(): thread rieng poll moi `interval` giay.
+    """
+    def __init__(self, symbol, buffer=None, interval=0.1, batch=10000):
+        self.symbol = symbol
+        self.buffer = buffer if buffer is not None else TickBuffer()
+        self.interval = interval
+        self.batch = batch
+        self._last_msc = None  # time_msc cua tick cuoi da nhan
+        self._seen_at_last = 0  # so tick da nhan co cung time_msc do
+        self.last_seen = None  # (time_msc tick cuoi, gio may luc nhan) - cho scheduler.ServerClock
+        self._thread = None
+        self._stop = threading.Event()
+
+    def poll(self):
+        """Lay cac tick moi. Returns so tick da ghi vao buffer (-1 neu loi)."""
+        if self._last_msc is None:
+            # Bat dau tu tick hien tai (gio server, khong dung gio may)
+            tick = mt5.symbol_info_tick(self.symbol)
+            if tick is None:
+                return -1
+            self._last_msc = tick.time_msc
+            self._seen_at_last = 0
+
+        ticks = mt5.copy_ticks_from(self.symbol, self._last_msc // 1000, self.batch, mt5.COPY_TICKS_ALL)
+        if ticks is None:
+            return -1
+
+        # copy_ticks_from chi nhan giay -> bo cac tick da nhan o lan truoc
+        msc = ticks['time_msc']
+        older = np.searchsorted(msc, self._last_msc, side='left')
+        same = np.searchsorted(msc, self._last_msc, side='right')
+        ticks = ticks[min(older + self._seen_at_last, same):]
+        if len(ticks) == 0:
+            return 0
+
+        last_msc = int(ticks['time_msc'][-1])
+        at_last = int(np.count_nonzero(ticks['time_msc'] == last_msc))
+        self._seen_at_last = at_last + (self._seen_at_last if last_msc == self._last_msc else 0)
+        self._last_msc = last_msc
+        self.buffer.append(ticks)
+        self.last_seen = (last_msc, time.time())
+        return len(ticks)
+
+    def _run(self):
+        failing = False
+        while not self._stop.is_set():
+            try:
+                ok = self.poll() >= 0
+                error = mt5.last_error()
+            except Exception as e:
+                ok, error = False, e
+            if not ok and not failing:
+                log(f"Khong lay duoc tick {self.symbol}: {error}")  # Chi bao 1 lan moi dot loi
+            failing = not ok
+            self._stop.wait(self.interval)
+
+    def start(self):
+        """Chay poll() lien tuc trong thread rieng (daemon)."""
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name=f"ticks-{self.symbol}", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
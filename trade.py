@@ -1,38 +1,166 @@
-import MetaTrader5 as mt5
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import mt5_gate
+from mt5_gate import mt5
 from telegram_bot import log, flush_logs
+from execution_log import ExecutionLog, leg_entry
+from profiles import DEFAULT_PROFILE, get_profile
+
+# TradeManager cua tung symbol
+_trade_managers = {}
+
+# Diem tich luy toi thieu de vao lenh
+BASE_SCORE = 35
+
+# Mac dinh gui lan luot qua mt5_gate (moi order_send 1 lan khoa, nhu moi lenh MT5 khac).
+# True = THU NGHIEM: gui 4 lenh cua cluster song song (moi lenh 1 thread, giu mt5_gate.LOCK
+# ca luc gui) -> lenh cuoi di sau ~1 round-trip thay vi 4. Chi do tren broker gia lap,
+# chua do tren terminal that - thu vien MetaTrader5 khong dam bao goi song song an toan
+PARALLEL_ORDERS = False
+_order_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="order")
+
+# ET1 bi requote / gia doi / het bao gia -> doc lai tick va gui lai ngay (khong cho), toi da
+# ET1_RETRY_SECONDS giay tu luc quyet dinh va chi khi gia chua chay qua max_slippage_usd cua
+# profile symbol (bat loi) so voi gia luc quyet dinh; ET2-ET4 (limit) duoc doi theo gia khop thuc te cua ET1
+ET1_RETRY_SECONDS = 0.5
+
+# Do tre / truot gia tung lenh ET: thong ke trong bo nho + ghi noi tiep ra file (None = khong ghi file)
+# File nam canh code (khong phu thuoc thu muc chay), ghi sau khi cluster da gui xong
+EXECUTION_LOG_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "execution_log.jsonl")
+_execution_log = ExecutionLog(EXECUTION_LOG_FILE)
+
 
-# Global TradeManager instance
-_trade_manager = None
+def _timed_send(request, order_send=None):
+    order_send = order_send or mt5.order_send
+    sent = time.perf_counter()
+    result = order_send(request)
+    return result, sent, time.perf_counter()
 
-def process_trade(symbol, signal):
+
+def send_orders(requests):
     """
-    Process trading signal and execute trades if conditions are met.
-    Returns True if a trade was executed, False otherwise.
+    Gui cac request (lan luot; song song neu bat PARALLEL_ORDERS - thu nghiem).
+    Returns ([(result, luc gui, luc nhan tra loi) theo thu tu requests], tong thoi gian gui (giay)),
+    moc thoi gian theo time.perf_counter.
+    """
+    start = time.perf_counter()
+    if PARALLEL_ORDERS and len(requests) > 1:
+        order_send = mt5_gate.unlocked(mt5).order_send
+        with mt5_gate.LOCK:
+            results = list(_order_executor.map(lambda request: _timed_send(request, order_send), requests))
+    else:
+        results = [_timed_send(request) for request in requests]
+    return results, time.perf_counter() - start
+
+
+class MarketInfo:
     """
-    global _trade_manager
+    Cache symbol_info (volume_min/volume_step/trade_stops_level/point/trade_contract_size) va balance cua 1 symbol
+    cho duong vao lenh: doc tu cache, khong goi MT5.
+
+    refresh() goi dinh ky moi `ttl` giay tu ben ngoai (runner: task asyncio qua call_mt5);
+    invalidate() (vd. broker tu choi lenh vi volume / stops) -> goi on_invalidate de lay lai
+    ngay. Chua co du lieu (khong co runner, backtest) -> lay 1 lan khi can.
+    """
+    def __init__(self, symbol, ttl=60):
+        self.symbol = symbol
+        self.ttl = ttl
+        self.info = None  # (min_lot, lot_step, stop_level, point, contract_size)
+        self.balance = None
+        self.updated = 0.0
+        self.on_invalidate = None  # runner dat: danh thuc task lay lai (goi tu thread bat ky)
     
-    # Initialize TradeManager if not already done
-    if _trade_manager is None:
+    def refresh(self):
+        """Lay lai tu MT5. Returns True neu thanh cong."""
+        symbol_info = mt5.symbol_info(self.symbol)
         account_info = mt5.account_info()
-        if account_info is None:
-            log("Failed to get account info")
+        if symbol_info is None or account_info is None:
             return False
-        _trade_manager = TradeManager(account_info.balance)
+        info = (symbol_info.volume_min, symbol_info.volume_step, symbol_info.trade_stops_level, symbol_info.point,
+                symbol_info.trade_contract_size)
+        if info != self.info:  # Giu nguyen object neu khong doi (TradeManager.arm so sanh bang `is`)
+            if self.info is not None:
+                log(f"[{self.symbol}] Thong so symbol thay doi: {self.info} -> {info}")
+            self.info = info
+        self.balance = account_info.balance
+        self.updated = time.time()
+        return True
+    
+    def get_info(self):
+        if self.info is None:
+            self.refresh()
+        return self.info
+    
+    def get_balance(self):
+        if self.balance is None:
+            self.refresh()
+        return self.balance
+    
+    def invalidate(self):
+        if self.on_invalidate is not None:
+            self.on_invalidate()
+        else:
+            self.info = None
+            self.balance = None
+
+
+# MarketInfo cua tung symbol
+_market_infos = {}
+
+
+def get_market_info(symbol):
+    if symbol not in _market_infos:
+        _market_infos[symbol] = MarketInfo(symbol)
+    return _market_infos[symbol]
+
+
+def get_trade_manager(symbol, profile=None):
+    """
+    TradeManager cua symbol (tao khi dung lan dau), None neu chua lay duoc balance.
+    profile: profiles.SymbolProfile, mac dinh theo symbol (ValueError neu symbol chua co profile).
+    """
+    _trade_manager = _trade_managers.get(symbol)
+    if _trade_manager is None:
+        balance = get_market_info(symbol).get_balance()
+        if balance is None:
+            log("Failed to get account info")
+            return None
+        _trade_manager = _trade_managers[symbol] = TradeManager(balance, profile or get_profile(symbol))
         _trade_manager.symbol = symbol
+    return _trade_manager
+
+
+def arm_trade(symbol, profile=None):
+    """Tinh san cluster BUY/SELL cua symbol (goi moi khi dong nen)."""
+    _trade_manager = get_trade_manager(symbol, profile)
+    if _trade_manager is not None:
+        _trade_manager.arm()
+
+
+def process_trade(symbol, signal, profile=None):
+    """
+    Process trading signal and execute trades if conditions are met.
+    Returns True if a trade was executed (ET1 filled), False otherwise (score is kept).
+    profile: nhu get_trade_manager.
+    """
+    # Initialize TradeManager if not already done
+    _trade_manager = get_trade_manager(symbol, profile)
+    if _trade_manager is None:
+        return False
     
     # Check signal scores and execute trades
-    BASE_SCORE = 35
-    
     if signal.buy_score >= BASE_SCORE and signal.buy_score >= signal.sell_score:
         log("Signal to BUY detected. Opening buy cluster...")
-        _trade_manager.open_buy_cluster()
+        opened = _trade_manager.open_buy_cluster()
         flush_logs()  # Gui ngay khi co lenh
-        return True
+        return opened
     elif signal.sell_score >= BASE_SCORE and signal.sell_score > signal.buy_score:
         log("Signal to SELL detected. Opening sell cluster...")
-        _trade_manager.open_sell_cluster()
+        opened = _trade_manager.open_sell_cluster()
         flush_logs()  # Gui ngay khi co lenh
-        return True
+        return opened
     
     return False
 
@@ -40,41 +168,47 @@ def process_trade(symbol, signal):
 class TradeManager:
     """
     Handles opening clusters of orders (ET1-ET4) for buy or sell.
+
+    profile: profiles.SymbolProfile (khoang cach ET, SL/TP tinh bang gia), mac dinh XAUUSD.
     """
-    def __init__(self, initial_nav):
-        self.initial_nav = initial_nav
+    def __init__(self, initial_nav, profile=None):
+        self.initial_nav = initial_nav  # NAV tinh risk khi chua lay duoc balance tu MarketInfo
+        self.profile = profile or DEFAULT_PROFILE
         self.symbol = "XAUUSD"
         self.risk_percent = 0.1  # 10% NAV
         
         # Khoang cach USD cho ET2, ET3, ET4
-        self.et_offsets_usd = [0, 0.2, 0.5, 0.7]
+        self.et_offsets_usd = list(self.profile.et_offsets_usd)
         
         # SL/TP cho tung ET (USD)
-        self.sl_usd = [9, 10, 11, 12]
-        self.tp_usd = [3, 5, 10, 15]
+        self.sl_usd = list(self.profile.sl_usd)
+        self.tp_usd = list(self.profile.tp_usd)
         
         # Phan bo risk: 20%, 20%, 40%, 20%
         self.risk_allocation = [0.20, 0.20, 0.40, 0.20]
         
-    def get_symbol_info(self):
-        symbol_info = mt5.symbol_info(self.symbol)
-        if symbol_info is None:
-            return None, None, None, None
+        # Cluster tinh san (arm): {"BUY"/"SELL": [(request, offset, sl, tp)]}, thong so symbol / balance luc arm
+        self.armed = None
+        self.armed_info = None
+        self.armed_balance = None
+        self.armed_sizing = None
         
-        min_lot = symbol_info.volume_min
-        lot_step = symbol_info.volume_step
-        stop_level = symbol_info.trade_stops_level
-        point = symbol_info.point
+    def get_symbol_info(self):
+        info = get_market_info(self.symbol).get_info()  # cache, khong goi MT5
+        if info is None:
+            return None, None, None, None, None
         
-        return min_lot, lot_step, stop_level, point
+        min_lot, lot_step, stop_level, point, contract_size = info
+        return min_lot, lot_step, stop_level, point, contract_size
         
-    def calculate_lots(self):
-        min_lot, lot_step, _, _ = self.get_symbol_info()
+    def _size_lots(self, nav):
+        """Lots ET1-ET4 theo risk NAV. Returns (lots, tong risk NAV, tong risk thuc te, NAV) hoac None."""
+        min_lot, lot_step, _, _, contract_size = self.get_symbol_info()
         if min_lot is None:
-            return 0.01, 0.01, 0.02, 0.01
+            return None
         
-        total_risk = self.initial_nav * self.risk_percent
-        usd_per_lot = 100
+        total_risk = nav * self.risk_percent
+        usd_per_lot = contract_size  # USD / lot khi gia chay 1 USD
         
         lots = []
         total_actual_risk = 0
@@ -88,128 +222,251 @@ class TradeManager:
             actual_risk = lot * self.sl_usd[i] * usd_per_lot
             total_actual_risk += actual_risk
         
+        return lots, total_risk, total_actual_risk, nav
+    
+    def _log_lots(self, lots, total_risk, total_actual_risk, nav):
         log(f"  Risk NAV = ${total_risk:.2f}")
         log(f"  Lots: ET1={lots[0]:.2f}, ET2={lots[1]:.2f}, ET3={lots[2]:.2f}, ET4={lots[3]:.2f}")
-        log(f"  Total risk: ${total_actual_risk:.2f} ({total_actual_risk/self.initial_nav*100:.2f}% NAV)")
+        log(f"  Total risk: ${total_actual_risk:.2f} ({total_actual_risk/nav*100:.2f}% NAV)")
+    
+    def arm(self):
+        """
+        Tinh san cluster BUY va SELL (lots, request ET1-ET4, khoang cach gia/SL/TP co dau) tu
+        thong so symbol trong cache -> khi co tin hieu chi con dien gia tick.
+        Goi moi khi dong nen; tu goi lai khi thong so symbol hoac balance doi. Lots theo balance
+        hien tai trong cache (initial_nav neu chua co).
+        """
+        market = get_market_info(self.symbol)
+        info = market.get_info()
+        balance = market.get_balance()
+        sized = self._size_lots(balance if balance is not None else self.initial_nav)
+        if sized is None:
+            lots, sizing = [0.01, 0.01, 0.02, 0.01], None
+        else:
+            lots, sizing = sized[0], sized
+        
+        _, _, stop_level, point, _ = info if info is not None else (None, None, None, None, None)
+        min_distance = max(stop_level * point if stop_level else 0, self.profile.min_stop_usd)
+        
+        self.armed = {}
+        for side, sign, market_type, limit_type in (("BUY", 1, mt5.ORDER_TYPE_BUY, mt5.ORDER_TYPE_BUY_LIMIT),
+                                                    ("SELL", -1, mt5.ORDER_TYPE_SELL, mt5.ORDER_TYPE_SELL_LIMIT)):
+            legs = []
+            for i in range(4):
+                sl_distance = max(self.sl_usd[i], min_distance + 0.1)
+                tp_distance = max(self.tp_usd[i], min_distance + 0.1)
+                
+                request = {
+                    "action": mt5.TRADE_ACTION_DEAL if i == 0 else mt5.TRADE_ACTION_PENDING,
+                    "symbol": self.symbol,
+                    "volume": lots[i],
+                    "type": market_type if i == 0 else limit_type,
+                    "price": 0.0,
+                    "sl": 0.0,
+                    "tp": 0.0,
+                    "deviation": 20,
+                    "magic": 1001 + i,
+                    "comment": f"ET{i+1} {side}",
+                    "type_filling": mt5.ORDER_FILLING_IOC,
+                    "type_time": mt5.ORDER_TIME_GTC,
+                }
+                # BUY: limit = bid - offset, SL duoi, TP tren; SELL: nguoc lai
+                legs.append((request, -sign * self.et_offsets_usd[i], -sign * sl_distance, sign * tp_distance))
+            self.armed[side] = legs
+        self.armed_info = info
+        self.armed_balance = balance
+        self.armed_sizing = sizing
+    
+    def open_cluster(self, side):
+        """
+        Mo cluster BUY/SELL tu template da tinh san (arm): chi dien gia tick roi gui.
+        Returns True neu ET1 khop; ET1 khong khop (ke ca sau khi gui lai) -> huy cac lenh limit
+        da dat, returns False.
+        """
+        start = time.perf_counter()
+        market = get_market_info(self.symbol)
+        if self.armed is None or self.armed_info is not market.info or self.armed_balance != market.balance:
+            self.arm()
         
-        return lots[0], lots[1], lots[2], lots[3]
-
-    def open_buy_cluster(self):
         tick = mt5.symbol_info_tick(self.symbol)
         if tick is None:
             log("Failed to get symbol tick info")
-            return
+            return False
         
         price_ask = tick.ask
         price_bid = tick.bid
-        lots = self.calculate_lots()
+        market_price, limit_price = (price_ask, price_bid) if side == "BUY" else (price_bid, price_ask)
         
-        _, _, stop_level, point = self.get_symbol_info()
-        min_distance = max(stop_level * point if stop_level else 0, 0.5)
+        digits = self.profile.digits
+        requests = []
+        for i, (template, offset, sl_distance, tp_distance) in enumerate(self.armed[side]):
+            request = template.copy()
+            entry_price = market_price if i == 0 else round(limit_price + offset, digits)
+            request["price"] = entry_price
+            request["sl"] = round(entry_price + sl_distance, digits)
+            request["tp"] = round(entry_price + tp_distance, digits)
+            requests.append(request)
+        prepared = time.perf_counter() - start
         
-        log(f"BUY Cluster @ Ask={price_ask}, Bid={price_bid}")
+        entries = []
+        results, elapsed = self.send_cluster(requests, side, start, entries)
+        retries = self.retry_market_leg(side, requests, results, start, entries)
+        filled = results[0][0] is not None and results[0][0].retcode == mt5.TRADE_RETCODE_DONE
+        if filled:
+            shift, cancelled = self.reanchor_limits(requests, results, market_price), 0
+        else:
+            shift, cancelled = 0, self.cancel_limits(results)
         
-        for i in range(4):
-            lot = lots[i]
-            offset = self.et_offsets_usd[i]
-            sl_distance = max(self.sl_usd[i], min_distance + 0.1)
-            tp_distance = max(self.tp_usd[i], min_distance + 0.1)
-            
-            if i == 0:
-                entry_price = price_ask
-                order_type = mt5.ORDER_TYPE_BUY
-                action = mt5.TRADE_ACTION_DEAL
-            else:
-                entry_price = round(price_bid - offset, 2)
-                order_type = mt5.ORDER_TYPE_BUY_LIMIT
-                action = mt5.TRADE_ACTION_PENDING
-            
-            sl = round(entry_price - sl_distance, 2)
-            tp = round(entry_price + tp_distance, 2)
-            
-            request = {
-                "action": action,
-                "symbol": self.symbol,
-                "volume": lot,
-                "type": order_type,
-                "price": entry_price,
-                "sl": sl,
-                "tp": tp,
-                "deviation": 20,
-                "magic": 1001 + i,
-                "comment": f"ET{i+1} BUY",
-                "type_filling": mt5.ORDER_FILLING_IOC,
-                "type_time": mt5.ORDER_TIME_GTC,
-            }
-            
-            result = mt5.order_send(request)
-            
-            order_type_str = "Market" if i == 0 else "Limit"
-            if result and result.retcode == mt5.TRADE_RETCODE_DONE:
-                log(f"  [OK] ET{i+1} ({order_type_str}): {lot} lots @ {entry_price} | SL={sl}, TP={tp}")
-            elif result and result.retcode == mt5.TRADE_RETCODE_PLACED:
-                log(f"  [OK] ET{i+1} ({order_type_str}): Pending {lot} lots @ {entry_price} | SL={sl}, TP={tp}")
-            else:
-                error = result.comment if result else "No response"
-                retcode = result.retcode if result else "N/A"
-                log(f"  [X] ET{i+1} ({order_type_str}): FAILED @ {entry_price} | Code={retcode} | {error}")
+        # Log / ghi execution log sau khi gui (khong lam cham ET1)
+        for entry in entries:
+            _execution_log.record(entry)
+        if self.armed_sizing is not None:
+            self._log_lots(*self.armed_sizing)
+        if side == "BUY":
+            log(f"BUY Cluster @ Ask={price_ask}, Bid={price_bid}")
+        else:
+            log(f"SELL Cluster @ Bid={price_bid}, Ask={price_ask}")
+        log(f"  Chuan bi cluster: {prepared*1e6:.0f}us")
+        if retries:
+            log(f"  ET1 gui lai {retries} lan")
+        if shift:
+            log(f"  ET2-ET4 doi theo gia khop ET1: {shift:+.2f}")
+        self.log_cluster(requests, results, elapsed)
+        if not filled:
+            log(f"  ET1 khong khop -> huy {cancelled} lenh limit, giu diem tich luy")
+        for line in _execution_log.summary():
+            log(line)
+        return filled
+
+    def open_buy_cluster(self):
+        return self.open_cluster("BUY")
 
     def open_sell_cluster(self):
-        tick = mt5.symbol_info_tick(self.symbol)
-        if tick is None:
-            log("Failed to get symbol tick info")
-            return
-        
-        price_bid = tick.bid
-        price_ask = tick.ask
-        lots = self.calculate_lots()
+        return self.open_cluster("SELL")
+    
+    def send_cluster(self, requests, side, decided, entries):
+        """
+        Gui ET1-ET4 cung luc (send_orders), them ban ghi do tre / truot gia tung lenh vao `entries`
+        (ghi execution log sau, decided: perf_counter luc quyet dinh vao lenh).
+        Returns (results, tong thoi gian) nhu send_orders.
+        """
+        results, elapsed = send_orders(requests)
         
-        _, _, stop_level, point = self.get_symbol_info()
-        min_distance = max(stop_level * point if stop_level else 0, 0.5)
+        for i, (request, (result, sent, acked)) in enumerate(zip(requests, results)):
+            done = result is not None and result.retcode == mt5.TRADE_RETCODE_DONE
+            entries.append(leg_entry(self.symbol, i + 1, side, i == 0, request, result, decided, sent, acked, done))
         
-        log(f"SELL Cluster @ Bid={price_bid}, Ask={price_ask}")
+        # Broker tu choi vi volume / stops -> thong so symbol co the da doi
+        if any(result and result.retcode in (mt5.TRADE_RETCODE_INVALID_VOLUME, mt5.TRADE_RETCODE_INVALID_STOPS)
+               for result, _, _ in results):
+            get_market_info(self.symbol).invalidate()
+        return results, elapsed
+    
+    def retry_market_leg(self, side, requests, results, decided, entries):
+        """
+        ET1 bi requote / gia doi / het bao gia: doc lai tick va gui lai (SL/TP dich theo gia moi)
+        cho toi khi khop, het ET1_RETRY_SECONDS (tinh tu `decided`) hoac gia chay qua
+        profile.max_slippage_usd. Cap nhat requests[0] / results[0], them ban ghi vao `entries`.
+        Returns so lan gui lai.
+        """
+        retry_codes = (mt5.TRADE_RETCODE_REQUOTE, mt5.TRADE_RETCODE_PRICE_CHANGED, mt5.TRADE_RETCODE_PRICE_OFF)
+        result = results[0][0]
+        if result is None or result.retcode not in retry_codes:
+            return 0
         
-        for i in range(4):
-            lot = lots[i]
-            offset = self.et_offsets_usd[i]
-            sl_distance = max(self.sl_usd[i], min_distance + 0.1)
-            tp_distance = max(self.tp_usd[i], min_distance + 0.1)
-            
-            if i == 0:
-                entry_price = price_bid
-                order_type = mt5.ORDER_TYPE_SELL
-                action = mt5.TRADE_ACTION_DEAL
-            else:
-                entry_price = round(price_ask + offset, 2)
-                order_type = mt5.ORDER_TYPE_SELL_LIMIT
-                action = mt5.TRADE_ACTION_PENDING
+        request = requests[0]
+        quoted = request["price"]
+        max_slippage, digits = self.profile.max_slippage_usd, self.profile.digits
+        deadline = decided + ET1_RETRY_SECONDS
+        attempts = 0
+        while time.perf_counter() < deadline:
+            tick = mt5.symbol_info_tick(self.symbol)
+            price = None if tick is None else (tick.ask if side == "BUY" else tick.bid)
+            if price is None or (attempts and price == request["price"]):
+                time.sleep(0.001)  # Cho tick moi
+                continue
+            if (price - quoted if side == "BUY" else quoted - price) > max_slippage:
+                log(f"  ET1: gia chay qua {max_slippage}$ ({quoted} -> {price}), dung gui lai")
+                break
             
-            sl = round(entry_price + sl_distance, 2)
-            tp = round(entry_price - tp_distance, 2)
-            
-            request = {
-                "action": action,
+            shift = price - request["price"]
+            request = dict(request, price=price, sl=round(request["sl"] + shift, digits),
+                           tp=round(request["tp"] + shift, digits))
+            result, sent, acked = _timed_send(request)
+            attempts += 1
+            done = result is not None and result.retcode == mt5.TRADE_RETCODE_DONE
+            entries.append(leg_entry(self.symbol, 1, side, True, request, result, decided, sent, acked, done,
+                                     retry=attempts))
+            results[0] = (result, sent, acked)
+            requests[0] = request
+            if result is None or result.retcode not in retry_codes:
+                break
+        return attempts
+    
+    def reanchor_limits(self, requests, results, quoted):
+        """
+        Doi gia / SL / TP cac lenh limit da dat (ET2-ET4) theo chenh lech gia khop ET1 so voi
+        gia `quoted` luc tao cluster (TRADE_ACTION_MODIFY, gui song song). Returns chenh lech (0 = khong doi).
+        """
+        result = results[0][0]
+        if result is None or result.retcode != mt5.TRADE_RETCODE_DONE or not result.price:
+            return 0
+        digits = self.profile.digits
+        shift = round(result.price - quoted, digits)
+        if not shift:
+            return 0
+        
+        legs = [i for i, (result, _, _) in enumerate(results[1:], 1)
+                if result and result.retcode == mt5.TRADE_RETCODE_PLACED and result.order]
+        modifies = []
+        for i in legs:
+            requests[i] = dict(requests[i], price=round(requests[i]["price"] + shift, digits),
+                               sl=round(requests[i]["sl"] + shift, digits),
+                               tp=round(requests[i]["tp"] + shift, digits))
+            modifies.append({
+                "action": mt5.TRADE_ACTION_MODIFY,
                 "symbol": self.symbol,
-                "volume": lot,
-                "type": order_type,
-                "price": entry_price,
-                "sl": sl,
-                "tp": tp,
-                "deviation": 20,
-                "magic": 1001 + i,
-                "comment": f"ET{i+1} SELL",
-                "type_filling": mt5.ORDER_FILLING_IOC,
+                "order": results[i][0].order,
+                "price": requests[i]["price"],
+                "sl": requests[i]["sl"],
+                "tp": requests[i]["tp"],
                 "type_time": mt5.ORDER_TIME_GTC,
-            }
-            
-            result = mt5.order_send(request)
-            
+            })
+        for i, (result, _, _) in zip(legs, send_orders(modifies)[0]):
+            if not result or result.retcode != mt5.TRADE_RETCODE_DONE:
+                error = result.comment if result else "No response"
+                log(f"  [X] ET{i+1}: khong doi duoc gia limit -> {requests[i]['price']} | {error}")
+        return shift
+    
+    def cancel_limits(self, results):
+        """Huy cac lenh limit da dat (ET2-ET4, TRADE_ACTION_REMOVE, gui song song). Returns so lenh da huy."""
+        legs = [i for i, (result, _, _) in enumerate(results[1:], 1)
+                if result and result.retcode == mt5.TRADE_RETCODE_PLACED and result.order]
+        removes = [{"action": mt5.TRADE_ACTION_REMOVE, "order": results[i][0].order} for i in legs]
+        cancelled = 0
+        for i, (result, _, _) in zip(legs, send_orders(removes)[0]):
+            if result and result.retcode == mt5.TRADE_RETCODE_DONE:
+                cancelled += 1
+            else:
+                error = result.comment if result else "No response"
+                log(f"  [X] ET{i+1}: khong huy duoc lenh limit {results[i][0].order} | {error}")
+        return cancelled
+    
+    def log_cluster(self, requests, results, elapsed):
+        """Log ket qua tung ET + tong thoi gian gui."""
+        for i, (request, (result, sent, acked)) in enumerate(zip(requests, results)):
+            seconds = acked - sent
+            lot, entry_price, sl, tp = request["volume"], request["price"], request["sl"], request["tp"]
             order_type_str = "Market" if i == 0 else "Limit"
             if result and result.retcode == mt5.TRADE_RETCODE_DONE:
-                log(f"  [OK] ET{i+1} ({order_type_str}): {lot} lots @ {entry_price} | SL={sl}, TP={tp}")
+                log(f"  [OK] ET{i+1} ({order_type_str}): {lot} lots @ {entry_price} | SL={sl}, TP={tp} "
+                    f"| {seconds*1000:.0f}ms")
             elif result and result.retcode == mt5.TRADE_RETCODE_PLACED:
-                log(f"  [OK] ET{i+1} ({order_type_str}): Pending {lot} lots @ {entry_price} | SL={sl}, TP={tp}")
+                log(f"  [OK] ET{i+1} ({order_type_str}): Pending {lot} lots @ {entry_price} | SL={sl}, TP={tp} "
+                    f"| {seconds*1000:.0f}ms")
             else:
                 error = result.comment if result else "No response"
                 retcode = result.retcode if result else "N/A"
                 log(f"  [X] ET{i+1} ({order_type_str}): FAILED @ {entry_price} | Code={retcode} | {error}")
+        
+        log(f"  Cluster: {len(requests)} lenh trong {elapsed*1000:.0f}ms")